@@ -8,6 +8,12 @@ from dsa_structures.utils import DataHandler
 from dsa_structures.routes import RouteManager
 from dsa_structures.linked_list import LinkedList
 from dsa_structures.passenger_routes import PassengerBookingSystem
+from dsa_structures.timetable import TripTableStore, format_minutes
+from dsa_structures.storage import open_storage
+from dsa_structures.persistence import durable_write_json, add_write_listener
+from dsa_structures.changes import ChangeWatcher, SignatureCache, file_signature
+from dsa_structures.route_store import load_routes_document, routes_signature
+from dsa_structures.streaming import iter_json_records
 import heapq
 from datetime import time, timedelta
 import uuid
@@ -30,11 +36,6 @@ def _haversine_km(lat1, lon1, lat2, lon2):
     c = 2 * asin(sqrt(a))
     return R * c
 
-DEFAULT_SERVICE_CALENDAR = {
-    "weekday": {"start_time": "06:00", "end_time": "22:00", "headway_minutes": 15},
-    "weekend": {"start_time": "08:00", "end_time": "20:00", "headway_minutes": 20},
-}
-
 def _parse_time(value):
     if not value:
         return None
@@ -42,28 +43,6 @@ def _parse_time(value):
         return datetime.strptime(str(value).strip(), "%H:%M").time()
     except ValueError:
         return None
-
-def _get_route_service_window(route, travel_date):
-    calendar = route.get("service_calendar") if isinstance(route, dict) else {}
-    calendar = calendar if isinstance(calendar, dict) else {}
-    schedule = {
-        "weekday": {**DEFAULT_SERVICE_CALENDAR["weekday"], **calendar.get("weekday", {})},
-        "weekend": {**DEFAULT_SERVICE_CALENDAR["weekend"], **calendar.get("weekend", {})},
-    }
-    day_key = "weekday"
-    if isinstance(travel_date, datetime):
-        day_key = "weekend" if travel_date.weekday() >= 5 else "weekday"
-    day_schedule = schedule[day_key]
-    headway = day_schedule.get("headway_minutes", DEFAULT_SERVICE_CALENDAR[day_key]["headway_minutes"])
-    try:
-        headway = int(headway)
-    except (TypeError, ValueError):
-        headway = DEFAULT_SERVICE_CALENDAR[day_key]["headway_minutes"]
-    return {
-        "start_time": day_schedule["start_time"],
-        "end_time": day_schedule["end_time"],
-        "headway_minutes": headway,
-    }
 
 def _coord_index(routes_data):
     """
@@ -105,8 +84,11 @@ sim_file = os.path.join(data_dir, 'sim_distances.json')
 # Ensure data directory exists
 os.makedirs(data_dir, exist_ok=True)
 
+# Optional SQLite backend (DSA_STORAGE=sqlite); JSON files otherwise
+storage = open_storage(data_dir)
+
 # Initialize data structures
-user_manager = UserManager(users_file)
+user_manager = UserManager(users_file, storage=storage)
 
 # Admin credentials (hardcoded as per requirements)
 ADMIN_USERNAME = "admin"
@@ -115,7 +97,7 @@ ADMIN_EMAIL = "admin@transport.com"
 ADMIN_PHONE = "0000000000"
 
 routes_file = os.path.join(data_dir, 'routes.json')
-route_manager = RouteManager(routes_file)
+route_manager = RouteManager(routes_file, storage=storage)
 
 
 def _sim_init_file():
@@ -128,24 +110,37 @@ def _sim_init_file():
     except Exception as e:
         print("SIM init error:", e)
 
-def _sim_read():
+def _sim_read_file():
     _sim_init_file()
     with open(sim_file, "r", encoding="utf-8") as f:
         return json.load(f)
 
+# Re-parsed only when the file changed (possibly in another worker)
+_sim_cache = SignatureCache(lambda: file_signature(sim_file), _sim_read_file)
+
+def _sim_read():
+    return _sim_cache.get()
+
 def _sim_write(data):
-    os.makedirs(os.path.dirname(sim_file), exist_ok=True)
-    tmp = sim_file + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
-    os.replace(tmp, sim_file)
+    durable_write_json(sim_file, data, indent=2, encoding="utf-8")
+
+def _read_routes_raw():
+    """Read your existing routes schema safely (route shards or legacy routes.json)"""
+    if storage is not None:
+        return {"routes": storage.load_all('routes')}
+    data = load_routes_document(routes_file)
+    if data is None:
+        return {"routes": [], "total_routes": 0, "last_updated": None}
+    return data
+
+def _routes_signature():
+    return storage.generation('routes') if storage is not None else routes_signature(routes_file)
+
+_routes_raw_cache = SignatureCache(_routes_signature, _read_routes_raw)
 
 def _load_routes_raw():
-    """Read your existing routes.json schema safely"""
-    if not os.path.exists(routes_file):
-        return {"routes": [], "total_routes": 0, "last_updated": None}
-    with open(routes_file, "r", encoding="utf-8") as f:
-        return json.load(f)
+    """Routes as stored, re-read only after a save (by any worker)"""
+    return _routes_raw_cache.get()
 
 def _unique_stops_from_routes(routes_data):
     stops = []
@@ -516,10 +511,15 @@ class MaxHeapBusPriority:
 
 class BusManager:
     """Main Bus Management System"""
-    def __init__(self, data_file='data/buses.json', routes_file=None):
+    def __init__(self, data_file='data/buses.json', routes_file=None, trip_tables=None, storage=None,
+                 routes_source=None):
         self.data_file = data_file
         self.routes_file = routes_file
+        self.storage = storage  # optional SQLiteStorage; buses.json when None
+        self.routes_source = routes_source  # callable returning route dicts owned elsewhere
         self.routes_index = {}
+        # Shared per-day trip table (the booking system's) so every schedule lookup agrees
+        self.trip_tables = trip_tables or TripTableStore(lambda: self.routes_index.get("by_id", {}).values())
         self.bus_list = DoublyLinkedListBus()
         self.min_heap_arrival = MinHeapBusArrival()
         self.max_heap_priority = MaxHeapBusPriority()
@@ -529,11 +529,16 @@ class BusManager:
     def load_routes(self):
         """Load routes for schedule lookup."""
         self.routes_index = {"by_id": {}, "by_name": {}}
-        if not self.routes_file or not os.path.exists(self.routes_file):
+        if self.routes_source is None and self.storage is None and not self.routes_file:
             return
         try:
-            with open(self.routes_file, 'r') as f:
-                data = json.load(f)
+            if self.routes_source is not None:
+                # Same dicts as the trip tables' provider, so cached timetables stay valid
+                data = {'routes': list(self.routes_source())}
+            elif self.storage is not None:
+                data = {'routes': self.storage.load_all('routes')}
+            else:
+                data = load_routes_document(self.routes_file)
             routes_list = data.get('routes', []) if isinstance(data, dict) else []
             for route in routes_list:
                 if not isinstance(route, dict):
@@ -557,24 +562,16 @@ class BusManager:
         return None
 
     def _compute_next_arrival(self, route, current_dt):
-        service = _get_route_service_window(route, current_dt)
-        start_time = _parse_time(service["start_time"])
-        end_time = _parse_time(service["end_time"])
-        if not start_time or not end_time:
-            return "08:00"
-        headway = service["headway_minutes"]
-        base_dt = datetime.combine(current_dt.date(), start_time)
-        end_dt = datetime.combine(current_dt.date(), end_time)
-        if current_dt <= base_dt:
-            return base_dt.strftime("%H:%M")
-        if headway <= 0:
-            return base_dt.strftime("%H:%M")
-        diff_minutes = int((current_dt - base_dt).total_seconds() / 60)
-        intervals = (diff_minutes + headway - 1) // headway
-        next_dt = base_dt + timedelta(minutes=intervals * headway)
-        if next_dt > end_dt:
-            return base_dt.strftime("%H:%M")
-        return next_dt.strftime("%H:%M")
+        """Next departure from the route's first stop, from the day's trip table"""
+        travel_date = current_dt.strftime("%Y-%m-%d")
+        reference = current_dt.hour * 60 + current_dt.minute + current_dt.second / 60
+        departure = self.trip_tables.next_departure(route, 0, travel_date, reference)
+        if departure is None:
+            # Service over for the day (or no stops): show the first departure
+            departure = self.trip_tables.next_departure(route, 0, travel_date)
+        if departure is None:
+            departure = self.trip_tables.timetable(route).service_window(travel_date)["start"]
+        return format_minutes(departure)
 
     def _normalize_next_arrival(self, bus):
         if bus.get('next_arrival') not in (None, "", "auto"):
@@ -586,27 +583,45 @@ class BusManager:
         bus['next_arrival'] = self._compute_next_arrival(route, datetime.now())
     
     def load_data(self):
-        """Load bus data from JSON file"""
+        """Load bus data from JSON file (or SQLite storage)"""
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r') as f:
-                    buses = json.load(f)
-                    for bus in buses:
-                        self._normalize_next_arrival(bus)
-                        self.bus_list.add_bus(bus)
-                        self.min_heap_arrival.push(bus)
-                        self.max_heap_priority.push(bus)
+            if self.storage is not None or os.path.exists(self.data_file):
+                self._index_buses(self._read_buses())
         except Exception as e:
             print(f"Error loading bus data: {e}")
             self.save_data()
     
+    def reload_data(self):
+        """Re-read buses saved by another worker (indexes are swapped, never left half-built)"""
+        self._index_buses(self._read_buses())
+    
+    def _index_buses(self, buses):
+        bus_list = DoublyLinkedListBus()
+        min_heap_arrival = MinHeapBusArrival()
+        max_heap_priority = MaxHeapBusPriority()
+        for bus in buses:
+            self._normalize_next_arrival(bus)
+            bus_list.add_bus(bus)
+            min_heap_arrival.push(bus)
+            max_heap_priority.push(bus)
+        self.bus_list = bus_list
+        self.min_heap_arrival = min_heap_arrival
+        self.max_heap_priority = max_heap_priority
+    
+    def _read_buses(self):
+        """Raw bus rows from SQLite storage or the JSON file (streamed into the indexes)"""
+        if self.storage is not None:
+            return self.storage.load_all('buses')
+        return iter_json_records(self.data_file, 'buses')
+
     def save_data(self):
-        """Save bus data to JSON file"""
+        """Save bus data to JSON file (or only the changed rows to SQLite)"""
         try:
-            os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
             buses = self.bus_list.get_all_buses()
-            with open(self.data_file, 'w') as f:
-                json.dump(buses, f, indent=4)
+            if self.storage is not None:
+                self.storage.sync('buses', buses)
+                return True
+            durable_write_json(self.data_file, buses, indent=4)
             return True
         except Exception as e:
             print(f"Error saving bus data: {e}")
@@ -731,17 +746,55 @@ class BusManager:
         
         return stats
 
+# Initialize booking system
+booking_system = PassengerBookingSystem(storage=storage)
+
 # Initialize Bus Manager
 buses_file = os.path.join(data_dir, 'buses.json')
-bus_manager = BusManager(buses_file, routes_file=routes_file)
+bus_manager = BusManager(buses_file, routes_file=routes_file, trip_tables=booking_system.trip_tables,
+                         storage=storage, routes_source=lambda: booking_system.routes.get('routes', []))
+
+# Cross-worker reloads: a dataset saved by another worker is re-read before the next request
+change_watcher = ChangeWatcher(interval=float(os.environ.get('DSA_RELOAD_INTERVAL', '1.0')))
+
+def _dataset_signature(table, path):
+    if storage is not None:
+        return lambda: storage.generation(table)
+    return lambda: file_signature(path)
+
+change_watcher.watch('users', _dataset_signature('users', users_file), reload=user_manager.reload_users)
+change_watcher.watch('routes', _routes_signature, reload=route_manager.load_routes,
+                     dependents=[booking_system.reload_routes, bus_manager.load_routes])
+change_watcher.watch('buses', _dataset_signature('buses', buses_file), reload=bus_manager.reload_data,
+                     dependents=[booking_system.reload_buses])
+
+# Our own saves are acknowledged so this worker never re-reads what it just wrote
+_watched_files = {os.path.abspath(users_file): 'users', os.path.abspath(route_manager.shards.manifest_path): 'routes',
+                  os.path.abspath(buses_file): 'buses'}
+
+def _acknowledge_write(path, signature):
+    name = _watched_files.get(os.path.abspath(path))
+    if name:
+        change_watcher.acknowledge(name, signature)
+
+if storage is not None:
+    storage.listeners.append(change_watcher.acknowledge)
+else:
+    add_write_listener(_acknowledge_write)
+
+# The booking system's passenger-count flushes are state only it holds: nothing here reloads for them
+booking_system.bus_flusher.context = change_watcher.quiet
+
+@app.before_request
+def reload_changed_datasets():
+    change_watcher.poll()
 
 # ==================== HELPER FUNCTIONS ====================
 
 def load_routes_for_buses():
     """Load routes from JSON file for bus allocation - FIXED for your structure"""
     try:
-        with open(routes_file, 'r') as f:
-            routes_data = json.load(f)
+        routes_data = _load_routes_raw()
         
         print(f"\n=== DEBUG: Loading routes ===")
         print(f"Type of routes_data: {type(routes_data)}")
@@ -792,8 +845,16 @@ def load_routes_for_buses():
         return []
 
 def calculate_next_arrival(bus, current_time):
-    """Calculate next arrival time based on current time and frequency"""
+    """Calculate next arrival time from the route's trip table, else from timing frequency"""
     try:
+        route = bus_manager._find_route_for_bus(bus)
+        if route:
+            reference = current_time.hour * 60 + current_time.minute + current_time.second / 60
+            departure = bus_manager.trip_tables.next_departure(
+                route, 0, datetime.today().strftime("%Y-%m-%d"), reference)
+            if departure is not None:
+                return time(departure // 60, departure % 60)
+
         if bus.get('timings'):
             last_timing = bus['timings'][-1]
             frequency = last_timing.get('frequency', '30min')
@@ -819,9 +880,6 @@ def calculate_next_arrival(bus, current_time):
         next_arrival_dt = current_dt + timedelta(minutes=30)
         return next_arrival_dt.time()
 
-# Initialize booking system
-booking_system = PassengerBookingSystem()
-
 # ==================== FLASK ROUTES ====================
 
 @app.route('/')
@@ -1936,6 +1994,15 @@ def passenger_live_tracking():
 
 # ==================== BOOKING API ENDPOINTS ====================
 
+def _idempotent_response(result, status=200):
+    """JSON response for an idempotent booking call, flagging replays and key reuse"""
+    if result.get('idempotency_conflict'):
+        return jsonify(result), 422
+    response = make_response(jsonify(result), status)
+    if result.get('idempotent_replay'):
+        response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
 @app.route('/api/book/available_buses', methods=['POST'])
 def get_available_buses_api():
     """API: Get available buses for route"""
@@ -1951,17 +2018,69 @@ def get_available_buses_api():
         if not all([from_stop, to_stop, date]):
             return jsonify({'error': 'Missing required fields'}), 400
         
-        available_buses = booking_system.get_available_buses(from_stop, to_stop, date)
+        available_buses, cache_status = booking_system.get_available_buses_with_status(from_stop, to_stop, date)
         
-        return jsonify({
+        response = make_response(jsonify({
             'success': True,
             'buses': available_buses,
             'count': len(available_buses)
-        })
+        }))
+        response.headers['X-Cache'] = cache_status
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/book/availability_calendar', methods=['POST'])
+def availability_calendar_api():
+    """API: Seats and departures for every matching bus over a range of dates"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    try:
+        data = request.json or {}
+        from_stop = data.get('from_stop')
+        to_stop = data.get('to_stop')
+        start_date = data.get('start_date') or data.get('date')
+
+        if not all([from_stop, to_stop, start_date]):
+            return jsonify({'error': 'Missing required fields'}), 400
+
+        try:
+            days = int(data.get('days', 7))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'days must be an integer'}), 400
+
+        calendar = booking_system.get_availability_calendar(from_stop, to_stop, start_date, days)
+
+        return jsonify({'success': True, **calendar})
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/book/seat_map/<bus_number>/<travel_date>')
+def seat_map_api(bus_number, travel_date):
+    """API: Packed seat occupancy bitmap; poll with If-None-Match to get 304 while unchanged"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    seat_map = booking_system.get_seat_map(bus_number, travel_date)
+    if seat_map is None:
+        return jsonify({'error': 'Bus not found'}), 404
+
+    # Only a bus that exists can be "not modified"
+    if seat_map['etag'] in request.if_none_match:
+        response = make_response('', 304)
+        response.set_etag(seat_map['etag'])
+        return response
+
+    response = make_response(jsonify({'success': True, **seat_map}))
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.set_etag(seat_map['etag'])
+    return response
+
 @app.route('/api/book/ticket', methods=['POST'])
 def book_ticket_api():
     """API: Book a ticket"""
@@ -1976,11 +2095,142 @@ def book_ticket_api():
         data['passenger_name'] = session.get('full_name', '')
         data['passenger_contact'] = session.get('phone', '')
         
+        # Retries carrying the same Idempotency-Key get the original response
+        data['idempotency_key'] = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+
         # Book ticket
         result = booking_system.book_ticket(data)
-        
-        return jsonify(result)
-        
+
+        return _idempotent_response(result)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/book/group', methods=['POST'])
+def book_group_api():
+    """API: Book seats for a group on one bus in a single all-or-nothing call"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    try:
+        data = request.json or {}
+
+        if not all([data.get('bus_number'), data.get('travel_date'), data.get('from_stop'), data.get('to_stop')]):
+            return jsonify({'error': 'Missing required fields'}), 400
+
+        passengers = data.get('passengers')
+        if passengers is None and not data.get('group_size'):
+            return jsonify({'error': 'Provide passengers or group_size'}), 400
+
+        if data.get('group_size') not in (None, ''):
+            try:
+                group_size = int(data['group_size'])
+            except (TypeError, ValueError):
+                return jsonify({'error': 'group_size must be an integer'}), 400
+            if group_size < 1:
+                return jsonify({'error': 'group_size must be positive'}), 400
+            data['group_size'] = group_size
+
+        if passengers is not None:
+            if not (isinstance(passengers, list) and passengers and all(isinstance(p, dict) for p in passengers)):
+                return jsonify({'error': 'passengers must be a non-empty list of passenger objects'}), 400
+            if data.get('group_size') not in (None, '') and data['group_size'] != len(passengers):
+                return jsonify({'error': 'group_size does not match the number of passengers'}), 400
+
+        # Group tickets are owned by the booking passenger
+        data['passenger_id'] = session.get('user_id', '')
+        data['passenger_name'] = session.get('full_name', '')
+        data['passenger_contact'] = session.get('phone', '')
+
+        data['idempotency_key'] = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+
+        result = booking_system.book_group(data)
+
+        return _idempotent_response(result, 200 if result.get('success') else 409)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/book/waitlist', methods=['POST'])
+def join_waitlist_api():
+    """API: Join the waitlist for a full bus"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    try:
+        data = request.json or {}
+
+        if not all([data.get('bus_number'), data.get('travel_date'), data.get('from_stop'), data.get('to_stop')]):
+            return jsonify({'error': 'Missing required fields'}), 400
+
+        data['passenger_id'] = session.get('user_id', '')
+        data['passenger_name'] = session.get('full_name', '')
+        data['passenger_contact'] = session.get('phone', '')
+
+        result = booking_system.join_waitlist(data)
+
+        return jsonify(result), (200 if result.get('success') else 409)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/book/waitlist/<waitlist_id>', methods=['GET'])
+def waitlist_status_api(waitlist_id):
+    """API: Waitlist position, or the ticket issued on promotion"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    status = booking_system.get_waitlist_status(waitlist_id)
+    if status is None:
+        return jsonify({'error': 'Waitlist entry not found'}), 404
+
+    return jsonify({'success': True, **status})
+
+@app.route('/api/book/waitlist/<waitlist_id>', methods=['DELETE'])
+def leave_waitlist_api(waitlist_id):
+    """API: Leave a waitlist"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    result = booking_system.leave_waitlist(waitlist_id, session.get('user_id', ''))
+    return jsonify(result), (200 if result.get('success') else 404)
+
+@app.route('/api/fares/<route_id>')
+def fare_table_api(route_id):
+    """API: Full origin/destination fare table for a route"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    bus_types = request.args.getlist('bus_type') or None
+    table = booking_system.get_fare_table(route_id, bus_types)
+    if table is None:
+        return jsonify({'error': 'Route not found'}), 404
+
+    return jsonify({'success': True, **table})
+
+@app.route('/api/fares/quote', methods=['POST'])
+def fare_quote_api():
+    """API: Batch fare quote for several stop pairs on one route"""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    try:
+        data = request.json or {}
+        route_id = data.get('route_id')
+        trips = data.get('trips')
+
+        if not route_id or not isinstance(trips, list):
+            return jsonify({'error': 'Missing required fields'}), 400
+        if not all(isinstance(t, dict) and isinstance(t.get('from_stop'), str) and isinstance(t.get('to_stop'), str)
+                   for t in trips):
+            return jsonify({'error': 'Each trip needs from_stop and to_stop'}), 400
+
+        quotes = booking_system.quote_fares(route_id, data.get('bus_type', 'regular'), trips)
+        if quotes is None:
+            return jsonify({'error': 'Route not found'}), 404
+
+        return jsonify({'success': True, 'quotes': quotes, 'count': len(quotes)})
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1991,8 +2241,12 @@ def cancel_ticket_api(ticket_id):
         return jsonify({'error': 'Unauthorized'}), 401
     
     try:
-        result = booking_system.cancel_ticket(ticket_id)
-        return jsonify(result)
+        result = booking_system.cancel_ticket(
+            ticket_id,
+            idempotency_key=request.headers.get('Idempotency-Key'),
+            passenger_id=session.get('user_id', '')
+        )
+        return _idempotent_response(result)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -2080,25 +2334,7 @@ def get_passenger_stats_api():
     
     try:
         passenger_id = session.get('user_id', '')
-        tickets = booking_system.get_passenger_tickets(passenger_id)
-        
-        stats = {
-            'total_tickets': len(tickets),
-            'active_tickets': len([t for t in tickets if t.get('status') == 'confirmed']),
-            'total_spent': sum(t.get('fare', 0) for t in tickets if t.get('status') == 'confirmed'),
-            'favorite_route': '',
-            'last_ticket': tickets[0] if tickets else None
-        }
-        
-        # Find favorite route
-        route_counts = {}
-        for ticket in tickets:
-            route = ticket.get('route_name', '')
-            if route:
-                route_counts[route] = route_counts.get(route, 0) + 1
-        
-        if route_counts:
-            stats['favorite_route'] = max(route_counts, key=route_counts.get)
+        stats = booking_system.get_passenger_statistics(passenger_id)
         
         return jsonify({
             'success': True,
@@ -2126,44 +2362,21 @@ def download_ticket(ticket_id):
             flash('Access denied!', 'error')
             return redirect(url_for('passenger_my_tickets'))
         
-        # Generate download content
+        # Unchanged ticket: let the browser reuse its copy
+        etag = booking_system.ticket_renderer.etag(ticket)
+        if etag in request.if_none_match:
+            response = make_response('', 304)
+            response.set_etag(etag)
+            return response
+        
         filename = f"ticket_{ticket_id}.txt"
-        content = f"""
-========================================
-        BUS TICKET
-========================================
-Ticket ID: {ticket.get('ticket_id')}
-Booking Date: {ticket.get('booking_time')}
-Status: {ticket.get('status')}
-----------------------------------------
-PASSENGER INFORMATION
-Name: {ticket.get('passenger_name')}
-Contact: {ticket.get('passenger_contact')}
-----------------------------------------
-JOURNEY DETAILS
-From: {ticket.get('from_stop')}
-To: {ticket.get('to_stop')}
-Date: {ticket.get('travel_date')}
-----------------------------------------
-BUS DETAILS
-Bus Number: {ticket.get('bus_number')}
-Route: {ticket.get('route_name')}
-Seat Number: {ticket.get('seat_number')}
-----------------------------------------
-TIMINGS
-Departure: {ticket.get('departure_time')}
-Arrival: {ticket.get('arrival_time')}
-----------------------------------------
-FARE: Rs. {ticket.get('fare')}
-Payment Status: {ticket.get('payment_status')}
-----------------------------------------
-QR Code: {ticket.get('qr_code')}
-========================================
-"""
+        content = booking_system.ticket_renderer.render(ticket)
         
         response = make_response(content)
         response.headers["Content-Disposition"] = f"attachment; filename={filename}"
         response.headers["Content-type"] = "text/plain"
+        response.headers["Cache-Control"] = "private, no-cache"
+        response.set_etag(etag)
         
         return response
         
@@ -0,0 +1,197 @@
+"""
+Ticket Archive
+Tickets whose travel date has passed leave the in-memory store for an
+append-only JSON-lines file with a sidecar offset index:
+
+    tickets_archive.jsonl      one ticket per line
+    tickets_archive.jsonl.idx  [ticket_id, passenger_id, booking_date, offset, length] per line
+
+Only the index stays resident; a record is faulted in from an mmap of the
+archive by its byte offset when it is asked for. Records are appended and
+flushed before their index lines, and a tail missing from the index (crash
+between the two) is re-indexed on open.
+"""
+import json
+import mmap
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .persistence import FSYNC_DEFAULT, atomic_write_text
+
+
+class TicketArchive:
+    """Past-date tickets read on demand by ticket_id, passenger or booking date"""
+    def __init__(self, path: str, fsync: bool = FSYNC_DEFAULT):
+        self.path = path
+        self.index_path = f"{path}.idx"
+        self.fsync = fsync
+        self.offsets = {}       # ticket_id -> (offset, length)
+        self.by_passenger = {}  # passenger_id -> [ticket_id] in archive order
+        self.date_keys = []     # sorted (booking_date, offset)
+        self.date_ids = []      # ticket_id aligned with date_keys
+        self.faults = 0
+        self._end = 0           # archive bytes covered by the index
+        self._map = None
+        self._lock = threading.RLock()
+        self._open()
+
+    @staticmethod
+    def _booking_date(ticket: Dict) -> str:
+        return ticket.get('booking_date') or (ticket.get('booking_time') or '')[:10]
+
+    def _index(self, ticket_id: str, passenger_id: str, booking_date: str, offset: int, length: int) -> None:
+        self.offsets[ticket_id] = (offset, length)
+        self.by_passenger.setdefault(passenger_id, []).append(ticket_id)
+        key = (booking_date, offset)
+        pos = bisect_right(self.date_keys, key)
+        self.date_keys.insert(pos, key)
+        self.date_ids.insert(pos, ticket_id)
+        self._end = max(self._end, offset + length)
+
+    def _open(self) -> None:
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        entries, clean = [], True
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        offset, length = entry[3], entry[4]
+                    except (ValueError, IndexError):
+                        clean = False  # torn last line
+                        break
+                    if offset + length > size:
+                        clean = False  # archive shorter than its index: keep what is really there
+                        break
+                    entries.append(entry)
+        for entry in entries:
+            self._index(*entry)
+
+        tail = self._scan_tail() if size > self._end else []
+        for entry in tail:
+            self._index(*entry)
+        if not clean:
+            atomic_write_text(self.index_path, ''.join(json.dumps(entry) + '\n' for entry in entries + tail),
+                              fsync=self.fsync)
+        else:
+            self._append_index(tail)
+        if self._end < size:
+            with open(self.path, 'r+b') as f:
+                f.truncate(self._end)  # torn record: dropped
+        self._remap()
+
+    def _scan_tail(self) -> List:
+        """Index entries of records appended after the last index write"""
+        entries = []
+        with open(self.path, 'rb') as f:
+            f.seek(self._end)
+            offset = self._end
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    ticket = json.loads(line)
+                except ValueError:
+                    break
+                entries.append([ticket.get('ticket_id'), ticket.get('passenger_id', ''),
+                                self._booking_date(ticket), offset, len(line)])
+                offset += len(line)
+        return entries
+
+    def _append_index(self, entries: List) -> None:
+        if not entries:
+            return
+        with open(self.index_path, 'a') as f:
+            f.write(''.join(json.dumps(entry) + '\n' for entry in entries))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def _remap(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._end == 0:
+            return
+        with open(self.path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def append(self, tickets: Iterable[Dict]) -> int:
+        """Move tickets into the archive (durable once this returns); already archived ids are skipped"""
+        with self._lock:
+            lines = []
+            for ticket in tickets:
+                ticket_id = ticket.get('ticket_id')
+                if ticket_id and ticket_id not in self.offsets:
+                    lines.append((ticket, (json.dumps(ticket) + '\n').encode()))
+            if not lines:
+                return 0
+
+            entries = []
+            with open(self.path, 'ab') as f:
+                offset = f.tell()
+                for ticket, line in lines:
+                    f.write(line)
+                    entries.append([ticket['ticket_id'], ticket.get('passenger_id', ''),
+                                    self._booking_date(ticket), offset, len(line)])
+                    offset += len(line)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            self._append_index(entries)
+            for entry in entries:
+                self._index(*entry)
+            self._remap()
+            return len(entries)
+
+    def get(self, ticket_id: str) -> Optional[Dict]:
+        """Fault one ticket in from the archive"""
+        with self._lock:
+            location = self.offsets.get(ticket_id)
+            if location is None or self._map is None:
+                return None
+            offset, length = location
+            self.faults += 1
+            return json.loads(self._map[offset:offset + length])
+
+    def __contains__(self, ticket_id: str) -> bool:
+        return ticket_id in self.offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def for_passenger(self, passenger_id: str) -> List[Dict]:
+        """A passenger's archived tickets in booking order"""
+        return [self.get(ticket_id) for ticket_id in list(self.by_passenger.get(passenger_id, ()))]
+
+    def booked_between(self, start_date: str, end_date: str) -> List[Dict]:
+        """Archived tickets booked between two YYYY-MM-DD dates inclusive"""
+        with self._lock:
+            lo = bisect_left(self.date_keys, (start_date,))
+            hi = bisect_right(self.date_keys, (end_date, float('inf')))
+            ids = self.date_ids[lo:hi]
+        return [self.get(ticket_id) for ticket_id in ids]
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Every archived ticket in archive order, read sequentially (not kept resident)"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if line.endswith(b'\n'):
+                    yield json.loads(line)
+
+    def statistics(self) -> Dict:
+        return {
+            'archived_tickets': len(self.offsets),
+            'archive_bytes': self._end,
+            'faults': self.faults,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
@@ -0,0 +1,95 @@
+"""
+Availability Result Cache
+Bounded LRU of get_available_buses results with a reverse index
+"{bus_number}_{date}" -> cached queries, so a seat change drops exactly the
+results that list that bus on that date. Route or bus edits clear everything.
+A result computed while seats changed is only dropped when one of the buses
+it lists changed, so steady booking elsewhere doesn't starve the cache.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional
+
+
+class AvailabilityCache:
+    """Query results keyed by (from_stop, to_stop, date, time bucket)"""
+    def __init__(self, capacity: int = 2048):
+        self.capacity = capacity
+        self.results = OrderedDict()  # query key -> (results, bus_keys)
+        self.by_bus = {}              # bus_key -> {query key}
+        self.version = 0              # bumped on every invalidation
+        self.bus_versions = {}        # bus_key -> version of its last invalidation
+        self.floor = 0                # results computed before this version are never stored
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[List[Dict]]:
+        with self._lock:
+            entry = self.results.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.results.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, results: List[Dict], bus_keys: Iterable[str], version: int) -> bool:
+        """Store a result computed at version; dropped if a listed bus changed meanwhile"""
+        with self._lock:
+            bus_keys = tuple(bus_keys)
+            if version < self.floor or any(self.bus_versions.get(b, 0) > version for b in bus_keys):
+                return False
+            self._drop(key)
+            self.results[key] = (results, bus_keys)
+            for bus_key in bus_keys:
+                self.by_bus.setdefault(bus_key, set()).add(key)
+            while len(self.results) > self.capacity:
+                self._drop(next(iter(self.results)))
+            return True
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self.results.pop(key, None)
+        if entry is None:
+            return
+        for bus_key in entry[1]:
+            keys = self.by_bus.get(bus_key)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_bus[bus_key]
+
+    def invalidate_bus(self, bus_key: str) -> None:
+        """Drop every cached result listing this bus on this date"""
+        with self._lock:
+            self.version += 1
+            self.bus_versions[bus_key] = self.version
+            if len(self.bus_versions) > 4 * self.capacity:
+                # Bound the stamps: forget them all and refuse anything computed before now
+                self.bus_versions.clear()
+                self.floor = self.version
+            for key in list(self.by_bus.get(bus_key, ())):
+                self._drop(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop everything (route or bus edits)"""
+        with self._lock:
+            self.version += 1
+            self.floor = self.version
+            self.bus_versions.clear()
+            self.invalidations += len(self.results)
+            self.results.clear()
+            self.by_bus.clear()
+
+    def statistics(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'capacity': self.capacity,
+            'size': len(self.results),
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / total if total else 0
+        }
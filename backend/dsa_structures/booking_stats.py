@@ -0,0 +1,138 @@
+"""
+Incrementally maintained booking statistics
+Running aggregates updated on every booking and cancellation, so stats reads are O(1)
+Money is kept in integer paisa so repeated add/subtract never drifts
+"""
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+
+def _to_paisa(fare) -> int:
+    try:
+        return int(round(float(fare or 0) * 100))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _new_rollup() -> Dict:
+    return {'tickets': 0, 'active': 0, 'cancelled': 0, 'revenue': 0}
+
+
+class BookingStatistics:
+    """Global counters plus per-passenger, per-route and per-day rollups"""
+    def __init__(self):
+        self.totals = _new_rollup()
+        self.by_passenger = {}  # passenger_id -> rollup + route_counts + first_ticket (ticket_id)
+        self.by_route = {}      # route_name -> rollup
+        self.by_day = {}        # travel_date -> rollup
+        self._lock = threading.Lock()
+
+    def _rollups(self, ticket: Dict):
+        passenger = self.by_passenger.get(ticket.get('passenger_id', ''))
+        if passenger is None:
+            passenger = {**_new_rollup(), 'spent': 0, 'route_counts': {}, 'first_ticket': ticket.get('ticket_id')}
+            self.by_passenger[ticket.get('passenger_id', '')] = passenger
+        route = self.by_route.setdefault(ticket.get('route_name', ''), _new_rollup())
+        day = self.by_day.setdefault(ticket.get('travel_date', ''), _new_rollup())
+        return passenger, (self.totals, passenger, route, day)
+
+    @staticmethod
+    def _earns_revenue(ticket: Dict) -> bool:
+        return ticket.get('status') == 'confirmed' and ticket.get('payment_status') == 'paid'
+
+    def record_booking(self, ticket: Dict) -> None:
+        """Count a ticket as it is added to the store"""
+        fare = _to_paisa(ticket.get('fare'))
+        with self._lock:
+            passenger, rollups = self._rollups(ticket)
+            for rollup in rollups:
+                rollup['tickets'] += 1
+                if ticket.get('status') == 'confirmed':
+                    rollup['active'] += 1
+                elif ticket.get('status') == 'cancelled':
+                    rollup['cancelled'] += 1
+                if self._earns_revenue(ticket):
+                    rollup['revenue'] += fare
+
+            if ticket.get('status') == 'confirmed':
+                passenger['spent'] += fare
+            route_name = ticket.get('route_name', '')
+            if route_name:
+                passenger['route_counts'][route_name] = passenger['route_counts'].get(route_name, 0) + 1
+
+    def record_cancellation(self, ticket: Dict) -> None:
+        """Move a ticket from active to cancelled; call with the ticket as it was before cancelling"""
+        fare = _to_paisa(ticket.get('fare'))
+        was_active = ticket.get('status') == 'confirmed'
+        earned = self._earns_revenue(ticket)
+        with self._lock:
+            passenger, rollups = self._rollups(ticket)
+            for rollup in rollups:
+                if was_active:
+                    rollup['active'] -= 1
+                rollup['cancelled'] += 1
+                if earned:
+                    rollup['revenue'] -= fare
+            if was_active:
+                passenger['spent'] -= fare
+
+    def rebuild(self, tickets: Iterable[Dict]) -> None:
+        """Recompute every aggregate from scratch (used at startup)"""
+        with self._lock:
+            self.totals = _new_rollup()
+            self.by_passenger = {}
+            self.by_route = {}
+            self.by_day = {}
+        for ticket in tickets:
+            self.record_booking(ticket)
+
+    @staticmethod
+    def _public(rollup: Optional[Dict]) -> Dict:
+        rollup = rollup or _new_rollup()
+        return {
+            'total_tickets': rollup['tickets'],
+            'active_tickets': rollup['active'],
+            'cancelled_tickets': rollup['cancelled'],
+            'total_revenue': round(rollup['revenue'] / 100, 2),
+        }
+
+    def summary(self) -> Dict:
+        """Global ticket counts and revenue"""
+        with self._lock:
+            return self._public(self.totals)
+
+    def route_summary(self, route_name: str) -> Dict:
+        with self._lock:
+            return self._public(self.by_route.get(route_name))
+
+    def day_summary(self, travel_date: str) -> Dict:
+        with self._lock:
+            return self._public(self.by_day.get(travel_date))
+
+    def passenger_summary(self, passenger_id: str, resolve: Optional[Callable[[str], Optional[Dict]]] = None) -> Dict:
+        """Per-passenger stats in the shape served by /api/passenger/stats
+
+        Only the first ticket's id is kept; resolve turns it back into the ticket.
+        """
+        with self._lock:
+            passenger = self.by_passenger.get(passenger_id)
+            if not passenger:
+                return {
+                    'total_tickets': 0,
+                    'active_tickets': 0,
+                    'total_spent': 0,
+                    'favorite_route': '',
+                    'last_ticket': None
+                }
+            route_counts = passenger['route_counts']
+            first_ticket = passenger['first_ticket']
+            summary = {
+                'total_tickets': passenger['tickets'],
+                'active_tickets': passenger['active'],
+                'total_spent': round(passenger['spent'] / 100, 2),
+                'favorite_route': max(route_counts, key=route_counts.get) if route_counts else '',
+                'last_ticket': first_ticket
+            }
+        if resolve is not None and first_ticket:
+            summary['last_ticket'] = resolve(first_ticket)
+        return summary
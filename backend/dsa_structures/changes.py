@@ -0,0 +1,138 @@
+"""
+Cross-Worker Change Notification
+Each dataset has a generation signature that moves on every save:
+- JSON files: (inode, size, mtime_ns) from one stat(); durable writes rename a
+  new inode into place, so every save changes it
+- SQLite: a per-table generation counter bumped in the writing transaction
+Workers poll the signatures (at most once per interval) and reload only the
+datasets that moved. Writes made by this worker are acknowledged as they
+happen, so a worker never re-reads what it just saved; derived views
+(availability, trip tables, indexes) still refresh, except after writes made
+inside quiet() by the only holder of that state (write-behind counters).
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, List, Optional
+
+
+def file_signature(path: str) -> Optional[tuple]:
+    """(inode, size, mtime_ns) of a file, None when it does not exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class _Dataset:
+    __slots__ = ('name', 'signature', 'reload', 'dependents', 'seen', 'own_change', 'reloads')
+
+    def __init__(self, name: str, signature: Callable[[], Hashable], reload: Optional[Callable[[], None]]):
+        self.name = name
+        self.signature = signature
+        self.reload = reload          # refreshes the primary in-memory copy (skipped for own writes)
+        self.dependents = []          # run after every change, own writes included
+        self.seen = signature()
+        self.own_change = False
+        self.reloads = 0
+
+
+class ChangeWatcher:
+    """Reload datasets in this worker when another worker changed them"""
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self.datasets = {}  # name -> _Dataset
+        self.polls = 0
+        self._last_poll = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def watch(self, name: str, signature: Callable[[], Hashable], reload: Optional[Callable[[], None]] = None,
+              dependents: List[Callable[[], None]] = ()) -> None:
+        """Track a dataset by its signature function"""
+        dataset = _Dataset(name, signature, reload)
+        dataset.dependents.extend(dependents)
+        with self._lock:
+            self.datasets[name] = dataset
+
+    def watch_file(self, name: str, path: str, reload: Optional[Callable[[], None]] = None,
+                   dependents: List[Callable[[], None]] = ()) -> None:
+        self.watch(name, lambda: file_signature(path), reload, dependents)
+
+    def acknowledge(self, name: str, signature: Hashable) -> None:
+        """This worker wrote the dataset and already holds that state in memory"""
+        with self._lock:
+            dataset = self.datasets.get(name)
+            if dataset is not None:
+                dataset.seen = signature
+                if not getattr(self._local, 'quiet', False):
+                    dataset.own_change = True
+
+    @contextmanager
+    def quiet(self):
+        """Writes acknowledged from this thread meanwhile run no dependents either"""
+        self._local.quiet = True
+        try:
+            yield
+        finally:
+            self._local.quiet = False
+
+    def poll(self, force: bool = False) -> List[str]:
+        """Reload changed datasets; cheap when nothing changed (one stat or query each)"""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_poll < self.interval:
+                return []
+            self._last_poll = now
+            self.polls += 1
+            changed = []
+            for dataset in self.datasets.values():
+                signature = dataset.signature()
+                foreign = signature != dataset.seen
+                if not foreign and not dataset.own_change:
+                    continue
+                dataset.seen = signature
+                dataset.own_change = False
+                changed.append((dataset, foreign))
+
+        reloaded = []
+        for dataset, foreign in changed:
+            try:
+                if foreign and dataset.reload is not None:
+                    dataset.reload()
+                    dataset.reloads += 1
+                for dependent in dataset.dependents:
+                    dependent()
+            except Exception as e:
+                print(f"Error reloading {dataset.name}: {e}")
+                continue
+            reloaded.append(dataset.name)
+        return reloaded
+
+    def statistics(self) -> Dict:
+        return {
+            'interval': self.interval,
+            'polls': self.polls,
+            'reloads': {name: d.reloads for name, d in self.datasets.items()},
+        }
+
+
+class SignatureCache:
+    """A value derived from a dataset, recomputed only when its signature moves"""
+    def __init__(self, signature: Callable[[], Hashable], load: Callable[[], object]):
+        self.signature = signature
+        self.load = load
+        self._entry = (object(), None)
+        self._lock = threading.Lock()
+
+    def get(self):
+        signature = self.signature()
+        entry = self._entry
+        if entry[0] == signature and signature is not None:
+            return entry[1]
+        with self._lock:
+            value = self.load()
+            self._entry = (signature, value)
+            return value
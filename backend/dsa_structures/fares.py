@@ -0,0 +1,151 @@
+"""
+Fare Engine
+Per-route fare matrices precomputed once per bus type:
+- fare[i][j] = (base + stops * per_stop + km * per_km) * type multiplier
+- km comes from prefix sums over distance_from_previous
+Single quotes are an O(1) index into a flat array, full tables come back in one call
+"""
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .utils import LRUCache
+
+DEFAULT_TYPE_MULTIPLIERS = {'air_conditioned': 1.5, 'luxury': 2.0}
+
+
+@dataclass
+class FareRules:
+    """Fare rule set; per_km is 0 (stop-count fares only) unless configured"""
+    base: float = 50
+    per_stop: float = 10
+    per_km: float = 0
+    multipliers: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_TYPE_MULTIPLIERS))
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict], defaults: 'FareRules' = None) -> 'FareRules':
+        """Build rules from a config dict, falling back to defaults for missing keys"""
+        defaults = defaults or cls()
+        data = data or {}
+        return cls(
+            base=float(data.get('base', defaults.base)),
+            per_stop=float(data.get('per_stop', defaults.per_stop)),
+            per_km=float(data.get('per_km', defaults.per_km)),
+            multipliers={**defaults.multipliers, **(data.get('multipliers') or {})},
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            'base': self.base,
+            'per_stop': self.per_stop,
+            'per_km': self.per_km,
+            'multipliers': dict(self.multipliers),
+        }
+
+
+def _stop_distances(stops: List[Dict]) -> List[float]:
+    """Cumulative km from the first stop"""
+    prefix = [0.0]
+    for stop in stops[1:]:
+        try:
+            km = float(stop.get('distance_from_previous', 0) or 0)
+        except (TypeError, ValueError):
+            km = 0.0
+        prefix.append(prefix[-1] + max(km, 0.0))
+    return prefix
+
+
+class FareMatrix:
+    """n x n fares for one route and bus type, stored row-major in a flat array"""
+    def __init__(self, route: Dict, bus_type: str, rules: FareRules):
+        stops = [s for s in route.get('stops', []) if isinstance(s, dict)]
+        self.route_id = route.get('route_id', '')
+        self.bus_type = bus_type
+        self.stop_names = [s.get('stop_name') for s in stops]
+        self.size = n = len(stops)
+
+        multiplier = rules.multipliers.get(bus_type)
+        km = _stop_distances(stops) if rules.per_km else [0.0] * n
+        self.fares = array('d', bytes(8 * n * n))
+        for i in range(n):
+            row = i * n
+            for j in range(n):
+                fare = rules.base + (j - i) * rules.per_stop + (km[j] - km[i]) * rules.per_km
+                if multiplier is not None:
+                    fare *= multiplier
+                self.fares[row + j] = round(fare, 2)
+
+    def fare(self, from_idx: int, to_idx: int) -> Optional[float]:
+        """O(1) lookup; None when an index is outside the route"""
+        n = self.size
+        if not (0 <= from_idx < n and 0 <= to_idx < n):
+            return None
+        return self.fares[from_idx * n + to_idx]
+
+    def table(self) -> List[List[Optional[float]]]:
+        """Forward fares as rows (None where the destination is not after the origin)"""
+        n = self.size
+        return [
+            [self.fares[i * n + j] if j > i else None for j in range(n)]
+            for i in range(n)
+        ]
+
+
+class FareEngine:
+    """Builds and caches fare matrices per (route, bus type)"""
+    def __init__(self, rules: FareRules = None, cache_size: int = 256):
+        self.rules = rules or FareRules()
+        self.matrices = LRUCache(cache_size)
+
+    def rules_for(self, route: Dict) -> FareRules:
+        """Engine rules, overridden by the route's own fare_rules if it has any"""
+        overrides = route.get('fare_rules')
+        if isinstance(overrides, dict) and overrides:
+            return FareRules.from_dict(overrides, self.rules)
+        return self.rules
+
+    def matrix(self, route: Dict, bus_type: str = 'regular') -> FareMatrix:
+        # Entries hold their route: a replaced route dict rebuilds, a recycled id() can't match
+        key = (route.get('route_id', ''), bus_type)
+        entry = self.matrices.get(key)
+        if entry is None or entry[0] is not route:
+            entry = (route, FareMatrix(route, bus_type, self.rules_for(route)))
+            self.matrices.put(key, entry)
+        return entry[1]
+
+    def quote(self, route: Dict, bus_type: str, from_idx: int, to_idx: int) -> float:
+        """Fare between two stop indexes, priced by formula when outside the matrix"""
+        fare = self.matrix(route, bus_type).fare(from_idx, to_idx)
+        if fare is not None:
+            return fare
+        rules = self.rules_for(route)
+        fare = rules.base + (to_idx - from_idx) * rules.per_stop
+        multiplier = rules.multipliers.get(bus_type)
+        if multiplier is not None:
+            fare *= multiplier
+        return round(fare, 2)
+
+    def quote_many(self, route: Dict, bus_type: str,
+                   pairs: Iterable[Tuple[int, int]]) -> List[Optional[float]]:
+        """Batch quote (from_idx, to_idx) pairs against one matrix"""
+        matrix = self.matrix(route, bus_type)
+        return [matrix.fare(from_idx, to_idx) for from_idx, to_idx in pairs]
+
+    def fare_table(self, route: Dict, bus_types: Iterable[str] = ('regular',)) -> Dict:
+        """Every origin/destination fare on a route, per bus type"""
+        tables = {}
+        stops = []
+        for bus_type in bus_types:
+            matrix = self.matrix(route, bus_type)
+            stops = matrix.stop_names
+            tables[bus_type] = matrix.table()
+        return {
+            'route_id': route.get('route_id', ''),
+            'route_name': route.get('route_name', ''),
+            'stops': stops,
+            'rules': self.rules_for(route).to_dict(),
+            'fares': tables,
+        }
+
+    def invalidate(self) -> None:
+        self.matrices.clear()
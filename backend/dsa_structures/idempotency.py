@@ -0,0 +1,69 @@
+"""
+Idempotency Keys
+Responses of booking and cancellation requests remembered per (scope, key) in a
+bounded TTL table: a retried request gets the original response back in O(1)
+without booking another seat or rewriting the ticket store.
+"""
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from .utils import TTLCache
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Stable hash of a request body, used to reject a key reused for a different request"""
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class _Pending:
+    """Slot for a request whose first attempt is still running"""
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.response = None
+
+
+class IdempotencyTable:
+    """(scope, key) -> original response, bounded and TTL-evicted"""
+    def __init__(self, capacity: int = 10000, ttl: float = 3600.0, wait_timeout: float = 30.0):
+        self.responses = TTLCache(capacity, ttl)
+        self.wait_timeout = wait_timeout
+        self.replays = 0
+        self.conflicts = 0
+
+    def run(self, key: Hashable, fingerprint: str, func: Callable[[], Dict]) -> Dict:
+        """Run func once per key; duplicates get the first response with idempotent_replay set
+
+        A duplicate that arrives while the first attempt is running waits for it.
+        Exceptions are not remembered, so the client can retry after a crash.
+        """
+        pending = _Pending(fingerprint)
+        slot = self.responses.setdefault(key, pending)
+
+        if slot is not pending:
+            if slot.fingerprint != fingerprint:
+                self.conflicts += 1
+                return {
+                    'success': False,
+                    'idempotency_conflict': True,
+                    'message': 'Idempotency key was already used for a different request'
+                }
+            if not slot.done.wait(self.wait_timeout) or slot.response is None:
+                return {'success': False, 'message': 'Original request is still in progress, retry later'}
+            self.replays += 1
+            return {**slot.response, 'idempotent_replay': True}
+
+        try:
+            pending.response = func()
+        except BaseException:
+            self.responses.pop(key)
+            raise
+        finally:
+            pending.done.set()
+        return pending.response
+
+    def statistics(self) -> Dict:
+        return {**self.responses.statistics(), 'replays': self.replays, 'conflicts': self.conflicts}
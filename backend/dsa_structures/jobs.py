@@ -0,0 +1,116 @@
+"""
+Background Job Queue for artifact generation (ticket text, later PDF/QR)
+Bounded FIFO queue drained by a small pool of worker threads
+Jobs sharing a key run one at a time, and a job still waiting to start is
+replaced by a newer one for its key (only the latest artifact matters)
+"""
+import atexit
+import queue
+import threading
+from typing import Any, Callable, Dict
+
+
+class ArtifactJobQueue:
+    """Bounded job queue with worker threads and caller-runs backpressure"""
+    def __init__(self, workers: int = 2, maxsize: int = 256, submit_timeout: float = 0.5):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.submit_timeout = submit_timeout
+        self._waiting = {}     # key -> (func, args) of the newest job not started yet
+        self._running = set()  # keys a thread is currently draining
+        self._lock = threading.Lock()
+        self._closed = False
+        self.completed = 0
+        self.failed = 0
+        self.ran_inline = 0
+        self.superseded = 0
+
+        self._workers = []
+        for i in range(workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"artifact-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+        atexit.register(self.shutdown)
+
+    def submit(self, key: str, func: Callable, *args: Any) -> bool:
+        """Queue a job; returns False if the queue was full (or closed) and the job ran inline"""
+        with self._lock:
+            if key in self._waiting:
+                self.superseded += 1
+            scheduled = key in self._waiting or key in self._running
+            self._waiting[key] = (func, args)
+        if scheduled:
+            # The thread holding this key picks up the newest job when it finishes
+            return True
+
+        if not self._closed:
+            try:
+                self.queue.put(key, timeout=self.submit_timeout)
+                return True
+            except queue.Full:
+                pass
+        # Backpressure: the producer does the work itself instead of growing the queue
+        with self._lock:
+            self.ran_inline += 1
+        self._drain(key)
+        return False
+
+    def _drain(self, key: str) -> None:
+        """Run the newest waiting job of key until none is left; one thread per key at a time"""
+        while True:
+            with self._lock:
+                job = self._waiting.pop(key, None)
+                if job is None:
+                    self._running.discard(key)
+                    return
+                self._running.add(key)
+            self._run(key, *job)
+
+    def _run(self, key: str, func: Callable, args: tuple) -> None:
+        ok = True
+        try:
+            func(*args)
+        except Exception as e:
+            ok = False
+            print(f"Artifact job {key} failed: {e}")
+        finally:
+            with self._lock:
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def _worker_loop(self) -> None:
+        while True:
+            key = self.queue.get()
+            if key is None:
+                self.queue.task_done()
+                break
+            self._drain(key)
+            self.queue.task_done()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting jobs and let workers drain the queue"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._workers:
+            self.queue.put(None)
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def stats(self) -> Dict:
+        """Get queue statistics"""
+        with self._lock:
+            pending = len(self._waiting.keys() | self._running)
+        return {
+            'queued': self.queue.qsize(),
+            'capacity': self.queue.maxsize,
+            'pending_keys': pending,
+            'completed': self.completed,
+            'failed': self.failed,
+            'ran_inline': self.ran_inline,
+            'superseded': self.superseded,
+            'workers': len(self._workers),
+        }
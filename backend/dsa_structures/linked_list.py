@@ -20,6 +20,7 @@ class LinkedList:
         self.head = None  # First stop
         self.tail = None  # Last stop
         self.size = 0     # Number of stops
+        self.version = 0  # Bumped on every change (dirty tracking for saves)
         self.route_id = None  # Route identifier
         self.route_name = ""  # Route name
     
@@ -39,6 +40,7 @@ class LinkedList:
             self.head = new_node
         
         self.size += 1
+        self.version += 1
         return new_node
     
     def add_last(self, data):
@@ -53,6 +55,7 @@ class LinkedList:
             self.tail = new_node
         
         self.size += 1
+        self.version += 1
         return new_node
     
     def insert_at(self, position, data):
@@ -80,6 +83,7 @@ class LinkedList:
         current.next = new_node
         
         self.size += 1
+        self.version += 1
         return new_node
     
     def remove_first(self):
@@ -95,6 +99,7 @@ class LinkedList:
             self.head.prev = None
         
         self.size -= 1
+        self.version += 1
         return removed.data
     
     def remove_last(self):
@@ -110,6 +115,7 @@ class LinkedList:
             self.tail.next = None
         
         self.size -= 1
+        self.version += 1
         return removed.data
     
     def remove_at(self, position):
@@ -132,6 +138,7 @@ class LinkedList:
         current.next.prev = current.prev
         
         self.size -= 1
+        self.version += 1
         return current.data
     
     def get_at(self, position):
@@ -155,6 +162,7 @@ class LinkedList:
             current = current.next
         
         current.data = data
+        self.version += 1
         return current.data
     
     def find_stop(self, stop_id):
@@ -201,6 +209,7 @@ class LinkedList:
         """Clear the entire route"""
         self.head = self.tail = None
         self.size = 0
+        self.version += 1
     
     def __len__(self):
         return self.size
@@ -0,0 +1,51 @@
+"""
+Concurrency primitives for the booking system
+1. Striped Lock for fine-grained (bus, date) locking
+2. Atomic Counter for ticket ID allocation
+"""
+import threading
+from contextlib import contextmanager
+from typing import Hashable
+
+
+class StripedLock:
+    """Fixed array of locks; a key always maps to the same stripe"""
+    def __init__(self, stripes: int = 64):
+        if stripes < 1:
+            raise ValueError("stripes must be at least 1")
+        self.stripes = stripes
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def _index(self, key: Hashable) -> int:
+        return hash(key) % self.stripes
+
+    def lock_for(self, key: Hashable) -> threading.Lock:
+        """Get the lock guarding a key (O(1))"""
+        return self._locks[self._index(key)]
+
+    @contextmanager
+    def hold(self, key: Hashable):
+        """Hold the lock for a key for the duration of a with-block"""
+        lock = self.lock_for(key)
+        with lock:
+            yield
+
+
+class AtomicCounter:
+    """Thread-safe monotonically increasing counter"""
+    def __init__(self, start: int = 0):
+        self._value = start
+        self._lock = threading.Lock()
+
+    def next(self) -> int:
+        """Return the current value and advance the counter"""
+        with self._lock:
+            value = self._value
+            self._value += 1
+            return value
+
+    @property
+    def value(self) -> int:
+        """Next value that will be handed out"""
+        with self._lock:
+            return self._value
@@ -5,77 +5,204 @@ Passenger Ticket Booking System with Data Structures
 3. Min Heap for Ticket Priority
 4. Linked List for Booking History
 """
+import base64
 import json
+import os
 import uuid
 from datetime import datetime, timedelta, time
 from dataclasses import dataclass, asdict
 from typing import Optional, List, Dict, Any
 import heapq
+import threading
+from bisect import bisect_left, bisect_right
 from collections import deque
+from itertools import chain
+from .locks import StripedLock, AtomicCounter
+from .jobs import ArtifactJobQueue
+from .ticket_render import TicketRenderer
+from .persistence import WriteBehindFlusher, atomic_write_text, durable_write, durable_write_json
+from .route_store import load_routes_document
+from .streaming import load_json_streaming
+from .booking_stats import BookingStatistics
+from .timetable import TripTableStore, day_key_for, format_minutes
+from .fares import FareEngine
+from .waitlist import TripWaitlist
+from .idempotency import IdempotencyTable, request_fingerprint
+from .availability import AvailabilityCache
+from .archive import TicketArchive
+
+# Bus fields the booking system changes itself (written behind, kept across reloads)
+BUS_COUNTER_FIELDS = ('current_passengers', 'last_updated')
 
 # ===================== DATA STRUCTURES =====================
 
 # ---------- Binary Search Tree (BST) for Passengers ----------
 class BSTNode:
-    """Binary Search Tree Node for Passenger Storage"""
+    """AVL Tree Node for Passenger Storage"""
     def __init__(self, passenger_id: str, passenger_data: dict):
         self.passenger_id = passenger_id
         self.data = passenger_data
         self.left = None
         self.right = None
+        self.height = 1
+        self.count = 1  # nodes in this subtree
+
+def _height(node: Optional[BSTNode]) -> int:
+    return node.height if node else 0
+
+def _count(node: Optional[BSTNode]) -> int:
+    return node.count if node else 0
 
 class PassengerBST:
-    """Binary Search Tree for Efficient Passenger Search"""
+    """Self-balancing (AVL) Binary Search Tree for Efficient Passenger Search
+    
+    All operations are iterative, so deep trees never hit the recursion limit.
+    Subtree sizes give O(1) size and O(log n) rank/select.
+    """
     def __init__(self):
         self.root = None
     
-    def insert(self, passenger_id: str, passenger_data: dict) -> None:
-        """Insert passenger into BST"""
-        if not self.root:
-            self.root = BSTNode(passenger_id, passenger_data)
-        else:
-            self._insert_recursive(self.root, passenger_id, passenger_data)
+    @property
+    def size(self) -> int:
+        return _count(self.root)
     
-    def _insert_recursive(self, node: BSTNode, passenger_id: str, passenger_data: dict) -> None:
-        if passenger_id < node.passenger_id:
-            if node.left:
-                self._insert_recursive(node.left, passenger_id, passenger_data)
-            else:
-                node.left = BSTNode(passenger_id, passenger_data)
-        else:
-            if node.right:
-                self._insert_recursive(node.right, passenger_id, passenger_data)
+    def __len__(self) -> int:
+        return _count(self.root)
+    
+    @staticmethod
+    def _update(node: BSTNode) -> None:
+        node.height = 1 + max(_height(node.left), _height(node.right))
+        node.count = 1 + _count(node.left) + _count(node.right)
+    
+    def _rotate_right(self, node: BSTNode) -> BSTNode:
+        pivot = node.left
+        node.left = pivot.right
+        pivot.right = node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+    
+    def _rotate_left(self, node: BSTNode) -> BSTNode:
+        pivot = node.right
+        node.right = pivot.left
+        pivot.left = node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+    
+    def _rebalance(self, node: BSTNode) -> BSTNode:
+        self._update(node)
+        balance = _height(node.left) - _height(node.right)
+        if balance > 1:
+            if _height(node.left.left) < _height(node.left.right):
+                node.left = self._rotate_left(node.left)
+            return self._rotate_right(node)
+        if balance < -1:
+            if _height(node.right.right) < _height(node.right.left):
+                node.right = self._rotate_right(node.right)
+            return self._rotate_left(node)
+        return node
+    
+    def insert(self, passenger_id: str, passenger_data: dict) -> None:
+        """Insert passenger into AVL tree O(log n); an existing ID is updated in place"""
+        path = []  # nodes from root down to the parent of the new node
+        node = self.root
+        while node:
+            if passenger_id == node.passenger_id:
+                node.data = passenger_data
+                return
+            path.append(node)
+            node = node.left if passenger_id < node.passenger_id else node.right
+        
+        child = BSTNode(passenger_id, passenger_data)
+        # Walk back up, attaching the (possibly rotated) child and rebalancing each ancestor
+        while path:
+            parent = path.pop()
+            if passenger_id < parent.passenger_id:
+                parent.left = child
             else:
-                node.right = BSTNode(passenger_id, passenger_data)
+                parent.right = child
+            child = self._rebalance(parent)
+        self.root = child
     
     def search(self, passenger_id: str) -> Optional[dict]:
         """Search passenger by ID using BST O(log n)"""
-        return self._search_recursive(self.root, passenger_id)
+        node = self.root
+        while node:
+            if passenger_id == node.passenger_id:
+                return node.data
+            node = node.left if passenger_id < node.passenger_id else node.right
+        return None
     
-    def _search_recursive(self, node: BSTNode, passenger_id: str) -> Optional[dict]:
-        if not node:
+    def rank(self, passenger_id: str) -> int:
+        """Number of passengers with an ID smaller than passenger_id O(log n)"""
+        rank = 0
+        node = self.root
+        while node:
+            if passenger_id <= node.passenger_id:
+                node = node.left
+            else:
+                rank += _count(node.left) + 1
+                node = node.right
+        return rank
+    
+    def select(self, index: int) -> Optional[dict]:
+        """Passenger at position index in ID order (0-based) O(log n)"""
+        if not 0 <= index < self.size:
             return None
-        if passenger_id == node.passenger_id:
-            return node.data
-        elif passenger_id < node.passenger_id:
-            return self._search_recursive(node.left, passenger_id)
-        else:
-            return self._search_recursive(node.right, passenger_id)
+        node = self.root
+        while node:
+            left = _count(node.left)
+            if index < left:
+                node = node.left
+            elif index == left:
+                return {'passenger_id': node.passenger_id, **node.data}
+            else:
+                index -= left + 1
+                node = node.right
+        return None
+    
+    def range_scan(self, low: str, high: str) -> List[dict]:
+        """Passengers with low <= ID <= high, in ID order O(log n + k)"""
+        result = []
+        stack = []
+        node = self.root
+        while stack or node:
+            while node:
+                if node.passenger_id < low:
+                    node = node.right  # whole left subtree is below the range
+                else:
+                    stack.append(node)
+                    node = node.left
+            if not stack:
+                break
+            node = stack.pop()
+            if node.passenger_id > high:
+                break
+            result.append({'passenger_id': node.passenger_id, **node.data})
+            node = node.right
+        return result
+    
+    def prefix_scan(self, prefix: str) -> List[dict]:
+        """Passengers whose ID starts with prefix"""
+        return self.range_scan(prefix, prefix + '\U0010ffff')
     
     def get_all_passengers(self) -> List[dict]:
-        """Get all passengers using inorder traversal"""
+        """Get all passengers using iterative inorder traversal"""
         passengers = []
-        self._inorder_traversal(self.root, passengers)
-        return passengers
-    
-    def _inorder_traversal(self, node: BSTNode, result: List) -> None:
-        if node:
-            self._inorder_traversal(node.left, result)
-            result.append({
+        stack = []
+        node = self.root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            passengers.append({
                 'passenger_id': node.passenger_id,
                 **node.data
             })
-            self._inorder_traversal(node.right, result)
+            node = node.right
+        return passengers
 
 # ---------- Graph for City Transport Network ----------
 class GraphNode:
@@ -223,64 +350,158 @@ class TransportGraph:
 
 # ---------- Min Heap for Ticket Priority ----------
 class TicketPriorityQueue:
-    """Min Heap for Managing Ticket Priority"""
+    """Addressable Min Heap for Managing Ticket Priority
+    
+    Entries are keyed on -priority, so the highest priority (emergency) is served first.
+    A position map (ticket_id -> heap index) makes priority changes O(log n).
+    Removals are lazy: the entry is tombstoned in O(1) and skipped by pop/peek,
+    and the heap is compacted once tombstones outnumber live entries.
+    """
     def __init__(self):
-        self.heap = []
-        self.ticket_map = {}  # ticket_id -> (priority, ticket_data)
+        self.heap = []        # entries: [-priority, ticket_id, alive]
+        self.position = {}    # ticket_id -> index of its live entry in heap
+        self.ticket_map = {}  # ticket_id -> ticket_data
+        self.stale = 0        # tombstoned entries still in heap
+    
+    def _less(self, i: int, j: int) -> bool:
+        a, b = self.heap[i], self.heap[j]
+        return (a[0], a[1]) < (b[0], b[1])
+    
+    def _swap(self, i: int, j: int) -> None:
+        self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
+        for k in (i, j):
+            entry = self.heap[k]
+            if entry[2]:
+                self.position[entry[1]] = k
+    
+    def _sift_up(self, i: int) -> None:
+        while i > 0:
+            parent = (i - 1) // 2
+            if not self._less(i, parent):
+                break
+            self._swap(i, parent)
+            i = parent
+    
+    def _sift_down(self, i: int) -> None:
+        n = len(self.heap)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n and self._less(child, smallest):
+                    smallest = child
+            if smallest == i:
+                break
+            self._swap(i, smallest)
+            i = smallest
+    
+    def _pop_root(self) -> list:
+        root = self.heap[0]
+        last = self.heap.pop()
+        if self.heap:
+            self.heap[0] = last
+            if last[2]:
+                self.position[last[1]] = 0
+            self._sift_down(0)
+        return root
+    
+    def _discard_stale_top(self) -> None:
+        while self.heap and not self.heap[0][2]:
+            self._pop_root()
+            self.stale -= 1
     
     def push(self, ticket_id: str, ticket_data: dict, priority: int) -> None:
         """Add ticket to priority queue"""
         # Priority based on: 1. Emergency, 2. Time, 3. Distance
-        heapq.heappush(self.heap, (priority, ticket_id))
+        if ticket_id in self.position:
+            self.ticket_map[ticket_id] = ticket_data
+            self.update_priority(ticket_id, priority)
+            return
+        
+        self.heap.append([-priority, ticket_id, True])
+        self.position[ticket_id] = len(self.heap) - 1
         self.ticket_map[ticket_id] = ticket_data
+        self._sift_up(len(self.heap) - 1)
     
     def pop(self) -> Optional[dict]:
         """Get highest priority ticket"""
+        self._discard_stale_top()
         if not self.heap:
             return None
         
-        priority, ticket_id = heapq.heappop(self.heap)
+        key, ticket_id, _ = self._pop_root()
+        self.position.pop(ticket_id, None)
         ticket_data = self.ticket_map.pop(ticket_id, None)
         
         return {
             'ticket_id': ticket_id,
-            'priority': priority,
+            'priority': -key,
             'data': ticket_data
         }
     
     def peek(self) -> Optional[dict]:
         """Peek highest priority ticket without removing"""
+        self._discard_stale_top()
         if not self.heap:
             return None
         
-        priority, ticket_id = self.heap[0]
+        key, ticket_id, _ = self.heap[0]
         ticket_data = self.ticket_map.get(ticket_id)
         
         return {
             'ticket_id': ticket_id,
-            'priority': priority,
+            'priority': -key,
             'data': ticket_data
         }
     
     def update_priority(self, ticket_id: str, new_priority: int) -> bool:
-        """Update priority of existing ticket"""
-        if ticket_id not in self.ticket_map:
+        """Update priority of existing ticket in place O(log n)"""
+        index = self.position.get(ticket_id)
+        if index is None:
             return False
         
-        # Remove old entry
-        for i, (priority, t_id) in enumerate(self.heap):
-            if t_id == ticket_id:
-                self.heap[i] = self.heap[-1]
-                self.heap.pop()
-                heapq.heapify(self.heap)
-                break
+        old_priority = -self.heap[index][0]
+        self.heap[index][0] = -new_priority
+        if new_priority > old_priority:
+            self._sift_up(index)
+        else:
+            self._sift_down(index)
+        return True
+    
+    def remove(self, ticket_id: str) -> bool:
+        """Remove ticket from queue (lazy tombstone, compacted in bulk)"""
+        index = self.position.pop(ticket_id, None)
+        if index is None:
+            return False
+        
+        self.heap[index][2] = False
+        self.ticket_map.pop(ticket_id, None)
+        self.stale += 1
         
-        # Add with new priority
-        heapq.heappush(self.heap, (new_priority, ticket_id))
+        if self.stale > len(self.position):
+            self.compact()
         return True
     
+    def compact(self) -> None:
+        """Drop tombstoned entries and rebuild the heap O(n)"""
+        self.heap = [entry for entry in self.heap if entry[2]]
+        heapq.heapify(self.heap)  # live entries compare as (-priority, ticket_id), matching _less
+        self.position = {entry[1]: i for i, entry in enumerate(self.heap)}
+        self.stale = 0
+    
+    def __contains__(self, ticket_id: str) -> bool:
+        return ticket_id in self.position
+    
     def size(self) -> int:
-        return len(self.heap)
+        """Number of live tickets in the queue"""
+        return len(self.position)
+    
+    def statistics(self) -> dict:
+        """Get live and stale entry counts"""
+        return {
+            'live_entries': len(self.position),
+            'stale_entries': self.stale,
+            'heap_slots': len(self.heap)
+        }
 
 # ---------- Linked List for Booking History ----------
 class HistoryNode:
@@ -291,11 +512,25 @@ class HistoryNode:
         self.prev = None
 
 class BookingHistory:
-    """Doubly Linked List for Booking History"""
+    """Doubly Linked List for Booking History (newest first)
+    
+    Secondary indexes:
+    - ticket_id -> node (hash)
+    - passenger_id -> nodes in booking order (hash)
+    - (booking_date, seq) sorted keys for O(log n + k) date range queries
+    """
     def __init__(self):
         self.head = None
         self.tail = None
         self.size = 0
+        self.by_ticket = {}     # ticket_id -> HistoryNode
+        self.by_passenger = {}  # passenger_id -> [HistoryNode] oldest first
+        self.date_keys = []     # sorted (booking_date, seq)
+        self.date_nodes = []    # HistoryNode aligned with date_keys
+    
+    @staticmethod
+    def _booking_date(booking_data: dict) -> str:
+        return booking_data.get('booking_date') or (booking_data.get('booking_time') or '')[:10]
     
     def add_booking(self, booking_data: dict) -> None:
         """Add booking to history"""
@@ -310,6 +545,30 @@ class BookingHistory:
             self.head = new_node
         
         self.size += 1
+        
+        ticket_id = booking_data.get('ticket_id')
+        if ticket_id:
+            self.by_ticket[ticket_id] = new_node
+        self.by_passenger.setdefault(booking_data.get('passenger_id', ''), []).append(new_node)
+        
+        # Bookings arrive in time order, so this is almost always an append
+        key = (self._booking_date(booking_data), self.size)
+        pos = bisect_right(self.date_keys, key)
+        self.date_keys.insert(pos, key)
+        self.date_nodes.insert(pos, new_node)
+    
+    def rebuild(self, bookings: List[dict]) -> None:
+        """Reload history from persisted tickets (oldest first)"""
+        self.__init__()
+        for booking in bookings:
+            self.add_booking(booking)
+    
+    def __iter__(self):
+        """Most recent first"""
+        current = self.head
+        while current:
+            yield current.data
+            current = current.next
     
     def get_recent_bookings(self, count: int = 10) -> List[dict]:
         """Get most recent bookings"""
@@ -323,38 +582,27 @@ class BookingHistory:
         return bookings
     
     def get_all_bookings(self) -> List[dict]:
-        """Get all bookings in chronological order"""
-        bookings = []
-        current = self.head
-        
-        while current:
-            bookings.append(current.data)
-            current = current.next
-        
-        return bookings
+        """Get all bookings, most recent first"""
+        return list(self)
     
     def search_by_ticket(self, ticket_id: str) -> Optional[dict]:
-        """Search booking by ticket ID"""
-        current = self.head
-        
-        while current:
-            if current.data.get('ticket_id') == ticket_id:
-                return current.data
-            current = current.next
-        
-        return None
+        """Search booking by ticket ID O(1)"""
+        node = self.by_ticket.get(ticket_id)
+        return node.data if node else None
+    
+    def search_by_passenger(self, passenger_id: str) -> List[dict]:
+        """Bookings of one passenger, most recent first"""
+        return [node.data for node in reversed(self.by_passenger.get(passenger_id, []))]
+    
+    def search_by_date_range(self, start_date: str, end_date: str) -> List[dict]:
+        """Bookings made between two YYYY-MM-DD dates inclusive, in booking order O(log n + k)"""
+        lo = bisect_left(self.date_keys, (start_date,))
+        hi = bisect_right(self.date_keys, (end_date, float('inf')))
+        return [node.data for node in self.date_nodes[lo:hi]]
     
     def search_by_date(self, date: str) -> List[dict]:
         """Search bookings by date"""
-        bookings = []
-        current = self.head
-        
-        while current:
-            if current.data.get('booking_date') == date:
-                bookings.append(current.data)
-            current = current.next
-        
-        return bookings
+        return self.search_by_date_range(date, date)
 
 # ===================== DATA CLASSES =====================
 @dataclass
@@ -378,6 +626,8 @@ class Ticket:
     status: str = "confirmed"
     qr_code: str = None
     payment_status: str = "pending"
+    group_id: str = None
+    last_modified: str = None
     
     def to_dict(self):
         return asdict(self)
@@ -398,9 +648,14 @@ class BusSchedule:
 # ===================== MAIN BOOKING SYSTEM =====================
 class PassengerBookingSystem:
     """Main Booking System for Passengers"""
-    def __init__(self, buses_file: str = 'data/buses.json', routes_file: str = 'data/routes.json'):
+    def __init__(self, buses_file: str = 'data/buses.json', routes_file: str = 'data/routes.json',
+                 tickets_file: str = 'data/tickets.json', waitlist_file: str = None, storage=None,
+                 archive_file: str = None):
         self.buses_file = buses_file
         self.routes_file = routes_file
+        self.tickets_file = tickets_file
+        self.waitlist_file = waitlist_file or os.path.join(os.path.dirname(tickets_file), 'waitlist.json')
+        self.storage = storage  # optional SQLiteStorage shared with the managers
         
         # Initialize data structures
         self.passenger_bst = PassengerBST()
@@ -409,24 +664,82 @@ class PassengerBookingSystem:
         self.booking_history = BookingHistory()
         
         # Load data
-        self.buses = self._load_json(buses_file)
-        self.routes = self._load_json(routes_file)
-        
-        # Ticket counter
-        self.ticket_counter = 1000
+        if storage is not None:
+            self.buses = {'buses': storage.load_all('buses')}
+            self.routes = {'routes': storage.load_all('routes')}
+        else:
+            self.buses = self._load_json(buses_file, 'buses')
+            self.routes = self._load_routes()
         
         # Initialize graph from routes
         self._build_transport_graph()
         
+        # Routes compiled into minute-offset timetables, expanded into per-day trip tables on first use
+        self.trip_tables = TripTableStore(lambda: self.routes.get('routes', []))
+
+        # Per-route fare matrices, built once per bus type
+        self.fare_engine = FareEngine()
+        
         # Load existing tickets
         self.tickets = self._load_tickets()
         
+        # Past-date tickets live in an offset-indexed archive, faulted in on demand;
+        # a ticket found in both (crash while archiving) counts as archived
+        self.archive = TicketArchive(archive_file or os.path.join(os.path.dirname(tickets_file), 'tickets_archive.jsonl'))
+        if len(self.archive):
+            self.tickets['tickets'] = [t for t in self.tickets.get('tickets', []) if t.get('ticket_id') not in self.archive]
+        
+        # Ticket counter (atomic, resumes after the last persisted ID)
+        self.ticket_counter = AtomicCounter(self.tickets.get('next_id', 1000))
+        
         # Booked seats tracking
         self.booked_seats = {}  # {bus_number_date: set(seat_numbers)}
+        self._rebuild_booked_seats()
+        
+        # Running aggregates for O(1) statistics
+        self.stats = BookingStatistics()
+        self.stats.rebuild(chain(self.archive, self.tickets.get('tickets', [])))
+        
+        # Booking history indexes persisted tickets so it survives restarts
+        self.booking_history.rebuild(self.tickets.get('tickets', []))
+        
+        # Locks: one stripe per (bus_number, travel_date), short global locks for shared stores
+        self.seat_locks = StripedLock()
+        self._tickets_lock = threading.RLock()
+        self._buses_lock = threading.RLock()
+        
+        # Passenger count changes are batched and written behind the request;
+        # buses counted since the last flush keep their counts across reload_buses
+        self._dirty_buses = set()
+        self.bus_flusher = WriteBehindFlusher(self.buses_file, self._take_bus_changes, lock=self._buses_lock,
+                                              write=self._write_bus_changes)
+        
+        # Ticket files are written by background workers; downloads render from the compiled template
+        self.artifact_jobs = ArtifactJobQueue()
+        self.ticket_renderer = TicketRenderer()
+        
+        # Passengers waiting for a seat on a full bus, promoted on cancellation
+        self.waitlist = TripWaitlist(self.waitlist_file)
+        
+        # Responses remembered per idempotency key so client retries do not book twice
+        self.idempotency = IdempotencyTable()
+        
+        # Availability results, dropped per (bus, date) on seat changes
+        self.availability = AvailabilityCache()
+        
+        # Seat-map versions per bus_key; the boot id keeps ETags unique across restarts
+        self.seat_versions = {}
+        self._boot_id = uuid.uuid4().hex[:8]
+        
+        # Resident tickets are today's and future trips only
+        self._archived_through = None
+        self.archive_past_tickets()
     
-    def _load_json(self, filename: str) -> Dict:
-        """Load JSON file"""
+    def _load_json(self, filename: str, key: str = None) -> Dict:
+        """Load JSON file (the key array, if given, is decoded record by record)"""
         try:
+            if key is not None:
+                return load_json_streaming(filename, key)
             with open(filename, 'r') as f:
                 return json.load(f)
         except FileNotFoundError:
@@ -434,34 +747,113 @@ class PassengerBookingSystem:
         except json.JSONDecodeError:
             return {}
     
+    def _load_routes(self) -> Dict:
+        """Routes from storage, the route shards or the legacy routes.json"""
+        if self.storage is not None:
+            return {'routes': self.storage.load_all('routes')}
+        try:
+            return load_routes_document(self.routes_file) or {}
+        except json.JSONDecodeError:
+            return {}
+    
     def _save_json(self, data: Dict, filename: str) -> bool:
-        """Save data to JSON file"""
+        """Save data to JSON file (atomic, coalesced with concurrent saves)"""
         try:
-            with open(filename, 'w') as f:
-                json.dump(data, f, indent=2)
+            durable_write_json(filename, data, indent=2)
             return True
         except Exception as e:
             print(f"Error saving to {filename}: {e}")
             return False
     
     def _load_tickets(self) -> Dict:
-        """Load tickets from file"""
+        """Load tickets from file (or SQLite storage)"""
+        if self.storage is not None:
+            return {'tickets': self.storage.load_all('tickets'),
+                    'next_id': self.storage.get_meta('tickets.next_id', 1000)}
         try:
-            with open('data/tickets.json', 'r') as f:
-                return json.load(f)
+            # Tickets are decoded one at a time, never alongside the whole file text
+            return load_json_streaming(self.tickets_file, 'tickets')
         except FileNotFoundError:
             return {'tickets': [], 'next_id': 1000}
     
     def _save_tickets(self) -> bool:
-        """Save tickets to file"""
+        """Save tickets to file (one write covers every save requested meanwhile)"""
         try:
-            with open('data/tickets.json', 'w') as f:
-                json.dump(self.tickets, f, indent=2)
+            durable_write(self.tickets_file, self._render_tickets)
             return True
         except Exception as e:
             print(f"Error saving tickets: {e}")
             return False
     
+    def _render_tickets(self) -> str:
+        with self._tickets_lock:
+            return json.dumps(self.tickets, indent=2)
+    
+    def _persist_tickets(self, changed: List[Dict]) -> bool:
+        """Persist changed tickets: their rows only in SQLite mode, the whole file otherwise"""
+        if self.storage is None:
+            return self._save_tickets()
+        try:
+            with self._tickets_lock:
+                rows = [dict(ticket) for ticket in changed]
+                next_id = self.tickets.get('next_id', 1000)
+            with self.storage.transaction():
+                self.storage.upsert_many('tickets', rows)
+                self.storage.set_meta('tickets.next_id', next_id)
+            return True
+        except Exception as e:
+            print(f"Error saving tickets: {e}")
+            return False
+    
+    def archive_past_tickets(self, today: str = None) -> int:
+        """Move tickets for travel dates before today into the archive; returns how many moved"""
+        today = today or datetime.now().strftime('%Y-%m-%d')
+        with self._tickets_lock:
+            tickets = self.tickets.get('tickets', [])
+            past = [t for t in tickets if t.get('travel_date') and t['travel_date'] < today]
+            if past:
+                # The archive is durable before anything leaves the hot store
+                self.archive.append(past)
+                past_ids = {t.get('ticket_id') for t in past}
+                self.tickets['tickets'] = [t for t in tickets if t.get('ticket_id') not in past_ids]
+                history = BookingHistory()
+                history.rebuild(self.tickets['tickets'])
+                self.booking_history = history
+                for ticket_id in past_ids:
+                    self.ticket_queue.remove(ticket_id)
+            self._archived_through = today
+        self.waitlist.prune_before(today)
+        if not past:
+            return 0
+        
+        # Bookings add keys concurrently: iterate a snapshot, drop each key under its stripe
+        for bus_key in list(self.booked_seats):
+            bus_number, _, travel_date = bus_key.rpartition('_')
+            if travel_date < today:
+                with self.seat_locks.hold((bus_number, travel_date)):
+                    self.booked_seats.pop(bus_key, None)
+                    self.seat_versions.pop(bus_key, None)
+        
+        if self.storage is not None:
+            with self.storage.transaction():
+                for ticket_id in past_ids:
+                    self.storage.delete('tickets', ticket_id)
+        else:
+            self._save_tickets()
+        return len(past)
+    
+    def _archive_if_day_changed(self) -> None:
+        if self._archived_through != datetime.now().strftime('%Y-%m-%d'):
+            self.archive_past_tickets()
+    
+    def _rebuild_booked_seats(self) -> None:
+        """Rebuild seat occupancy from confirmed tickets so restarts cannot resell seats"""
+        for ticket in self.tickets.get('tickets', []):
+            if ticket.get('status') != 'confirmed':
+                continue
+            bus_key = f"{ticket.get('bus_number')}_{ticket.get('travel_date')}"
+            self.booked_seats.setdefault(bus_key, set()).add(ticket.get('seat_number'))
+    
     def _build_transport_graph(self) -> None:
         """Build transport graph from routes data"""
         if 'routes' not in self.routes:
@@ -530,16 +922,9 @@ class PassengerBookingSystem:
         return self.passenger_bst.search(passenger_id)
     
     def get_passenger_travel_history(self, passenger_id: str) -> List[Dict]:
-        """Get passenger's travel history"""
-        # Search through booking history
-        history = []
-        all_bookings = self.booking_history.get_all_bookings()
-        
-        for booking in all_bookings:
-            if booking.get('passenger_id') == passenger_id:
-                history.append(booking)
-        
-        return history
+        """Get passenger's travel history, most recent first"""
+        archived = self.archive.for_passenger(passenger_id)
+        return self.booking_history.search_by_passenger(passenger_id) + archived[::-1]
     
     def update_passenger_stats(self, passenger_id: str, fare: float) -> None:
         """Update passenger statistics after booking"""
@@ -552,13 +937,135 @@ class PassengerBookingSystem:
     # ===================== TICKET BOOKING =====================
     def get_available_buses(self, from_stop: str, to_stop: str, date: str) -> List[Dict]:
         """Get available buses for a route on specific date"""
-        available_buses = []
+        return self.get_available_buses_with_status(from_stop, to_stop, date)[0]
+    
+    def get_available_buses_with_status(self, from_stop: str, to_stop: str, date: str) -> tuple:
+        """Cached availability lookup; returns (buses, 'HIT' or 'MISS')"""
+        now = datetime.now()
+        today = now.strftime('%Y-%m-%d')
+        # Today's departures depend on the current minute; other dates only on which day is today
+        bucket = now.strftime('%H:%M') if date == today else today
+        key = (from_stop, to_stop, date, bucket)
+        
+        cached = self.availability.get(key)
+        if cached is not None:
+            return cached, 'HIT'
+        
+        version = self.availability.version
+        available_buses = self._compute_available_buses(from_stop, to_stop, date)
+        self.availability.put(key, available_buses, [f"{b['bus_number']}_{date}" for b in available_buses], version)
+        return available_buses, 'MISS'
+    
+    def reload_routes(self) -> None:
+        """Pick up routes saved elsewhere: graph, trip tables, fares and cached availability"""
+        self.routes = self._load_routes()
+        self.transport_graph = TransportGraph()
+        self._build_transport_graph()
+        self.trip_tables.invalidate()
+        self.fare_engine.invalidate()
+        self.invalidate_availability()
+    
+    def reload_buses(self) -> None:
+        """Pick up buses saved elsewhere, keeping passenger counts not flushed yet"""
+        if self.storage is not None:
+            buses = {'buses': self.storage.load_all('buses')}
+        else:
+            buses = self._load_json(self.buses_file, 'buses')
+        if not isinstance(buses, dict):
+            buses = {'buses': buses if isinstance(buses, list) else []}
+        
+        def fixed(bus_list):
+            return [{k: v for k, v in bus.items() if k not in BUS_COUNTER_FIELDS} for bus in bus_list]
+        
+        with self._buses_lock:
+            current = self.buses.get('buses', []) if isinstance(self.buses, dict) else []
+            local = {bus.get('bus_number'): bus for bus in current}
+            for bus in buses.get('buses', []):
+                if bus.get('bus_number') in self._dirty_buses and bus['bus_number'] in local:
+                    for field in BUS_COUNTER_FIELDS:
+                        if field in local[bus['bus_number']]:
+                            bus[field] = local[bus['bus_number']][field]
+            edited = fixed(buses.get('buses', [])) != fixed(current)
+            self.buses = buses
+        # Counter-only changes leave availability alone (seats are tracked per bus and date)
+        if edited:
+            self.invalidate_availability()
+    
+    def _take_bus_changes(self):
+        """Flusher snapshot (called with the buses lock held): counted bus numbers and the data to write"""
+        numbers, self._dirty_buses = self._dirty_buses, set()
+        if self.storage is not None:
+            # Only the counter fields of counted buses: BusManager owns every other column and row
+            return numbers, {bus['bus_number']: {field: bus.get(field) for field in BUS_COUNTER_FIELDS}
+                             for bus in self.buses.get('buses', []) if bus.get('bus_number') in numbers}
+        return numbers, json.dumps(self.buses, indent=2)
+    
+    def _write_bus_changes(self, changes) -> None:
+        numbers, payload = changes
+        try:
+            if self.storage is not None:
+                self.storage.update_fields('buses', payload)
+            else:
+                durable_write(self.buses_file, lambda: payload)
+        except Exception:
+            # Not written: those counts are still only in memory
+            with self._buses_lock:
+                self._dirty_buses |= numbers
+            raise
+    
+    def invalidate_availability(self) -> None:
+        """Drop all cached availability (after route or bus edits)"""
+        self.availability.clear()
+    
+    def _seats_changed(self, bus_key: str) -> None:
+        """Call after booked_seats for bus_key changed (with the seat lock held)"""
+        self.seat_versions[bus_key] = self.seat_versions.get(bus_key, 0) + 1
+        self.availability.invalidate_bus(bus_key)
+    
+    def seat_map_etag(self, bus_number: str, travel_date: str) -> str:
+        """Validator for a seat map; changes whenever a seat on that bus and date changes"""
+        bus_key = f"{bus_number}_{travel_date}"
+        return f"{self._boot_id}-{bus_key}-{self.seat_versions.get(bus_key, 0)}"
+    
+    def get_seat_map(self, bus_number: str, travel_date: str) -> Optional[Dict]:
+        """Seat occupancy as a packed bitmap: bit (n - 1) set when seat n is booked, LSB first"""
+        bus = None
+        for b in self.buses.get('buses', []) if isinstance(self.buses, dict) else []:
+            if b['bus_number'] == bus_number:
+                bus = b
+                break
+        if not bus:
+            return None
+        
+        capacity = bus.get('capacity', 50)
+        bus_key = f"{bus_number}_{travel_date}"
+        with self.seat_locks.hold((bus_number, travel_date)):
+            booked = list(self.booked_seats.get(bus_key, ()))
+            version = self.seat_versions.get(bus_key, 0)
+            etag = self.seat_map_etag(bus_number, travel_date)
+        
+        bitmap = bytearray((capacity + 7) // 8)
+        for seat in booked:
+            if isinstance(seat, int) and 1 <= seat <= capacity:
+                bitmap[(seat - 1) >> 3] |= 1 << ((seat - 1) & 7)
+        
+        return {
+            'bus_number': bus_number,
+            'travel_date': travel_date,
+            'capacity': capacity,
+            'booked_count': len(booked),
+            'available_seats': capacity - len(booked),
+            'version': version,
+            'etag': etag,
+            'bitmap': base64.b64encode(bytes(bitmap)).decode('ascii'),
+        }
+    
+    def _match_buses(self, from_stop: str, to_stop: str) -> List[Dict]:
+        """Active buses whose route serves from_stop before to_stop (date independent)"""
+        matches = []
         
         if 'buses' not in self.buses:
-            return available_buses
-        
-        current_time = datetime.now()
-        travel_datetime = datetime.strptime(f"{date} 00:00", "%Y-%m-%d %H:%M")
+            return matches
         
         for bus in self.buses['buses']:
             # Check if bus is active and has route
@@ -591,6 +1098,21 @@ class PassengerBookingSystem:
             if from_idx >= to_idx:
                 continue
             
+            matches.append({'bus': bus, 'route': route, 'from_idx': from_idx, 'to_idx': to_idx})
+        
+        return matches
+    
+    def _compute_available_buses(self, from_stop: str, to_stop: str, date: str) -> List[Dict]:
+        available_buses = []
+        
+        current_time = datetime.now()
+        travel_datetime = datetime.strptime(f"{date} 00:00", "%Y-%m-%d %H:%M")
+        
+        for match in self._match_buses(from_stop, to_stop):
+            bus, route = match['bus'], match['route']
+            from_idx, to_idx = match['from_idx'], match['to_idx']
+            route_name = bus.get('route_name', '')
+            
             # Calculate available seats
             bus_key = f"{bus['bus_number']}_{date}"
             booked_seats = self.booked_seats.get(bus_key, set())
@@ -621,7 +1143,7 @@ class PassengerBookingSystem:
                 'departure_time': departure_time,
                 'arrival_time': arrival_time,
                 'estimated_travel_time': self._calculate_travel_time(route, from_idx, to_idx),
-                'fare': self._calculate_fare(from_idx, to_idx, bus.get('type', 'regular'))
+                'fare': self._calculate_fare(route, from_idx, to_idx, bus.get('type', 'regular'))
             }
             
             available_buses.append(bus_info)
@@ -631,24 +1153,77 @@ class PassengerBookingSystem:
         
         return available_buses
     
+    def get_availability_calendar(self, from_stop: str, to_stop: str, start_date: str, days: int = 7) -> Dict:
+        """Availability for consecutive dates as a grid: one row per bus, one column per date
+        
+        Bus/route/stop matching runs once; departures are computed once per
+        (route, date) and shared by every bus on that route.
+        """
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        days = max(1, min(int(days), 31))
+        dates = [(start + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(days)]
+        
+        now = datetime.now()
+        today = now.strftime('%Y-%m-%d')
+        timings = {}  # (route_id, date) -> (departure, arrival)
+        rows = []
+        
+        for match in self._match_buses(from_stop, to_stop):
+            bus, route = match['bus'], match['route']
+            route_id = route.get('route_id', '')
+            capacity = bus.get('capacity', 50)
+            seats, departures, arrivals = [], [], []
+            
+            for date in dates:
+                key = (route_id, date)
+                if key not in timings:
+                    reference_time = now.time() if date == today else None
+                    departure = self._calculate_departure_time(route, from_stop, date, reference_time=reference_time)
+                    arrival = self._calculate_arrival_time(route, from_stop, to_stop, departure) if departure else None
+                    timings[key] = (departure, arrival)
+                departure, arrival = timings[key]
+                departures.append(departure)
+                arrivals.append(arrival)
+                # No departure left that day: the bus is not bookable, whatever its seats
+                seats.append(capacity - len(self.booked_seats.get(f"{bus['bus_number']}_{date}", ())) if departure else None)
+            
+            rows.append({
+                'bus_number': bus['bus_number'],
+                'type': bus.get('type', 'regular'),
+                'capacity': capacity,
+                'route_name': bus.get('route_name', ''),
+                'route_id': route_id,
+                'fare': self._calculate_fare(route, match['from_idx'], match['to_idx'], bus.get('type', 'regular')),
+                'estimated_travel_time': self._calculate_travel_time(route, match['from_idx'], match['to_idx']),
+                'available_seats': seats,
+                'departure_time': departures,
+                'arrival_time': arrivals,
+            })
+        
+        rows.sort(key=lambda row: row['bus_number'])
+        return {
+            'from_stop': from_stop,
+            'to_stop': to_stop,
+            'dates': dates,
+            'day_types': [day_key_for(date) for date in dates],
+            'buses': rows,
+            'count': len(rows)
+        }
+    
     def _calculate_arrival_time(self, route: Dict, from_stop: str, to_stop: str, departure: str) -> str:
         """Calculate arrival time using timetable or fallbacks."""
-        stops = route.get('stops', [])
-        stop_names = [s.get('stop_name') for s in stops]
-        if from_stop in stop_names and to_stop in stop_names:
-            from_idx = stop_names.index(from_stop)
-            to_idx = stop_names.index(to_stop)
-
-            travel_minutes = self._calculate_travel_minutes(stops, from_idx, to_idx)
-            departure_time = datetime.strptime(departure, "%H:%M")
-            arrival_time = departure_time + timedelta(minutes=travel_minutes)
-            return arrival_time.strftime("%H:%M")
+        timetable = self.trip_tables.timetable(route)
+        from_idx = timetable.stop_index.get(from_stop)
+        to_idx = timetable.stop_index.get(to_stop)
+        if from_idx is not None and to_idx is not None:
+            departure_minutes = int(departure[:2]) * 60 + int(departure[3:5])
+            return format_minutes(departure_minutes + timetable.travel_minutes(from_idx, to_idx))
 
         return "09:00"
     
     def _calculate_travel_time(self, route: Dict, from_idx: int, to_idx: int) -> str:
         """Calculate travel time between stops"""
-        travel_minutes = self._calculate_travel_minutes(route.get('stops', []), from_idx, to_idx)
+        travel_minutes = self.trip_tables.timetable(route).travel_minutes(from_idx, to_idx)
         hours = travel_minutes // 60
         minutes = travel_minutes % 60
         
@@ -656,50 +1231,14 @@ class PassengerBookingSystem:
             return f"{hours}h {minutes}m"
         return f"{minutes}m"
 
-    def _calculate_travel_minutes(self, stops: List[Dict], from_idx: int, to_idx: int) -> int:
-        """Calculate travel minutes between two stop indexes."""
-        if to_idx <= from_idx:
-            return 0
-
-        travel_minutes = 0
-        for idx in range(from_idx, to_idx):
-            travel_minutes += 10
-            travel_minutes += int(stops[idx + 1].get('wait_time', 0) or 0)
-        return travel_minutes
-
     def _get_service_window(self, route: Dict, travel_date: str) -> Optional[Dict]:
         """Get service window for a route on a given date."""
-        default_calendar = {
-            "weekday": {"start_time": "06:00", "end_time": "22:00", "headway_minutes": 15},
-            "weekend": {"start_time": "08:00", "end_time": "20:00", "headway_minutes": 20},
-        }
-        service_calendar = route.get('service_calendar') or {}
-        service_calendar = {
-            "weekday": {**default_calendar["weekday"], **service_calendar.get("weekday", {})},
-            "weekend": {**default_calendar["weekend"], **service_calendar.get("weekend", {})},
-        }
-
-        try:
-            travel_day = datetime.strptime(travel_date, "%Y-%m-%d").date()
-        except (TypeError, ValueError):
-            travel_day = datetime.now().date()
-
-        day_key = "weekend" if travel_day.weekday() >= 5 else "weekday"
-        schedule = service_calendar.get(day_key, {})
-        start_time = schedule.get("start_time", default_calendar[day_key]["start_time"])
-        end_time = schedule.get("end_time", default_calendar[day_key]["end_time"])
-        headway_minutes = schedule.get("headway_minutes", route.get("headway_minutes", default_calendar[day_key]["headway_minutes"]))
-
-        try:
-            headway_minutes = int(headway_minutes)
-        except (TypeError, ValueError):
-            headway_minutes = default_calendar[day_key]["headway_minutes"]
-
+        service = self.trip_tables.timetable(route).service_window(travel_date)
         return {
-            "day_key": day_key,
-            "start_time": start_time,
-            "end_time": end_time,
-            "headway_minutes": headway_minutes,
+            "day_key": service["day_key"],
+            "start_time": service["start_time"],
+            "end_time": service["end_time"],
+            "headway_minutes": service["headway_minutes"],
         }
 
     def _calculate_departure_time(
@@ -709,84 +1248,55 @@ class PassengerBookingSystem:
         travel_date: str,
         reference_time: Optional[time] = None,
     ) -> Optional[str]:
-        """Calculate next departure time from a stop using route timetable."""
-        service = self._get_service_window(route, travel_date)
-        if not service:
-            return None
-
-        stops = route.get('stops', [])
-        stop_names = [s.get('stop_name') for s in stops]
-        if from_stop not in stop_names:
+        """Calculate next departure time from a stop using the day's trip table."""
+        stop_idx = self.trip_tables.timetable(route).stop_index.get(from_stop)
+        if stop_idx is None:
             return None
 
-        start_time = datetime.strptime(service["start_time"], "%H:%M")
-        stop_idx = stop_names.index(from_stop)
-        stop = stops[stop_idx]
-
-        base_departure = None
-        if stop.get('departure_time'):
-            base_departure = datetime.strptime(stop['departure_time'], "%H:%M")
-        elif stop.get('arrival_time'):
-            base_departure = datetime.strptime(stop['arrival_time'], "%H:%M")
-
-        if not base_departure:
-            offset_minutes = 0
-            for idx in range(stop_idx):
-                offset_minutes += 10
-                offset_minutes += int(stops[idx].get('wait_time', 0) or 0)
-            base_departure = start_time + timedelta(minutes=offset_minutes)
-
-        if reference_time is None:
-            return base_departure.strftime("%H:%M")
-
-        headway = stop.get('headway_minutes', service["headway_minutes"])
-        try:
-            headway = int(headway)
-        except (TypeError, ValueError):
-            headway = service["headway_minutes"]
-
-        end_time = datetime.strptime(service["end_time"], "%H:%M")
-        reference_dt = datetime.combine(datetime.today(), reference_time)
-        base_dt = datetime.combine(reference_dt.date(), base_departure.time())
-        end_dt = datetime.combine(reference_dt.date(), end_time.time())
-
-        if reference_dt <= base_dt:
-            return base_dt.strftime("%H:%M")
+        reference_minutes = None
+        if reference_time is not None:
+            reference_minutes = (reference_time.hour * 60 + reference_time.minute
+                                 + (reference_time.second + reference_time.microsecond / 1e6) / 60)
 
-        if headway <= 0:
+        departure = self.trip_tables.next_departure(route, stop_idx, travel_date, reference_minutes)
+        if departure is None:
             return None
+        return format_minutes(departure)
+    
+    def _calculate_fare(self, route: Dict, from_idx: int, to_idx: int, bus_type: str) -> float:
+        """Calculate fare from the route's precomputed fare matrix"""
+        return self.fare_engine.quote(route, bus_type, from_idx, to_idx)
 
-        diff_minutes = int((reference_dt - base_dt).total_seconds() / 60)
-        intervals = (diff_minutes + headway - 1) // headway
-        next_departure = base_dt + timedelta(minutes=intervals * headway)
+    def _find_route(self, route_id: str) -> Optional[Dict]:
+        for r in self.routes.get('routes', []):
+            if r.get('route_id') == route_id or r.get('route_name') == route_id:
+                return r
+        return None
 
-        if next_departure > end_dt:
+    def get_fare_table(self, route_id: str, bus_types: List[str] = None) -> Optional[Dict]:
+        """All origin/destination fares on a route for each bus type"""
+        route = self._find_route(route_id)
+        if not route:
             return None
+        bus_types = bus_types or ['regular', *self.fare_engine.rules.multipliers]
+        return self.fare_engine.fare_table(route, bus_types)
 
-        return next_departure.strftime("%H:%M")
-    
-    def _calculate_fare(self, from_idx: int, to_idx: int, bus_type: str) -> float:
-        """Calculate fare based on distance and bus type"""
-        distance = to_idx - from_idx
-        base_fare = 50
-        
-        # Distance-based fare
-        fare = base_fare + (distance * 10)
-        
-        # Bus type multiplier
-        if bus_type == 'air_conditioned':
-            fare *= 1.5
-        elif bus_type == 'luxury':
-            fare *= 2.0
-        
-        return round(fare, 2)
+    def quote_fares(self, route_id: str, bus_type: str, trips: List[Dict]) -> Optional[List[Dict]]:
+        """Batch quote [{'from_stop', 'to_stop'}, ...] on one route"""
+        route = self._find_route(route_id)
+        if not route:
+            return None
+        stop_index = self.trip_tables.timetable(route).stop_index
+        pairs = [(stop_index.get(t.get('from_stop'), -1), stop_index.get(t.get('to_stop'), -1)) for t in trips]
+        fares = self.fare_engine.quote_many(route, bus_type, pairs)
+        return [
+            {'from_stop': t.get('from_stop'), 'to_stop': t.get('to_stop'),
+             'fare': fare if fare is not None and pair[1] > pair[0] else None}
+            for t, pair, fare in zip(trips, pairs, fares)
+        ]
     
-    def book_ticket(self, booking_data: Dict) -> Dict:
-        """Book a new ticket"""
-        # Generate ticket ID
-        ticket_id = f"TKT{self.ticket_counter:06d}"
-        self.ticket_counter += 1
-        
+    def _resolve_trip(self, booking_data: Dict) -> Dict:
+        """Resolve bus, route, fare and timings for a booking request"""
         # Get bus details
         bus_number = booking_data.get('bus_number')
         travel_date = booking_data.get('travel_date')
@@ -817,22 +1327,7 @@ class PassengerBookingSystem:
         stops = [s['stop_name'] for s in route.get('stops', [])]
         from_idx = stops.index(from_stop) if from_stop in stops else 0
         to_idx = stops.index(to_stop) if to_stop in stops else len(stops)-1
-        fare = self._calculate_fare(from_idx, to_idx, bus.get('type', 'regular'))
-        
-        # Assign seat
-        bus_key = f"{bus_number}_{travel_date}"
-        if bus_key not in self.booked_seats:
-            self.booked_seats[bus_key] = set()
-        
-        seat_number = 1
-        while seat_number <= bus['capacity']:
-            if seat_number not in self.booked_seats[bus_key]:
-                self.booked_seats[bus_key].add(seat_number)
-                break
-            seat_number += 1
-        
-        if seat_number > bus['capacity']:
-            return {'success': False, 'message': 'No seats available'}
+        fare = self._calculate_fare(route, from_idx, to_idx, bus.get('type', 'regular'))
         
         # Calculate timings
         departure_time = self._calculate_departure_time(route, from_stop, travel_date)
@@ -840,127 +1335,315 @@ class PassengerBookingSystem:
             return {'success': False, 'message': 'No scheduled departures available for the selected date'}
         arrival_time = self._calculate_arrival_time(route, from_stop, to_stop, departure_time)
         
-        # Create ticket
-        ticket = Ticket(
+        return {
+            'success': True,
+            'bus': bus,
+            'route': route,
+            'bus_number': bus_number,
+            'travel_date': travel_date,
+            'from_stop': from_stop,
+            'to_stop': to_stop,
+            'fare': fare,
+            'departure_time': departure_time,
+            'arrival_time': arrival_time,
+        }
+    
+    def _build_ticket(self, trip: Dict, passenger: Dict, seat_number: int, group_id: str = None) -> Ticket:
+        """Create a Ticket for a resolved trip and an assigned seat"""
+        ticket_id = f"TKT{self.ticket_counter.next():06d}"
+        
+        return Ticket(
             ticket_id=ticket_id,
-            passenger_id=booking_data.get('passenger_id', ''),
-            passenger_name=booking_data.get('passenger_name', ''),
-            passenger_contact=booking_data.get('passenger_contact', ''),
-            bus_number=bus_number,
-            route_id=route.get('route_id', ''),
-            route_name=route.get('route_name', ''),
-            from_stop=from_stop,
-            to_stop=to_stop,
-            departure_time=departure_time,
-            arrival_time=arrival_time,
-            travel_date=travel_date,
+            passenger_id=passenger.get('passenger_id', ''),
+            passenger_name=passenger.get('passenger_name', ''),
+            passenger_contact=passenger.get('passenger_contact', ''),
+            bus_number=trip['bus_number'],
+            route_id=trip['route'].get('route_id', ''),
+            route_name=trip['route'].get('route_name', ''),
+            from_stop=trip['from_stop'],
+            to_stop=trip['to_stop'],
+            departure_time=trip['departure_time'],
+            arrival_time=trip['arrival_time'],
+            travel_date=trip['travel_date'],
             seat_number=seat_number,
-            fare=fare,
+            fare=trip['fare'],
             booking_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             qr_code=self._generate_qr_code(ticket_id),
-            payment_status='paid'
+            payment_status='paid',
+            group_id=group_id,
+            last_modified=datetime.now().isoformat()
         )
+    
+    def _record_tickets(self, ticket_dicts: List[Dict], emergency: bool = False) -> None:
+        """Add tickets to the in-memory stores and persist them in one write"""
+        with self._tickets_lock:
+            if 'tickets' not in self.tickets:
+                self.tickets['tickets'] = []
+            
+            for ticket_dict in ticket_dicts:
+                self.tickets['tickets'].append(ticket_dict)
+                
+                # Add to booking history (Linked List)
+                self.booking_history.add_booking(ticket_dict)
+                
+                # Add to priority queue (emergency tickets get higher priority)
+                priority = 100 if emergency else 10
+                self.ticket_queue.push(ticket_dict['ticket_id'], ticket_dict, priority)
+                
+                # Update passenger statistics
+                self.update_passenger_stats(ticket_dict['passenger_id'], ticket_dict['fare'])
+                self.stats.record_booking(ticket_dict)
+            
+            self.tickets['next_id'] = max(self.tickets.get('next_id', 0), self.ticket_counter.value)
         
-        # Add to tickets data
-        ticket_dict = ticket.to_dict()
-        
-        if 'tickets' not in self.tickets:
-            self.tickets['tickets'] = []
+        # Update bus passenger count
+        self._update_bus_passenger_count(ticket_dicts[0]['bus_number'], len(ticket_dicts))
         
-        self.tickets['tickets'].append(ticket_dict)
-        self.tickets['next_id'] = self.ticket_counter
+        # Save data
+        self._persist_tickets(ticket_dicts)
+    
+    def _idempotent(self, operation: str, payload: Dict, func) -> Dict:
+        """Run func once per idempotency_key in payload (no key: always run)"""
+        key = payload.get('idempotency_key')
+        if not key:
+            return func()
+        body = {k: v for k, v in payload.items() if k != 'idempotency_key'}
+        scope = (operation, payload.get('passenger_id', ''), str(key))
+        return self.idempotency.run(scope, request_fingerprint(body), func)
+    
+    def book_ticket(self, booking_data: Dict) -> Dict:
+        """Book a new ticket; a repeated idempotency_key returns the first response"""
+        self._archive_if_day_changed()
+        return self._idempotent('book', booking_data, lambda: self._book_ticket(booking_data))
+    
+    def _book_ticket(self, booking_data: Dict) -> Dict:
+        """Book a new ticket (seat assignment is linearizable per bus and date)"""
+        trip = self._resolve_trip(booking_data)
+        if not trip['success']:
+            return trip
         
-        # Add to booking history (Linked List)
-        self.booking_history.add_booking(ticket_dict)
+        bus_number = trip['bus_number']
+        travel_date = trip['travel_date']
         
-        # Add to priority queue (emergency tickets get higher priority)
-        priority = 100 if booking_data.get('emergency', False) else 10
-        self.ticket_queue.push(ticket_id, ticket_dict, priority)
+        # Assign seat under the (bus, date) stripe lock
+        bus_key = f"{bus_number}_{travel_date}"
+        with self.seat_locks.hold((bus_number, travel_date)):
+            seat_number = self._assign_seat(bus_key, trip['bus']['capacity'])
         
-        # Update passenger statistics
-        self.update_passenger_stats(booking_data.get('passenger_id', ''), fare)
+        if seat_number is None:
+            if booking_data.get('join_waitlist'):
+                joined = self.join_waitlist(booking_data)
+                if joined['success']:
+                    return {**joined, 'success': False, 'waitlisted': True,
+                            'message': 'No seats available - added to waitlist'}
+            return {'success': False, 'message': 'No seats available', 'waitlist_available': True}
         
-        # Update bus passenger count
-        self._update_bus_passenger_count(bus_number, 1)
+        # Create ticket
+        ticket = self._build_ticket(trip, booking_data, seat_number)
+        ticket_dict = ticket.to_dict()
         
-        # Save data
-        self._save_tickets()
+        self._record_tickets([ticket_dict], emergency=booking_data.get('emergency', False))
         
-        # Generate downloadable ticket
-        download_path = self._generate_ticket_download(ticket)
+        # Queue downloadable ticket generation
+        download_path = self._queue_ticket_download(ticket_dict)
         
         return {
             'success': True,
-            'ticket_id': ticket_id,
+            'ticket_id': ticket.ticket_id,
             'ticket': ticket_dict,
             'download_url': download_path,
             'message': 'Ticket booked successfully'
         }
     
+    def book_group(self, booking_data: Dict) -> Dict:
+        """Book a group; a repeated idempotency_key returns the first response"""
+        return self._idempotent('group', booking_data, lambda: self._book_group(booking_data))
+    
+    def _book_group(self, booking_data: Dict) -> Dict:
+        """Book seats for a whole group on one bus, date and segment - all or nothing"""
+        members = booking_data.get('passengers')
+        if members:
+            group_size = len(members) if isinstance(members, list) else 0
+        else:
+            members = None
+            try:
+                group_size = int(booking_data.get('group_size', 0))
+            except (TypeError, ValueError):
+                return {'success': False, 'message': 'group_size must be an integer'}
+        
+        if group_size < 1:
+            return {'success': False, 'message': 'Group must contain at least one passenger'}
+        
+        trip = self._resolve_trip(booking_data)
+        if not trip['success']:
+            return trip
+        
+        # A group larger than the bus can never fit; refuse before building per-member data
+        if group_size > trip['bus']['capacity']:
+            return {'success': False, 'message': f'Not enough seats available for a group of {group_size}'}
+        if members is None:
+            members = [{} for _ in range(group_size)]
+        
+        bus_number = trip['bus_number']
+        travel_date = trip['travel_date']
+        
+        # Reserve every seat under a single hold of the (bus, date) stripe lock
+        bus_key = f"{bus_number}_{travel_date}"
+        with self.seat_locks.hold((bus_number, travel_date)):
+            seat_numbers = self._assign_group_seats(bus_key, trip['bus']['capacity'], len(members))
+        
+        if seat_numbers is None:
+            return {'success': False, 'message': f'Not enough seats available for a group of {len(members)}'}
+        
+        group_id = f"GRP{uuid.uuid4().hex[:8].upper()}"
+        tickets = []
+        for member, seat_number in zip(members, seat_numbers):
+            member = member if isinstance(member, dict) else {}
+            passenger = {
+                'passenger_id': booking_data.get('passenger_id', ''),
+                'passenger_name': member.get('passenger_name') or booking_data.get('passenger_name', ''),
+                'passenger_contact': member.get('passenger_contact') or booking_data.get('passenger_contact', ''),
+            }
+            tickets.append(self._build_ticket(trip, passenger, seat_number, group_id=group_id))
+        
+        ticket_dicts = [ticket.to_dict() for ticket in tickets]
+        self._record_tickets(ticket_dicts, emergency=booking_data.get('emergency', False))
+        
+        # One downloadable file for the whole group
+        download_path = f"tickets/group_{group_id}.txt"
+        self.artifact_jobs.submit(f"group:{group_id}", self._generate_group_download, group_id, ticket_dicts)
+        
+        return {
+            'success': True,
+            'group_id': group_id,
+            'ticket_ids': [t['ticket_id'] for t in ticket_dicts],
+            'seat_numbers': seat_numbers,
+            'adjacent': seat_numbers == list(range(seat_numbers[0], seat_numbers[0] + len(seat_numbers))),
+            'tickets': ticket_dicts,
+            'total_fare': round(sum(t['fare'] for t in ticket_dicts), 2),
+            'download_url': download_path,
+            'message': f'{len(ticket_dicts)} tickets booked successfully'
+        }
+    
+    def _assign_seat(self, bus_key: str, capacity: int) -> Optional[int]:
+        """Claim the lowest free seat; caller must hold the seat lock for bus_key"""
+        booked = self.booked_seats.setdefault(bus_key, set())
+        for seat_number in range(1, capacity + 1):
+            if seat_number not in booked:
+                booked.add(seat_number)
+                self._seats_changed(bus_key)
+                return seat_number
+        return None
+    
+    def _assign_group_seats(self, bus_key: str, capacity: int, count: int) -> Optional[List[int]]:
+        """Claim count seats, preferring one adjacent block; caller must hold the seat lock"""
+        booked = self.booked_seats.setdefault(bus_key, set())
+        free = [seat for seat in range(1, capacity + 1) if seat not in booked]
+        if len(free) < count:
+            return None
+        
+        # Sliding window over free seats: a block is adjacent when its ends differ by count - 1
+        chosen = free[:count]
+        for i in range(len(free) - count + 1):
+            if free[i + count - 1] - free[i] == count - 1:
+                chosen = free[i:i + count]
+                break
+        
+        booked.update(chosen)
+        self._seats_changed(bus_key)
+        return chosen
+    
+    # ===================== WAITLIST =====================
+    def join_waitlist(self, booking_data: Dict) -> Dict:
+        """Wait for a seat on a full bus instead of retrying the booking"""
+        trip = self._resolve_trip(booking_data)
+        if not trip['success']:
+            return trip
+        
+        bus_key = f"{trip['bus_number']}_{trip['travel_date']}"
+        with self.seat_locks.hold((trip['bus_number'], trip['travel_date'])):
+            if len(self.booked_seats.get(bus_key, ())) < trip['bus']['capacity']:
+                return {'success': False, 'message': 'Seats are available - book directly'}
+            return self.waitlist.join(booking_data, emergency=booking_data.get('emergency', False))
+    
+    def get_waitlist_status(self, waitlist_id: str) -> Optional[Dict]:
+        return self.waitlist.status(waitlist_id)
+    
+    def leave_waitlist(self, waitlist_id: str, passenger_id: str = None) -> Dict:
+        entry = self.waitlist.entries.get(waitlist_id)
+        if not entry or (passenger_id and entry['passenger_id'] != passenger_id):
+            return {'success': False, 'message': 'Waitlist entry not found'}
+        self.waitlist.leave(waitlist_id)
+        return {'success': True, 'message': 'Removed from waitlist'}
+    
+    def _claim_seat_for_waiter(self, bus_number: str, travel_date: str) -> Optional[tuple]:
+        """Hand a freed seat to the next waiter; caller must hold the seat lock"""
+        while True:
+            entry = self.waitlist.pop(bus_number, travel_date)
+            if entry is None:
+                return None
+            
+            trip = self._resolve_trip(entry)
+            if not trip['success']:
+                # Route or schedule changed since joining: this waiter cannot be served
+                self.waitlist.mark_promoted(entry['waitlist_id'], None, travel_date)
+                continue
+            
+            seat_number = self._assign_seat(f"{bus_number}_{travel_date}", trip['bus']['capacity'])
+            if seat_number is None:
+                self.waitlist.restore(entry)
+                return None
+            return entry, trip, seat_number
+    
+    def _issue_waitlisted_ticket(self, entry: Dict, trip: Dict, seat_number: int) -> Dict:
+        """Book the seat claimed for a promoted waiter"""
+        ticket_dict = self._build_ticket(trip, entry, seat_number).to_dict()
+        self._record_tickets([ticket_dict], emergency=entry.get('emergency', False))
+        self.waitlist.mark_promoted(entry['waitlist_id'], ticket_dict['ticket_id'], entry['travel_date'])
+        self._queue_ticket_download(ticket_dict)
+        return ticket_dict
+    
     def _update_bus_passenger_count(self, bus_number: str, change: int) -> None:
         """Update passenger count for a bus"""
         if 'buses' in self.buses:
-            for bus in self.buses['buses']:
-                if bus['bus_number'] == bus_number:
-                    bus['current_passengers'] = bus.get('current_passengers', 0) + change
-                    bus['last_updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    break
-            
-            # Save updated buses
-            self._save_json(self.buses, self.buses_file)
+            with self._buses_lock:
+                for bus in self.buses['buses']:
+                    if bus['bus_number'] == bus_number:
+                        bus['current_passengers'] = bus.get('current_passengers', 0) + change
+                        bus['last_updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                        self._dirty_buses.add(bus_number)
+                        break
+                
+                # Write-behind: the flusher persists buses on interval, threshold or shutdown
+                self.bus_flusher.mark_dirty()
     
     def _generate_qr_code(self, ticket_id: str) -> str:
         """Generate QR code data (simulated)"""
         return f"BUS:{ticket_id}:{datetime.now().strftime('%Y%m%d%H%M%S')}"
     
-    def _generate_ticket_download(self, ticket: Ticket) -> str:
+    def _generate_ticket_download(self, ticket: Dict) -> str:
         """Generate downloadable ticket file"""
-        filename = f"tickets/ticket_{ticket.ticket_id}.txt"
-        
-        # Create tickets directory if not exists
-        import os
-        os.makedirs('tickets', exist_ok=True)
-        
-        ticket_content = f"""
-========================================
-        BUS TICKET
-========================================
-Ticket ID: {ticket.ticket_id}
-Booking Date: {ticket.booking_time}
-Status: {ticket.status}
-----------------------------------------
-PASSENGER INFORMATION
-Name: {ticket.passenger_name}
-Contact: {ticket.passenger_contact}
-----------------------------------------
-JOURNEY DETAILS
-From: {ticket.from_stop}
-To: {ticket.to_stop}
-Date: {ticket.travel_date}
-----------------------------------------
-BUS DETAILS
-Bus Number: {ticket.bus_number}
-Route: {ticket.route_name}
-Seat Number: {ticket.seat_number}
-----------------------------------------
-TIMINGS
-Departure: {ticket.departure_time}
-Arrival: {ticket.arrival_time}
-----------------------------------------
-FARE: Rs. {ticket.fare}
-Payment Status: {ticket.payment_status}
-----------------------------------------
-QR Code: {ticket.qr_code}
-========================================
-Important:
-1. Please arrive at the stop 10 minutes before departure
-2. Keep this ticket for verification
-3. Contact 0800-12345 for assistance
-========================================
-"""
+        filename = f"tickets/ticket_{ticket['ticket_id']}.txt"
+        
+        # Temp file + rename (creates tickets/): a download never sees a half-written ticket
+        atomic_write_text(filename, ''.join(self.ticket_renderer.stream(ticket)))
         
-        with open(filename, 'w') as f:
-            f.write(ticket_content)
+        return filename
+    
+    def _queue_ticket_download(self, ticket: Dict) -> str:
+        """Queue ticket file generation on the background workers"""
+        ticket_id = ticket['ticket_id']
+        self.artifact_jobs.submit(f"ticket:{ticket_id}", self._generate_ticket_download, dict(ticket))
+        return f"tickets/ticket_{ticket_id}.txt"
+    
+    def _generate_group_download(self, group_id: str, tickets: List[Dict]) -> str:
+        """Generate a single downloadable file holding every ticket of a group"""
+        filename = f"tickets/group_{group_id}.txt"
+        
+        parts = [f"GROUP BOOKING: {group_id} ({len(tickets)} passengers)\n"]
+        for ticket in tickets:
+            parts.extend(self.ticket_renderer.stream(ticket))
+        atomic_write_text(filename, ''.join(parts))
         
         return filename
     
@@ -988,53 +1671,80 @@ Important:
         return self.transport_graph.has_cycle()
     
     # ===================== TICKET MANAGEMENT =====================
-    def cancel_ticket(self, ticket_id: str) -> Dict:
+    def cancel_ticket(self, ticket_id: str, idempotency_key: str = None, passenger_id: str = '') -> Dict:
+        """Cancel a ticket; a repeated idempotency_key returns the first response"""
+        payload = {'ticket_id': ticket_id, 'passenger_id': passenger_id, 'idempotency_key': idempotency_key}
+        return self._idempotent('cancel', payload, lambda: self._cancel_ticket(ticket_id))
+    
+    def _cancel_ticket(self, ticket_id: str) -> Dict:
         """Cancel a booked ticket"""
-        ticket_found = False
+        ticket = self.get_ticket_details(ticket_id)
         
-        for i, ticket in enumerate(self.tickets.get('tickets', [])):
-            if ticket['ticket_id'] == ticket_id:
-                # Update status
+        if not ticket:
+            return {'success': False, 'message': 'Ticket not found'}
+        if ticket_id in self.archive:
+            return {'success': False, 'message': 'Ticket is for a past trip and cannot be cancelled'}
+        
+        bus_key = f"{ticket['bus_number']}_{ticket['travel_date']}"
+        with self.seat_locks.hold((ticket['bus_number'], ticket['travel_date'])):
+            if ticket.get('status') == 'cancelled':
+                return {'success': False, 'message': 'Ticket already cancelled'}
+            
+            # Update status
+            with self._tickets_lock:
+                self.stats.record_cancellation(ticket)
                 ticket['status'] = 'cancelled'
                 ticket['cancellation_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                
-                # Free up seat
-                bus_key = f"{ticket['bus_number']}_{ticket['travel_date']}"
-                if bus_key in self.booked_seats and ticket['seat_number'] in self.booked_seats[bus_key]:
-                    self.booked_seats[bus_key].remove(ticket['seat_number'])
-                
-                # Update bus passenger count
-                self._update_bus_passenger_count(ticket['bus_number'], -1)
-                
-                # Update priority queue
-                self.ticket_queue.update_priority(ticket_id, 0)  # Lowest priority for cancelled
-                
-                ticket_found = True
-                break
+                ticket['last_modified'] = datetime.now().isoformat()
+            
+            # Free up seat
+            if bus_key in self.booked_seats and ticket['seat_number'] in self.booked_seats[bus_key]:
+                self.booked_seats[bus_key].remove(ticket['seat_number'])
+                self._seats_changed(bus_key)
+            
+            # The freed seat goes to the next waiter before any new booking can take it
+            claim = self._claim_seat_for_waiter(ticket['bus_number'], ticket['travel_date'])
         
-        if ticket_found:
-            self._save_tickets()
-            return {'success': True, 'message': 'Ticket cancelled successfully'}
+        # Update bus passenger count
+        self._update_bus_passenger_count(ticket['bus_number'], -1)
+        
+        # Cancelled tickets leave the priority queue
+        with self._tickets_lock:
+            self.ticket_queue.remove(ticket_id)
+        
+        self._persist_tickets([ticket])
         
-        return {'success': False, 'message': 'Ticket not found'}
+        # Refresh the ticket file so it shows the cancelled status
+        self._queue_ticket_download(ticket)
+        
+        promoted = self._issue_waitlisted_ticket(*claim) if claim else None
+        return {
+            'success': True,
+            'message': 'Ticket cancelled successfully',
+            'waitlist_promoted': promoted['ticket_id'] if promoted else None
+        }
     
     def get_ticket_details(self, ticket_id: str) -> Optional[Dict]:
-        """Get details of a specific ticket"""
-        for ticket in self.tickets.get('tickets', []):
-            if ticket['ticket_id'] == ticket_id:
-                return ticket
-        
-        return None
+        """Get details of a specific ticket O(1) via the history index, else from the archive"""
+        ticket = self.booking_history.search_by_ticket(ticket_id)
+        if ticket is None:
+            ticket = self.archive.get(ticket_id)
+        return ticket
     
     def get_passenger_tickets(self, passenger_id: str) -> List[Dict]:
-        """Get all tickets for a passenger"""
-        passenger_tickets = []
-        
-        for ticket in self.tickets.get('tickets', []):
-            if ticket.get('passenger_id') == passenger_id:
-                passenger_tickets.append(ticket)
-        
-        return passenger_tickets
+        """Get all tickets for a passenger, in booking order (archived trips first)"""
+        archived = self.archive.for_passenger(passenger_id)
+        return archived + [node.data for node in self.booking_history.by_passenger.get(passenger_id, [])]
+    
+    def get_bookings_between(self, start_date: str, end_date: str) -> List[Dict]:
+        """Tickets booked between two dates (inclusive)"""
+        bookings = self.archive.booked_between(start_date, end_date)
+        bookings += self.booking_history.search_by_date_range(start_date, end_date)
+        return sorted(bookings, key=BookingHistory._booking_date)
+    
+    def get_passenger_statistics(self, passenger_id: str) -> Dict:
+        """Get a passenger's ticket statistics (O(1) from running aggregates)"""
+        return self.stats.passenger_summary(passenger_id, resolve=self.get_ticket_details)
     
     def get_priority_ticket(self) -> Optional[Dict]:
         """Get highest priority ticket"""
@@ -1042,24 +1752,270 @@ Important:
     
     # ===================== STATISTICS =====================
     def get_system_statistics(self) -> Dict:
-        """Get system statistics"""
-        total_tickets = len(self.tickets.get('tickets', []))
-        active_tickets = len([t for t in self.tickets.get('tickets', []) if t.get('status') == 'confirmed'])
-        cancelled_tickets = len([t for t in self.tickets.get('tickets', []) if t.get('status') == 'cancelled'])
-        
-        total_revenue = sum(t.get('fare', 0) for t in self.tickets.get('tickets', []) 
-                          if t.get('status') == 'confirmed' and t.get('payment_status') == 'paid')
-        
-        total_passengers = len(self.passenger_bst.get_all_passengers())
+        """Get system statistics (O(1) from running aggregates)"""
+        summary = self.stats.summary()
+        active_tickets = summary['active_tickets']
+        total_revenue = summary['total_revenue']
         
         return {
-            'total_tickets': total_tickets,
+            'total_tickets': summary['total_tickets'],
             'active_tickets': active_tickets,
-            'cancelled_tickets': cancelled_tickets,
-            'total_revenue': round(total_revenue, 2),
-            'total_passengers': total_passengers,
+            'cancelled_tickets': summary['cancelled_tickets'],
+            'total_revenue': total_revenue,
+            'total_passengers': self.passenger_bst.size,
             'priority_queue_size': self.ticket_queue.size(),
+            'priority_queue_stale': self.ticket_queue.stale,
+            'waitlist_size': self.waitlist.size(),
+            'idempotency_keys': len(self.idempotency.responses),
             'booking_history_size': self.booking_history.size,
+            'archived_tickets': len(self.archive),
             'transport_nodes': len(self.transport_graph.nodes),
             'average_fare': round(total_revenue / active_tickets, 2) if active_tickets > 0 else 0
         }
+
+
+# Concurrency stress check: python -m dsa_structures.passenger_routes
+# ===================== SELF-CHECKS =====================
+def _make_system(route_name: str, buses: List[Dict], stops: List[Dict] = None) -> PassengerBookingSystem:
+    """Booking system over routes.json / buses.json / tickets.json in the working directory"""
+    with open('routes.json', 'w') as f:
+        json.dump({'routes': [{'route_id': 'R1', 'route_name': route_name,
+                               'stops': stops or [{'stop_name': 'A'}, {'stop_name': 'B'}]}]}, f)
+    with open('buses.json', 'w') as f:
+        json.dump({'buses': [{'capacity': 40, 'route_name': route_name, 'status': 'active', **bus} for bus in buses]}, f)
+    return PassengerBookingSystem('buses.json', 'routes.json', 'tickets.json')
+
+
+def _stop_system(system: PassengerBookingSystem) -> None:
+    system.artifact_jobs.shutdown()
+    system.bus_flusher.shutdown()
+    system.waitlist.flusher.shutdown()
+
+
+def _book_attempt(system: PassengerBookingSystem, dates: List[str], i: int) -> Dict:
+    return system.book_ticket({
+        'bus_number': str(i % 4 + 1),
+        'travel_date': dates[(i // 4) % 2],
+        'from_stop': 'A',
+        'to_stop': 'B',
+        'passenger_id': f"P{i}",
+    })
+
+
+def _check_concurrent_booking(system: PassengerBookingSystem, dates: List[str]) -> List[Dict]:
+    """500 concurrent attempts fill 4 buses x 2 dates exactly once"""
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(lambda i: _book_attempt(system, dates, i), range(500)))
+    
+    booked = [r['ticket'] for r in results if r['success']]
+    seats = [(t['bus_number'], t['travel_date'], t['seat_number']) for t in booked]
+    ticket_ids = [t['ticket_id'] for t in booked]
+    
+    print(f"\n1. Attempts: 500, booked: {len(booked)}, expected: {4 * 2 * 40}")
+    print(f"2. Double-sold seats: {len(seats) - len(set(seats))}")
+    print(f"3. Duplicate ticket IDs: {len(ticket_ids) - len(set(ticket_ids))}")
+    
+    assert len(booked) == 4 * 2 * 40
+    assert len(seats) == len(set(seats))
+    assert len(ticket_ids) == len(set(ticket_ids))
+    return booked
+
+
+def _check_availability_cache(system: PassengerBookingSystem, dates: List[str], booked: List[Dict]) -> Dict:
+    """Cached availability follows seat changes on the affected bus and date only"""
+    first, status = system.get_available_buses_with_status('A', 'B', dates[0])
+    again, status_again = system.get_available_buses_with_status('A', 'B', dates[0])
+    assert (status, status_again) == ('MISS', 'HIT') and all(b['available_seats'] == 0 for b in again)
+    assert system.get_available_buses_with_status('A', 'B', dates[1])[1] == 'MISS'
+    victim = next(t for t in booked if t['travel_date'] == dates[0])
+    system.cancel_ticket(victim['ticket_id'])
+    after, status_after = system.get_available_buses_with_status('A', 'B', dates[0])
+    assert status_after == 'MISS' and sum(b['available_seats'] for b in after) == 1
+    assert system.get_available_buses_with_status('A', 'B', dates[1])[1] == 'HIT'
+    assert system.book_ticket({**victim, 'passenger_id': 'P-rebook'})['success']
+    return victim
+
+
+def _check_seat_map(system: PassengerBookingSystem, bus_number: str, travel_date: str) -> None:
+    """Seat map bitmap mirrors booked seats and changes version on every seat change"""
+    seat_map = system.get_seat_map(bus_number, travel_date)
+    bits = base64.b64decode(seat_map['bitmap'])
+    assert all(bits[(n - 1) >> 3] >> ((n - 1) & 7) & 1 for n in range(1, 41))
+    assert seat_map['etag'] == system.seat_map_etag(bus_number, travel_date)
+
+
+def _check_availability_calendar(system: PassengerBookingSystem, dates: List[str]) -> None:
+    """The calendar grid agrees with per-date lookups"""
+    grid = system.get_availability_calendar('A', 'B', dates[0], days=2)
+    for col, date in enumerate(grid['dates']):
+        per_date = {b['bus_number']: b['available_seats'] for b in system.get_available_buses('A', 'B', date)}
+        assert per_date == {row['bus_number']: row['available_seats'][col] for row in grid['buses']}
+
+
+def _check_cancel_rebook_churn(system: PassengerBookingSystem, dates: List[str], booked: List[Dict]) -> List[Dict]:
+    """Cancel and rebook concurrently; freed seats must be resold exactly once"""
+    from concurrent.futures import ThreadPoolExecutor
+    booked = [t for t in booked if t['status'] == 'confirmed']
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        cancelled = list(pool.map(lambda t: system.cancel_ticket(t['ticket_id']), booked[:100]))
+        rebooked = list(pool.map(lambda i: _book_attempt(system, dates, i), range(200)))
+    
+    confirmed = [t for t in system.tickets['tickets'] if t['status'] == 'confirmed']
+    seats = [(t['bus_number'], t['travel_date'], t['seat_number']) for t in confirmed]
+    print(f"4. Cancelled: {sum(r['success'] for r in cancelled)}, "
+          f"rebooked: {sum(r['success'] for r in rebooked)}")
+    print(f"5. Double-sold seats after churn: {len(seats) - len(set(seats))}")
+    
+    assert len(seats) == len(set(seats))
+    assert len(confirmed) == 4 * 2 * 40
+    return confirmed
+
+
+def _check_statistics_and_history(system: PassengerBookingSystem) -> None:
+    """Running aggregates and history indexes match a rebuild from the ticket store"""
+    recount = BookingStatistics()
+    recount.rebuild(system.tickets['tickets'])
+    assert system.stats.summary() == recount.summary()
+    assert system.stats.by_day == recount.by_day
+    
+    today = datetime.now().strftime('%Y-%m-%d')
+    history = BookingHistory()
+    history.rebuild(system.tickets['tickets'])
+    assert len(system.get_bookings_between(today, today)) == len(system.tickets['tickets'])
+    assert history.search_by_date_range('2000-01-01', today) == system.tickets['tickets']
+    assert system.get_passenger_tickets('P7') == [t for t in system.tickets['tickets'] if t['passenger_id'] == 'P7']
+
+
+def _check_waitlist(system: PassengerBookingSystem, travel_date: str, confirmed: List[Dict]) -> None:
+    """A full trip: waiters queue up, an emergency waiter jumps the line on cancellation"""
+    full = {'bus_number': '1', 'travel_date': travel_date, 'from_stop': 'A', 'to_stop': 'B'}
+    first = system.book_ticket({**full, 'passenger_id': 'W1', 'join_waitlist': True})
+    second = system.join_waitlist({**full, 'passenger_id': 'W2', 'emergency': True})
+    assert first['waitlisted'] and first['position'] == 1 and second['position'] == 1
+    
+    victim = next(t for t in confirmed if t['bus_number'] == '1' and t['travel_date'] == travel_date)
+    result = system.cancel_ticket(victim['ticket_id'])
+    promoted = system.get_ticket_details(result['waitlist_promoted'])
+    print(f"6. Waitlist promoted {promoted['passenger_id']} to seat {promoted['seat_number']}, "
+          f"still waiting: {system.get_waitlist_status(first['waitlist_id'])['position']}")
+    assert promoted['passenger_id'] == 'W2' and promoted['seat_number'] == victim['seat_number']
+    assert system.get_waitlist_status(second['waitlist_id'])['status'] == 'promoted'
+    system.waitlist.flusher.flush()
+    assert TripWaitlist(system.waitlist_file).status(first['waitlist_id'])['status'] == 'waiting'
+    # Once the trip is past, its waiters and promotion outcomes are forgotten
+    assert system.waitlist.prune_before('2099-01-01') == 2 and not system.waitlist.promoted
+    assert system.get_waitlist_status(first['waitlist_id']) is None
+
+
+def _check_write_behind(system: PassengerBookingSystem) -> None:
+    """Ticket files and passenger counts reach disk once the background writers stop"""
+    system.artifact_jobs.shutdown()
+    print(f"7. Ticket file jobs: {system.artifact_jobs.stats()}")
+    system.bus_flusher.shutdown()
+    with open(system.buses_file) as f:
+        persisted = sum(b.get('current_passengers', 0) for b in json.load(f)['buses'])
+    print(f"8. Passenger count on disk: {persisted}, bus flushes: {system.bus_flusher.flushes}")
+    assert persisted == 4 * 2 * 40
+    system.waitlist.flusher.shutdown()
+
+
+def _check_booking_under_load() -> None:
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # ticket text files are written relative to the working directory
+        system = _make_system('Stress Route', [
+            {'bus_number': str(n), 'plate_number': f"LEA-{n}", 'driver_name': f"Driver {n}"} for n in range(1, 5)
+        ], stops=[{'stop_name': 'A', 'wait_time': 2}, {'stop_name': 'B', 'wait_time': 2}])
+        dates = ['2030-01-07', '2030-01-08']
+        
+        booked = _check_concurrent_booking(system, dates)
+        victim = _check_availability_cache(system, dates, booked)
+        _check_seat_map(system, victim['bus_number'], dates[0])
+        _check_availability_calendar(system, dates)
+        confirmed = _check_cancel_rebook_churn(system, dates, booked)
+        _check_statistics_and_history(system)
+        _check_waitlist(system, dates[0], confirmed)
+        _check_write_behind(system)
+
+
+def _check_idempotent_retries() -> None:
+    """Retries with one idempotency key book once and replay the first response"""
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        system = _make_system('Retry Route', [{'bus_number': '9', 'capacity': 10}])
+        request = {'bus_number': '9', 'travel_date': '2030-01-07', 'from_stop': 'A', 'to_stop': 'B',
+                   'passenger_id': 'P1', 'idempotency_key': 'retry-1'}
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            responses = list(pool.map(lambda _: system.book_ticket(dict(request)), range(50)))
+        ticket_ids = {r['ticket_id'] for r in responses}
+        conflict = system.book_ticket({**request, 'to_stop': 'A'})
+        cancels = [system.cancel_ticket(responses[0]['ticket_id'], 'cancel-1', 'P1') for _ in range(3)]
+        print(f"9. Idempotent retries: 50 requests -> {len(ticket_ids)} ticket, "
+              f"replays {system.idempotency.replays}, cancels ok {[c['success'] for c in cancels]}")
+        assert len(ticket_ids) == 1 and len(system.tickets['tickets']) == 1
+        assert conflict.get('idempotency_conflict')
+        assert all(c['success'] for c in cancels) and cancels[2]['idempotent_replay']
+        _stop_system(system)
+
+
+def _check_passenger_tree() -> None:
+    """Sorted inserts used to degrade the BST into a linked list deeper than the recursion limit"""
+    tree = PassengerBST()
+    for n in range(50000):
+        tree.insert(f"P{n:06d}", {'n': n})
+    print(f"10. Passenger tree: size {tree.size}, height {tree.root.height}, "
+          f"rank(P025000) {tree.rank('P025000')}, prefix P0001* {len(tree.prefix_scan('P0001'))}")
+    assert tree.root.height <= 24 and tree.select(25000)['n'] == 25000
+
+
+def _check_archive() -> None:
+    """Past trips leave memory for the archive and are faulted back in by ticket id"""
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        system = _make_system('Archive Route', [{'bus_number': '5'}])
+        booked = [system.book_ticket({'bus_number': '5', 'travel_date': date, 'from_stop': 'A', 'to_stop': 'B',
+                                      'passenger_id': 'P1'})['ticket_id']
+                  for date in ('2030-01-01', '2030-01-01', '2030-01-02', '2030-01-03')]
+        moved = system.archive_past_tickets(today='2030-01-03')
+        _stop_system(system)
+        restarted = PassengerBookingSystem('buses.json', 'routes.json', 'tickets.json')
+        restarted.archive_past_tickets(today='2030-01-03')
+        print(f"11. Archive: moved {moved}, resident {len(restarted.tickets['tickets'])}, "
+              f"passenger history {len(restarted.get_passenger_tickets('P1'))}, {restarted.archive.statistics()}")
+        assert moved == 3 and [t['ticket_id'] for t in restarted.tickets['tickets']] == booked[3:]
+        assert restarted.get_ticket_details(booked[0])['travel_date'] == '2030-01-01'
+        assert [t['ticket_id'] for t in restarted.get_passenger_tickets('P1')] == booked
+        assert restarted.get_system_statistics()['total_tickets'] == 4
+        assert not restarted.cancel_ticket(booked[1])['success']
+        _stop_system(restarted)
+
+
+def _check_ticket_priority() -> None:
+    """Emergency tickets (priority 100) are served before normal ones (priority 10)"""
+    ticket_queue = TicketPriorityQueue()
+    for n, priority in enumerate([10, 10, 100, 10, 100]):
+        ticket_queue.push(f"T{n}", {}, priority)
+    ticket_queue.update_priority('T0', 50)
+    served = [ticket_queue.pop()['ticket_id'] for _ in range(ticket_queue.size())]
+    print(f"12. Ticket priority order: {served}")
+    assert served == ['T2', 'T4', 'T0', 'T1', 'T3']
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Stress Testing Concurrent Ticket Booking")
+    print("=" * 60)
+    
+    _check_booking_under_load()
+    _check_idempotent_retries()
+    _check_passenger_tree()
+    _check_archive()
+    _check_ticket_priority()
+    
+    print("\n" + "=" * 60)
+    print("Concurrent Booking Stress Test Complete!")
+    print("=" * 60)
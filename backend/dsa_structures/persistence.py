@@ -0,0 +1,414 @@
+"""
+Persistence helpers
+1. Atomic JSON writes (temp file + rename, optional fsync)
+2. Coalesced durable saves: concurrent saves of one file collapse into one write
+3. Write-behind flusher that batches mutations of an in-memory dataset
+4. JSON-lines appender: O(1) buffered appends with flush/fsync policy and size rotation
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# fsync data and directory on every durable save (off by default: rename alone is crash-atomic)
+FSYNC_DEFAULT = os.environ.get('DSA_FSYNC', '').lower() in ('1', 'true', 'yes')
+
+# How long the leader of a burst (saves queued behind a write) waits for stragglers
+COALESCE_WINDOW = 0.005
+
+
+def _fsync_directory(directory: str) -> None:
+    """Make the rename itself durable (no-op where directories cannot be opened)"""
+    try:
+        fd = os.open(directory or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_text(path: str, text: str, fsync: bool = False, encoding: Optional[str] = None) -> tuple:
+    """Write text to a temp file in the same directory, then rename over the target
+
+    Returns the (inode, size, mtime_ns) signature of the new file.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, 'w', encoding=encoding) as f:
+            f.write(text)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+            st = os.fstat(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    if fsync:
+        _fsync_directory(directory)
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def atomic_write_json(path: str, data: Any, indent: int = 2, fsync: bool = False) -> None:
+    """Serialize data as JSON and write it atomically"""
+    atomic_write_text(path, json.dumps(data, indent=indent), fsync=fsync)
+
+
+class _Batch:
+    """Save requests that one physical write will cover"""
+    __slots__ = ('render', 'joined', 'done', 'error')
+
+    def __init__(self):
+        self.render = None
+        self.joined = 0
+        self.done = False
+        self.error = None
+
+
+class CoalescingWriter:
+    """Group commit for one file: the newest render wins, every caller waits for a write covering it
+
+    A save with no write in flight leads and writes at once. Saves arriving while
+    a write is in flight join the next batch; its leader waits the coalescing
+    window for stragglers only when several saves have queued, then renders the
+    newest requested content once. Ten saves within a few milliseconds therefore
+    cost at most two encodes and two renames, and a lone save never sleeps.
+    """
+    def __init__(self, path: str, window: float = COALESCE_WINDOW, fsync: bool = FSYNC_DEFAULT,
+                 encoding: Optional[str] = None):
+        self.path = path
+        self.window = window
+        self.fsync = fsync
+        self.encoding = encoding
+        self.requests = 0
+        self.writes = 0
+        self._cond = threading.Condition()
+        self._pending = _Batch()
+        self._writing = False
+
+    def save(self, render: Callable[[], str]) -> None:
+        """Write render() (or a newer request's render) durably; raises if that write failed"""
+        with self._cond:
+            self.requests += 1
+            batch = self._pending
+            batch.render = render
+            batch.joined += 1
+            while not batch.done:
+                if self._writing:
+                    self._cond.wait()
+                else:
+                    self._lead()
+        if batch.error is not None:
+            raise batch.error
+
+    def _lead(self) -> None:
+        """Write the pending batch; called and returns with the condition held"""
+        self._writing = True
+        batch = None
+        burst = self._pending.joined > 1
+        self._cond.release()
+        try:
+            if burst and self.window > 0:
+                time.sleep(self.window)
+            with self._cond:
+                batch, self._pending = self._pending, _Batch()
+            signature = atomic_write_text(self.path, batch.render(), fsync=self.fsync, encoding=self.encoding)
+            for listener in list(_write_listeners):
+                listener(self.path, signature)
+        except Exception as e:
+            if batch is not None:
+                batch.error = e
+        finally:
+            self._cond.acquire()
+            if batch is not None:
+                batch.done = True
+                if batch.error is None:
+                    self.writes += 1
+            self._writing = False
+            self._cond.notify_all()
+
+    def statistics(self) -> Dict:
+        return {'path': self.path, 'requests': self.requests, 'writes': self.writes}
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+_write_listeners = []
+
+
+def add_write_listener(callback: Callable[[str, tuple], None]) -> None:
+    """callback(path, signature) after every durable write made by this process"""
+    _write_listeners.append(callback)
+
+
+def writer_for(path: str, encoding: Optional[str] = None) -> CoalescingWriter:
+    """The process-wide writer for a file, so every save path of it is coordinated"""
+    key = os.path.abspath(path)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = CoalescingWriter(path, encoding=encoding)
+        return writer
+
+
+def durable_write(path: str, render: Callable[[], str], encoding: Optional[str] = None) -> None:
+    """Atomically replace path with render(), coalesced with concurrent saves of the same file"""
+    writer_for(path, encoding).save(render)
+
+
+def durable_write_json(path: str, data: Any, indent: int = 2, encoding: Optional[str] = None) -> None:
+    """durable_write of data as JSON; encoding is skipped when a newer save supersedes it"""
+    durable_write(path, lambda: json.dumps(data, indent=indent), encoding)
+
+
+class WriteBehindFlusher:
+    """Tracks dirty mutations and flushes a dataset on interval, threshold or shutdown"""
+    def __init__(self, path: str, snapshot: Callable[[], Any], interval: float = 2.0,
+                 max_dirty: int = 50, indent: int = 2, lock: Optional[threading.RLock] = None,
+                 write: Optional[Callable[[Any], None]] = None):
+        self.path = path
+        # write(snapshot()) replaces the JSON encode and file write, e.g. to flush only changed rows
+        self.write = write
+        self.context = nullcontext  # entered around every write (e.g. ChangeWatcher.quiet)
+        self.snapshot = snapshot
+        self.interval = interval
+        self.max_dirty = max_dirty
+        self.indent = indent
+        self.lock = lock or threading.RLock()  # guards the dataset returned by snapshot
+        self.dirty = 0
+        self.flushes = 0
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name=f"flusher-{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def mark_dirty(self, count: int = 1) -> None:
+        """Record mutations; wakes the flusher early once the threshold is hit"""
+        with self.lock:
+            self.dirty += count
+            should_wake = self.dirty >= self.max_dirty
+        if should_wake:
+            self._wake.set()
+
+    def flush(self) -> bool:
+        """Write the dataset now if anything changed"""
+        with self._flush_lock:
+            with self.lock:
+                if self.dirty == 0:
+                    return False
+                # Snapshot (and serialize) under the dataset lock so mutations never interleave
+                if self.write is not None:
+                    data = self.snapshot()
+                else:
+                    data = json.dumps(self.snapshot(), indent=self.indent)
+                pending = self.dirty
+                self.dirty = 0
+            try:
+                with self.context():
+                    if self.write is not None:
+                        self.write(data)
+                    else:
+                        durable_write(self.path, lambda: data)
+            except Exception as e:
+                with self.lock:
+                    self.dirty += pending
+                print(f"Error flushing {self.path}: {e}")
+                return False
+            self.flushes += 1
+            return True
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def shutdown(self) -> None:
+        """Stop the background thread and write any pending changes"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=self.interval + 1)
+        self.flush()
+
+
+class JsonLinesAppender:
+    """Append-only JSON-lines file: one record per line, written in buffered batches
+
+    Flush policy: the buffer is written once flush_records records are pending,
+    every flush_interval seconds (background thread; None disables it) and at
+    shutdown. fsync=True also syncs every flush to disk. With rotate_bytes the
+    file is renamed to <path>.<n> once it reaches that size; keep bounds how
+    many rotated segments are retained.
+    """
+    def __init__(self, path: str, flush_records: int = 100, flush_interval: Optional[float] = 1.0,
+                 fsync: bool = FSYNC_DEFAULT, rotate_bytes: Optional[int] = None, keep: Optional[int] = None):
+        self.path = path
+        self.flush_records = max(1, flush_records)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.rotate_bytes = rotate_bytes
+        self.keep = keep
+        self.appended = 0
+        self.flushes = 0
+        self.rotations = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._file = None
+        self._closed = False
+        self._repair_torn_tail()
+
+        self._wake = threading.Event()
+        self._thread = None
+        if flush_interval:
+            self._thread = threading.Thread(target=self._run, name=f"appender-{os.path.basename(path)}", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def _repair_torn_tail(self) -> None:
+        """Drop a partial last line left by a crash so the next append starts on a fresh line"""
+        try:
+            with open(self.path, 'rb+') as f:
+                size = f.seek(0, os.SEEK_END)
+                if size == 0:
+                    return
+                f.seek(size - 1)
+                if f.read(1) == b'\n':
+                    return
+                # Scan back in blocks for the last complete line
+                end = size
+                while end > 0:
+                    start = max(0, end - 65536)
+                    f.seek(start)
+                    block = f.read(end - start)
+                    newline = block.rfind(b'\n')
+                    if newline != -1:
+                        f.truncate(start + newline + 1)
+                        return
+                    end = start
+                f.truncate(0)
+        except FileNotFoundError:
+            pass
+
+    def append(self, record: Any) -> None:
+        """Queue one record; O(1) regardless of file size"""
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._lock:
+            if self._closed:
+                raise ValueError(f"Appender for {self.path} is closed")
+            self._buffer.append(line)
+            self.appended += 1
+            if len(self._buffer) >= self.flush_records:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._buffer:
+            return
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'ab')
+        # One write per batch: concurrent appenders (O_APPEND) never interleave inside a line
+        self._file.write(''.join(self._buffer).encode())
+        self._buffer = []
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.flushes += 1
+        if self.rotate_bytes and self._file.tell() >= self.rotate_bytes:
+            self._rotate_locked()
+
+    def _rotate_locked(self) -> None:
+        self._file.close()
+        self._file = None
+        segments = rotated_segments(self.path)
+        last = int(segments[-1].rsplit('.', 1)[-1]) if segments else 0
+        os.replace(self.path, f"{self.path}.{last + 1}")
+        self.rotations += 1
+        if self.keep is not None:
+            segments = rotated_segments(self.path)
+            for old in segments[:max(0, len(segments) - self.keep)]:
+                os.remove(old)
+
+    def __iter__(self) -> Iterator[Any]:
+        """Every flushed record, oldest first (pending buffer included after a flush)"""
+        self.flush()
+        return iter_json_lines(self.path)
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing {self.path}: {e}")
+
+    def close(self) -> None:
+        """Write pending records and stop the flush thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._flush_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+
+    def statistics(self) -> Dict:
+        return {
+            'path': self.path,
+            'appended': self.appended,
+            'pending': len(self._buffer),
+            'flushes': self.flushes,
+            'rotations': self.rotations,
+        }
+
+
+def rotated_segments(path: str) -> List[str]:
+    """Rotated segments of a JSON-lines file (<path>.1, <path>.2, ...), oldest first"""
+    directory = os.path.dirname(path) or '.'
+    prefix = os.path.basename(path) + '.'
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    numbered = [(int(name[len(prefix):]), os.path.join(directory, name))
+                for name in names if name.startswith(prefix) and name[len(prefix):].isdigit()]
+    return [segment for _, segment in sorted(numbered)]
+
+
+def iter_json_lines(path: str) -> Iterator[Any]:
+    """Records of the rotated segments, then the live file; a torn last line is skipped"""
+    for segment in [*rotated_segments(path), path]:
+        try:
+            f = open(segment, 'rb')
+        except FileNotFoundError:
+            continue
+        with f:
+            for line in f:
+                if line.endswith(b'\n') and line.strip():
+                    yield json.loads(line)
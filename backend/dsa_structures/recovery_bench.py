@@ -0,0 +1,658 @@
+"""
+Cold-Start Benchmark and Crash-Recovery Harness
+1. Load benchmark: synthetic datasets at several scales (users, route shards,
+   buses, hot tickets and the ticket archive) in the on-disk formats the
+   managers read; each manager is loaded in a fresh process, recording load
+   time and peak RSS, with the JSON files or SQLite (WAL) as the backend
+2. Crash harness: a worker runs a mixed write workload (users, routes,
+   bookings, archiving, a JSON-lines event log) and is killed part way:
+   - signal: SIGKILL after a random delay
+   - io:     the process dies at a random durable write point (before a
+             rename over a snapshot, before a SQLite COMMIT, between an
+             archive record and its index line)
+   - torn:   signal, then the last line of every append-only file is cut
+             (a torn write the page cache would never have produced)
+   A fresh process then loads everything and checks that the recovered
+   state is consistent and, except for torn trials, that every write the
+   worker acknowledged survived
+Results are printed (or written with --out) as JSON; the exit status is 1 if
+any trial recovered an inconsistent state.
+
+    python -m dsa_structures.recovery_bench run --scales tiny,small --backends json,sqlite --trials 20
+    python -m dsa_structures.recovery_bench run --scales large --skip-crash --out cold_start.json
+"""
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+from .archive import TicketArchive
+from .persistence import FSYNC_DEFAULT
+from .route_store import RouteShardStore, shard_directory
+from .storage import SQLiteStorage, migrate_json
+
+SCALES = {
+    'tiny': {'users': 200, 'routes': 20, 'buses': 20, 'tickets': 2_000},
+    'small': {'users': 1_000, 'routes': 100, 'buses': 100, 'tickets': 10_000},
+    'medium': {'users': 10_000, 'routes': 1_000, 'buses': 500, 'tickets': 100_000},
+    'large': {'users': 100_000, 'routes': 10_000, 'buses': 5_000, 'tickets': 1_000_000},
+}
+MANAGERS = ('users', 'routes', 'booking')
+FAULT_MODES = ('signal', 'io', 'torn')
+
+STOPS_PER_ROUTE = 8
+BUS_CAPACITY = 50
+ARCHIVED_SHARE = 0.5             # tickets generated into the archive (past travel dates)
+FIRST_TICKET = 1000
+ARCHIVE_EPOCH = date(2025, 1, 1)  # archived travel dates start here
+HOT_EPOCH = date(2030, 1, 1)      # resident travel dates start here
+
+SIGNAL_WINDOW = 1.0     # seconds of workload before a signal-mode kill, at most
+IO_POINTS = 60          # io-mode kills land on one of the first IO_POINTS write points
+TRIAL_TIMEOUT = 30.0
+KILLED = 137            # exit status of a worker that killed itself at a fault point
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ===================== DATASET GENERATION =====================
+def _write_document(path: str, key: str, records: Iterable[Dict], extras: Dict = None) -> None:
+    """{"<key>": [...], **extras} written record by record"""
+    with open(path, 'w') as f:
+        f.write(f'{{{json.dumps(key)}: [')
+        for n, record in enumerate(records):
+            f.write(',\n' if n else '\n')
+            f.write(json.dumps(record))
+        f.write('\n]')
+        for name, value in (extras or {}).items():
+            f.write(f', {json.dumps(name)}: {json.dumps(value)}')
+        f.write('}\n')
+
+
+def _ticket(number: int, slot: int, epoch: date, buses: List[Dict], routes: List[Dict], user_ids: List[str]) -> Dict:
+    """Ticket for the slot-th seat of a layout filling every bus, one day after another"""
+    bus = buses[slot % len(buses)]
+    seat = (slot // len(buses)) % BUS_CAPACITY + 1
+    day = slot // (len(buses) * BUS_CAPACITY)
+    route = routes[int(bus['bus_number']) % len(routes)]
+    travel_date = epoch + timedelta(days=day)
+    passenger = user_ids[number % len(user_ids)]
+    return {
+        'ticket_id': f"TKT{number:06d}",
+        'passenger_id': passenger,
+        'passenger_name': f"Passenger {number % len(user_ids)}",
+        'passenger_contact': f"0300{number % 10_000_000:07d}",
+        'bus_number': bus['bus_number'],
+        'route_id': route['route_id'],
+        'route_name': route['route_name'],
+        'from_stop': route['stops'][0]['stop_name'],
+        'to_stop': route['stops'][-1]['stop_name'],
+        'departure_time': '08:00',
+        'arrival_time': '08:40',
+        'travel_date': travel_date.isoformat(),
+        'seat_number': seat,
+        'fare': 70.0,
+        'booking_time': f"{(travel_date - timedelta(days=3)).isoformat()}T09:00:00",
+        'status': 'confirmed',
+        'qr_code': None,
+        'payment_status': 'paid',
+        'group_id': None,
+        'last_modified': None,
+    }
+
+
+def generate_dataset(data_dir: str, counts: Dict[str, int], seed: int = 0) -> Dict:
+    """Write users.json, the route shards, buses.json, tickets.json and the ticket archive"""
+    rng = random.Random(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    created = '2026-01-01T00:00:00'
+
+    user_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(counts['users'])]
+    _write_document(os.path.join(data_dir, 'users.json'), 'users', ({
+        'user_id': user_id,
+        'username': f"user{n}",
+        'email': f"user{n}@example.com",
+        'phone': f"0300{n:07d}",
+        'full_name': f"User {n}",
+        'password_hash': hashlib.sha256(f"password{n}".encode()).hexdigest(),
+        'role': 'passenger',
+        'created_at': created,
+        'last_login': None,
+        'is_active': True,
+    } for n, user_id in enumerate(user_ids)), {'last_updated': created, 'total_users': len(user_ids)})
+
+    # Neighbouring routes share stops, so the transport graph is connected
+    stop_pool = max(STOPS_PER_ROUTE + 1, counts['routes'] * 4)
+    routes = []
+    for r in range(counts['routes']):
+        stops = [{
+            'stop_name': f"Stop {(r * 3 + s) % stop_pool}",
+            'wait_time': 2,
+            'location': '',
+            'latitude': 31.5 + rng.random() / 10,
+            'longitude': 74.3 + rng.random() / 10,
+            'distance_from_previous': 1.5 if s else 0.0,
+            'stop_id': f"R{r:05d}-S{s}",
+            'added_at': created,
+        } for s in range(STOPS_PER_ROUTE)]
+        routes.append({'route_id': f"R{r:05d}", 'route_name': f"Route {r}", 'created_at': created,
+                       'total_stops': len(stops), 'stops': stops})
+    routes_file = os.path.join(data_dir, 'routes.json')
+    RouteShardStore(shard_directory(routes_file)).save([route['route_id'] for route in routes],
+                                                       {route['route_id']: route for route in routes})
+
+    buses = []
+    for b in range(counts['buses']):
+        route = routes[(b + 1) % len(routes)]
+        buses.append({
+            'bus_number': str(b + 1), 'plate_number': f"LEA-{b + 1}", 'driver_name': f"Driver {b + 1}",
+            'driver_contact': f"0311{b:07d}", 'capacity': BUS_CAPACITY, 'current_passengers': 0,
+            'status': 'active', 'type': 'regular', 'next_arrival': '08:00', 'route_id': route['route_id'],
+            'route_name': route['route_name'], 'route_demand': 50, 'timings': [], 'id': b + 1,
+            'created_at': created, 'last_updated': created,
+        })
+    _write_document(os.path.join(data_dir, 'buses.json'), 'buses', buses)
+
+    archived = int(counts['tickets'] * ARCHIVED_SHARE)
+    hot = counts['tickets'] - archived
+    _write_document(os.path.join(data_dir, 'tickets.json'), 'tickets', (
+        _ticket(FIRST_TICKET + archived + slot, slot, HOT_EPOCH, buses, routes, user_ids) for slot in range(hot)
+    ), {'next_id': FIRST_TICKET + counts['tickets']})
+
+    archive = TicketArchive(os.path.join(data_dir, 'tickets_archive.jsonl'), fsync=False)
+    for start in range(0, archived, 50_000):
+        archive.append(_ticket(FIRST_TICKET + slot, slot, ARCHIVE_EPOCH, buses, routes, user_ids)
+                       for slot in range(start, min(archived, start + 50_000)))
+    archive.close()
+    return {**counts, 'hot_tickets': hot, 'archived_tickets': archived}
+
+
+def _directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+# ===================== CHILD PROCESSES =====================
+def _peak_rss_mb() -> Optional[float]:
+    # Linux: the high-water mark of this program only (ru_maxrss survives exec,
+    # so it would report the parent's peak)
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)
+
+
+@contextmanager
+def _quiet():
+    """Silence the managers' progress prints; yields the real stdout for results"""
+    real = sys.stdout
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        try:
+            yield real
+        finally:
+            sys.stdout = real
+
+
+def _open_backend(data_dir: str, backend: str) -> Optional[SQLiteStorage]:
+    return SQLiteStorage(os.path.join(data_dir, 'dsa.sqlite3')) if backend == 'sqlite' else None
+
+
+def _load_managers(data_dir: str, storage, names: Iterable[str] = MANAGERS) -> Dict:
+    # Imported here so the parent process never pays for them
+    from .passenger_routes import PassengerBookingSystem
+    from .routes import RouteManager
+    from .users import UserManager
+
+    loaded = {}
+    for name in names:
+        if name == 'users':
+            loaded[name] = UserManager(os.path.join(data_dir, 'users.json'), storage=storage)
+        elif name == 'routes':
+            loaded[name] = RouteManager(os.path.join(data_dir, 'routes.json'), storage=storage)
+        else:
+            loaded[name] = PassengerBookingSystem(os.path.join(data_dir, 'buses.json'),
+                                                  os.path.join(data_dir, 'routes.json'),
+                                                  os.path.join(data_dir, 'tickets.json'), storage=storage)
+    return loaded
+
+
+def measure_load(manager: str, data_dir: str, backend: str) -> Dict:
+    """Load one manager cold (run in a fresh process so peak RSS is its own)"""
+    import_rss = _peak_rss_mb()
+    storage = _open_backend(data_dir, backend)
+    with _quiet():
+        started = time.perf_counter()
+        loaded = _load_managers(data_dir, storage, [manager])[manager]
+        elapsed = time.perf_counter() - started
+    if manager == 'users':
+        records = {'users': len(loaded.users)}
+    elif manager == 'routes':
+        records = {'routes': len(loaded.routes)}
+    else:
+        records = {'buses': len(loaded.buses.get('buses', [])), 'routes': len(loaded.routes.get('routes', [])),
+                   'hot_tickets': len(loaded.tickets.get('tickets', [])), 'archived_tickets': len(loaded.archive)}
+    return {'manager': manager, 'seconds': round(elapsed, 4), 'peak_rss_mb': _peak_rss_mb(),
+            'import_rss_mb': import_rss, 'records': records}
+
+
+class _FaultPoints:
+    """Kills the process at the kill_at-th durable write point"""
+    def __init__(self, kill_at: int):
+        self.kill_at = kill_at
+        self.calls = 0
+
+    def reached(self, point: str) -> None:
+        self.calls += 1
+        if self.calls >= self.kill_at:
+            # No atexit, no buffered flushes: exactly what a crash leaves behind
+            os._exit(KILLED)
+
+    def install(self, storage) -> None:
+        replace = os.replace
+
+        def fault_replace(src, dst, *args, **kwargs):
+            self.reached('rename')
+            return replace(src, dst, *args, **kwargs)
+        os.replace = fault_replace
+
+        append_index = TicketArchive._append_index
+
+        def fault_append_index(archive, entries):
+            if entries:
+                self.reached('archive-index')
+            return append_index(archive, entries)
+        TicketArchive._append_index = fault_append_index
+
+        if storage is not None:
+            storage.conn = _FaultConnection(storage.conn, self)
+
+
+class _FaultConnection:
+    """sqlite3 connection proxy with a fault point before every COMMIT"""
+    def __init__(self, conn, faults: _FaultPoints):
+        self._conn = conn
+        self._faults = faults
+
+    def execute(self, sql, *args):
+        if sql.lstrip().upper().startswith('COMMIT'):
+            self._faults.reached('commit')
+        return self._conn.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def run_workload(data_dir: str, backend: str, seed: int, kill_at: Optional[int] = None) -> None:
+    """Write until killed, printing one acknowledgement line per completed durable write"""
+    from .utils import DataHandler
+
+    rng = random.Random(seed)
+    os.chdir(data_dir)  # ticket artifacts are written relative to the working directory
+    storage = _open_backend(data_dir, backend)
+    with _quiet() as out:
+        managers = _load_managers(data_dir, storage)
+        users, routes, booking = managers['users'], managers['routes'], managers['booking']
+        events = DataHandler(data_dir, flush_records=1, flush_interval=None)
+        buses = booking.buses.get('buses', [])
+        route_stops = {r['route_name']: [s['stop_name'] for s in r.get('stops', [])]
+                       for r in booking.routes.get('routes', [])}
+        if kill_at is not None:
+            _FaultPoints(kill_at).install(storage)
+
+        def ack(kind, key):
+            out.write(f"{kind} {key}\n")
+            out.flush()
+
+        ack('ready', os.getpid())
+        cut = HOT_EPOCH
+        for n in range(1_000_000):
+            op = rng.choices(('ticket', 'event', 'user', 'route', 'archive'), weights=(4, 3, 1, 1, 1))[0]
+            if op == 'ticket':
+                bus = rng.choice(buses)
+                stops = route_stops.get(bus.get('route_name'), [])
+                if not stops:
+                    continue
+                result = booking.book_ticket({
+                    'bus_number': bus['bus_number'],
+                    'travel_date': (cut + timedelta(days=rng.randint(0, 20))).isoformat(),
+                    'from_stop': stops[0], 'to_stop': stops[-1],
+                    'passenger_id': f"crash-{seed}-{n}",
+                })
+                if result.get('success'):
+                    ack('ticket', result['ticket_id'])
+            elif op == 'event':
+                if events.append_data('events.jsonl', {'seq': n, 'seed': seed}):
+                    ack('event', n)
+            elif op == 'user':
+                username = f"crash{seed}_{n}"
+                users.create_user(username, f"{username}@example.com", '03000000000', username, 'secret')
+                ack('user', username)
+            elif op == 'route':
+                ack('route', routes.create_route(f"Crash {seed}-{n}").route_id)
+            else:
+                cut += timedelta(days=1)
+                booking.archive_past_tickets(today=cut.isoformat())
+                ack('archive', cut.isoformat())
+
+
+def _check_recovered(data_dir: str, backend: str, acks: Optional[Dict[str, List[str]]],
+                     checks: Dict, details: Dict) -> None:
+    """Manager-level checks (raises when the data cannot be loaded at all)"""
+    from .utils import DataHandler
+
+    storage = _open_backend(data_dir, backend)
+    if storage is not None:
+        checks['sqlite_integrity'] = storage.conn.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+    else:
+        manifest_path = os.path.join(shard_directory(os.path.join(data_dir, 'routes.json')), 'manifest.json')
+        with open(manifest_path, 'r') as f:
+            shards = [entry['shard'] for entry in json.load(f).get('routes', [])]
+        checks['route_shards_present'] = all(os.path.exists(os.path.join(os.path.dirname(manifest_path), name))
+                                             for name in shards)
+
+    with _quiet():
+        managers = _load_managers(data_dir, storage)
+    users, routes, booking = managers['users'], managers['routes'], managers['booking']
+
+    user_ids = [user.user_id for user in users.users]
+    usernames = [user.username for user in users.users]
+    checks['users_unique'] = len(set(user_ids)) == len(user_ids) and len(set(usernames)) == len(usernames)
+
+    hot = booking.tickets.get('tickets', [])
+    hot_ids = [t['ticket_id'] for t in hot]
+    seats = [(t['bus_number'], t['travel_date'], t['seat_number']) for t in hot if t.get('status') == 'confirmed']
+    checks['tickets_unique'] = len(set(hot_ids)) == len(hot_ids)
+    checks['seats_sold_once'] = len(set(seats)) == len(seats)
+    archived_ids = list(booking.archive.offsets)
+    checks['archive_index_resolves'] = all((booking.archive.get(tid) or {}).get('ticket_id') == tid
+                                           for tid in archived_ids)
+    numbers = [int(tid[3:]) for tid in hot_ids + archived_ids if tid.startswith('TKT') and tid[3:].isdigit()]
+    checks['ticket_counter_ahead'] = booking.ticket_counter.value > max(numbers, default=FIRST_TICKET - 1)
+
+    seqs = [record['seq'] for record in DataHandler(data_dir).iter_data('events.jsonl')]
+    checks['event_log_in_order'] = seqs == sorted(set(seqs))
+
+    if acks is not None:
+        hot_set, names = set(hot_ids), set(usernames)
+        checks['acked_users_durable'] = all(name in names for name in acks.get('user', []))
+        checks['acked_routes_durable'] = all(route_id in routes.routes for route_id in acks.get('route', []))
+        checks['acked_tickets_durable'] = all(tid in hot_set or tid in booking.archive
+                                              for tid in acks.get('ticket', []))
+        recorded = set(seqs)
+        checks['acked_events_durable'] = all(int(seq) in recorded for seq in acks.get('event', []))
+
+    details['recovered'] = {'users': len(user_ids), 'routes': len(routes.routes), 'hot_tickets': len(hot_ids),
+                            'archived_tickets': len(archived_ids), 'events': len(seqs)}
+
+
+def verify_recovery(data_dir: str, backend: str, acks: Optional[Dict[str, List[str]]]) -> Dict:
+    """Load everything cold and check the recovered state (acks=None: structural checks only)"""
+    checks, details = {}, {}
+    unreadable, temp_files = [], 0
+    for root, _, names in os.walk(data_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            if name.endswith('.tmp'):
+                temp_files += 1
+            elif name.endswith('.json'):
+                try:
+                    with open(path, 'r') as f:
+                        json.load(f)
+                except ValueError:
+                    unreadable.append(os.path.relpath(path, data_dir))
+    checks['json_documents_parse'] = not unreadable
+    details['unreadable'] = unreadable
+    details['leftover_temp_files'] = temp_files
+
+    try:
+        _check_recovered(data_dir, backend, acks, checks, details)
+        checks['recovery_completed'] = True
+    except Exception as e:
+        checks['recovery_completed'] = False
+        details['error'] = f"{type(e).__name__}: {e}"
+    return {'consistent': all(checks.values()), 'checks': checks, **details}
+
+
+# ===================== ORCHESTRATION =====================
+def _child(command: List[str], cwd: str, **kwargs) -> subprocess.Popen:
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [_BACKEND_DIR, os.environ.get('PYTHONPATH')]))}
+    return subprocess.Popen([sys.executable, '-m', 'dsa_structures.recovery_bench', *command], cwd=cwd, env=env,
+                            stdout=subprocess.PIPE, text=True, **kwargs)
+
+
+def _child_json(command: List[str], cwd: str) -> Dict:
+    proc = _child(command, cwd)
+    out, _ = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(command[:2])} exited with status {proc.returncode}")
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def _prepare_backend(data_dir: str, backend: str) -> Optional[float]:
+    """Import the JSON dataset into SQLite; returns the migration time"""
+    if backend != 'sqlite':
+        return None
+    started = time.perf_counter()
+    storage = SQLiteStorage(os.path.join(data_dir, 'dsa.sqlite3'))
+    migrate_json(data_dir, storage)
+    storage.close()  # checkpoints the WAL into the database file
+    return round(time.perf_counter() - started, 4)
+
+
+def run_load_benchmark(root: str, scale: str, backends: List[str], seed: int) -> List[Dict]:
+    data_dir = os.path.join(root, f"load-{scale}")
+    started = time.perf_counter()
+    generated = generate_dataset(data_dir, SCALES[scale], seed)
+    generate_seconds = round(time.perf_counter() - started, 4)
+
+    results = []
+    for backend in backends:
+        migrate_seconds = _prepare_backend(data_dir, backend)
+        managers = {}
+        for manager in MANAGERS:
+            print(f"  load {scale}/{backend}/{manager}", file=sys.stderr)
+            managers[manager] = _child_json(['load', manager, data_dir, backend], data_dir)
+        results.append({
+            'scale': scale,
+            'backend': backend,
+            'dataset': generated,
+            'dataset_bytes': _directory_bytes(data_dir),
+            'generate_seconds': generate_seconds,
+            'migrate_seconds': migrate_seconds,
+            'managers': managers,
+        })
+    shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+
+def _cut_last_line(path: str, rng: random.Random) -> bool:
+    """Leave the last record of an append-only file half written"""
+    try:
+        with open(path, 'rb+') as f:
+            data = f.read()
+            if len(data) < 2:
+                return False
+            start = data.rfind(b'\n', 0, len(data) - 1) + 1
+            if len(data) - start < 2:
+                return False
+            f.truncate(start + rng.randint(1, len(data) - start - 1))
+            return True
+    except FileNotFoundError:
+        return False
+
+
+def run_crash_trial(fixture: str, trial_dir: str, backend: str, mode: str, seed: int) -> Dict:
+    rng = random.Random(seed)
+    shutil.copytree(fixture, trial_dir)
+    trial = {'backend': backend, 'mode': mode, 'seed': seed}
+    command = ['workload', trial_dir, backend, str(seed)]
+    if mode == 'io':
+        trial['kill_at'] = rng.randint(1, IO_POINTS)
+        command += ['--kill-at', str(trial['kill_at'])]
+
+    acks = {}
+    ready = threading.Event()
+    proc = _child(command, trial_dir, stderr=subprocess.DEVNULL)
+
+    def read_acks():
+        for line in proc.stdout:
+            kind, _, key = line.strip().partition(' ')
+            if kind == 'ready':
+                ready.set()
+            elif kind:
+                acks.setdefault(kind, []).append(key)
+        ready.set()
+    reader = threading.Thread(target=read_acks, daemon=True)
+    reader.start()
+
+    ready.wait(TRIAL_TIMEOUT)
+    started = time.monotonic()
+    if mode == 'io':
+        try:
+            proc.wait(TRIAL_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    else:
+        time.sleep(rng.uniform(0, SIGNAL_WINDOW))
+        proc.kill()
+    proc.wait()
+    reader.join()
+    trial['killed_after_seconds'] = round(time.monotonic() - started, 3)
+    trial['exit_status'] = proc.returncode
+    trial['acked'] = {kind: len(keys) for kind, keys in acks.items()}
+
+    if mode == 'torn':
+        trial['torn_files'] = [name for name in ('events.jsonl', 'tickets_archive.jsonl')
+                               if _cut_last_line(os.path.join(trial_dir, name), rng)]
+    acks_file = f"{trial_dir}.acks.json"
+    with open(acks_file, 'w') as f:
+        json.dump(None if mode == 'torn' else acks, f)
+
+    trial.update(_child_json(['verify', trial_dir, backend, acks_file], trial_dir))
+    shutil.rmtree(trial_dir, ignore_errors=True)
+    os.remove(acks_file)
+    return trial
+
+
+def run_crash_harness(root: str, scale: str, backends: List[str], trials: int, seed: int) -> Dict:
+    rng = random.Random(seed)
+    results = []
+    for backend in backends:
+        fixture = os.path.join(root, f"crash-fixture-{backend}")
+        generate_dataset(fixture, SCALES[scale], seed)
+        _prepare_backend(fixture, backend)
+        for n in range(trials):
+            mode = FAULT_MODES[n % len(FAULT_MODES)]
+            print(f"  crash {backend} trial {n + 1}/{trials} ({mode})", file=sys.stderr)
+            results.append(run_crash_trial(fixture, os.path.join(root, f"trial-{backend}-{n}"), backend, mode,
+                                           rng.getrandbits(32)))
+        shutil.rmtree(fixture, ignore_errors=True)
+
+    failures = [trial for trial in results if not trial['consistent']]
+    return {
+        'scale': scale,
+        'trials': len(results),
+        'consistent': len(results) - len(failures),
+        'failed_checks': sorted({name for trial in failures for name, ok in trial['checks'].items() if not ok}),
+        'results': results,
+    }
+
+
+def run(scales: List[str], backends: List[str], trials: int, crash_scale: str, seed: int,
+        skip_load: bool = False, skip_crash: bool = False) -> Dict:
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'fsync': FSYNC_DEFAULT,
+        'seed': seed,
+    }
+    with tempfile.TemporaryDirectory(prefix='dsa-recovery-') as root:
+        if not skip_load:
+            report['load'] = [result for scale in scales for result in run_load_benchmark(root, scale, backends, seed)]
+        if not skip_crash:
+            report['crash'] = run_crash_harness(root, crash_scale, backends, trials, seed)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cold-start benchmark and crash-recovery harness")
+    commands = parser.add_subparsers(dest='command', required=True)
+    bench = commands.add_parser('run', help="load benchmark and crash trials, JSON report")
+    bench.add_argument('--scales', default='tiny,small', help=f"comma-separated: {', '.join(SCALES)}")
+    bench.add_argument('--backends', default='json,sqlite')
+    bench.add_argument('--trials', type=int, default=12, help="crash trials per backend")
+    bench.add_argument('--crash-scale', default='tiny', choices=sorted(SCALES))
+    bench.add_argument('--seed', type=int, default=0)
+    bench.add_argument('--skip-load', action='store_true')
+    bench.add_argument('--skip-crash', action='store_true')
+    bench.add_argument('--out', help="write the JSON report here instead of stdout")
+    # Child processes started by run
+    load = commands.add_parser('load')
+    load.add_argument('manager', choices=MANAGERS)
+    load.add_argument('data_dir')
+    load.add_argument('backend')
+    workload = commands.add_parser('workload')
+    workload.add_argument('data_dir')
+    workload.add_argument('backend')
+    workload.add_argument('seed', type=int)
+    workload.add_argument('--kill-at', type=int)
+    verify = commands.add_parser('verify')
+    verify.add_argument('data_dir')
+    verify.add_argument('backend')
+    verify.add_argument('acks_file')
+    args = parser.parse_args()
+
+    if args.command == 'load':
+        print(json.dumps(measure_load(args.manager, args.data_dir, args.backend)))
+        sys.stdout.flush()
+        os._exit(0)  # skip the managers' shutdown flushes; nothing was changed
+    elif args.command == 'workload':
+        run_workload(args.data_dir, args.backend, args.seed, args.kill_at)
+    elif args.command == 'verify':
+        with open(args.acks_file, 'r') as f:
+            acks = json.load(f)
+        print(json.dumps(verify_recovery(args.data_dir, args.backend, acks)))
+        sys.stdout.flush()
+        os._exit(0)
+    else:
+        unknown = [scale for scale in args.scales.split(',') + [args.crash_scale] if scale not in SCALES]
+        if unknown:
+            parser.error(f"unknown scale(s): {', '.join(unknown)}")
+        report = run(args.scales.split(','), args.backends.split(','), args.trials, args.crash_scale, args.seed,
+                     args.skip_load, args.skip_crash)
+        text = json.dumps(report, indent=2)
+        if args.out:
+            with open(args.out, 'w') as f:
+                f.write(text + '\n')
+            print(f"Wrote {args.out}", file=sys.stderr)
+        else:
+            print(text)
+        crash = report.get('crash')
+        sys.exit(1 if crash and crash['consistent'] < crash['trials'] else 0)
@@ -0,0 +1,127 @@
+"""
+Sharded Route Storage
+routes.json is split into one file per route plus a small manifest:
+
+    data/routes/manifest.json   route order, shard names, last_updated
+    data/routes/<route_id>.json one route record
+
+A save re-encodes and writes only the dirty routes, then the manifest
+(shards first, manifest last, removed shards after it, so the manifest never
+names a missing shard). Loading reads the shards through a thread pool.
+A tree without a manifest is still read from the legacy routes.json.
+"""
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from .changes import file_signature
+from .persistence import FSYNC_DEFAULT, atomic_write_json, durable_write_json
+
+_SAFE_NAME = re.compile(r'^[A-Za-z0-9_-][A-Za-z0-9_.-]*$')
+
+
+def shard_directory(routes_file: str) -> str:
+    """data/routes.json -> data/routes"""
+    return os.path.splitext(routes_file)[0]
+
+
+class RouteShardStore:
+    """One JSON file per route under a manifest"""
+    def __init__(self, directory: str, workers: int = 8):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        self.workers = workers
+        self.shards = {}  # route_id -> shard file name (as in the manifest)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path)
+
+    @staticmethod
+    def shard_name(route_id: str) -> str:
+        route_id = str(route_id)
+        if _SAFE_NAME.match(route_id) and route_id != 'manifest':
+            return f"{route_id}.json"
+        return f"route-{hashlib.sha1(route_id.encode()).hexdigest()[:16]}.json"
+
+    def _read_shard(self, name: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.directory, name), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"Error reading route shard {name}: {e}")
+            return None
+
+    def load(self) -> Dict:
+        """Routes document ({'routes': [...], ...}) assembled from the shards in parallel"""
+        with open(self.manifest_path, 'r') as f:
+            manifest = json.load(f)
+        entries = manifest.get('routes', [])
+        names = [entry['shard'] for entry in entries]
+        if len(names) > 1 and self.workers > 1:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(names))) as pool:
+                records = list(pool.map(self._read_shard, names))
+        else:
+            records = [self._read_shard(name) for name in names]
+
+        self.shards = {entry['route_id']: entry['shard'] for entry in entries}
+        routes = [record for record in records if isinstance(record, dict)]
+        return {
+            'routes': routes,
+            'total_routes': len(routes),
+            'last_updated': manifest.get('last_updated'),
+        }
+
+    def save(self, order: List[str], dirty: Dict[str, Dict], removed: Iterable[str] = ()) -> int:
+        """Write dirty route records, then the manifest listing routes in order
+
+        Returns the number of shard files written.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        for route_id in dirty:
+            self.shards.setdefault(route_id, self.shard_name(route_id))
+
+        def write(route_id):
+            path = os.path.join(self.directory, self.shards[route_id])
+            atomic_write_json(path, dirty[route_id], fsync=FSYNC_DEFAULT)
+
+        if len(dirty) > 1 and self.workers > 1:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(dirty))) as pool:
+                list(pool.map(write, dirty))
+        else:
+            for route_id in dirty:
+                write(route_id)
+
+        removed_names = [self.shards.pop(route_id) for route_id in removed if route_id in self.shards]
+        durable_write_json(self.manifest_path, {
+            'routes': [{'route_id': route_id, 'shard': self.shards[route_id]} for route_id in order],
+            'total_routes': len(order),
+            'last_updated': datetime.now().isoformat(),
+        })
+        for name in removed_names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+        return len(dirty)
+
+
+def load_routes_document(routes_file: str) -> Optional[Dict]:
+    """Routes document from the shard manifest, else the legacy routes.json (None if neither)"""
+    store = RouteShardStore(shard_directory(routes_file))
+    if store.exists():
+        return store.load()
+    try:
+        with open(routes_file, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def routes_signature(routes_file: str) -> Optional[tuple]:
+    """Changes on every route save (the manifest is rewritten last)"""
+    manifest = os.path.join(shard_directory(routes_file), 'manifest.json')
+    return file_signature(manifest) or file_signature(routes_file)
@@ -7,7 +7,10 @@ import json
 import uuid
 from datetime import datetime
 import os
+import threading
 from .linked_list import LinkedList
+from .route_store import RouteShardStore, shard_directory
+from .streaming import iter_json_records
 
 DEFAULT_SERVICE_CALENDAR = {
     "weekday": {"start_time": "06:00", "end_time": "22:00", "headway_minutes": 15},
@@ -42,10 +45,14 @@ def _merge_service_calendar(calendar):
 class RouteManager:
     """Manages bus routes using Linked List data structure"""
     
-    def __init__(self, routes_file):
+    def __init__(self, routes_file, storage=None):
         self.routes_file = routes_file
+        self.storage = storage  # optional SQLiteStorage; sharded JSON when None
+        self.shards = RouteShardStore(shard_directory(routes_file))
         self.routes = {}  # Dictionary to store routes by ID (Hash Table for O(1) lookup)
         self.route_names = {}  # Index for route names
+        self._saved = {}  # route_id -> fingerprint as last written; routes that differ are dirty
+        self._save_lock = threading.Lock()
         self.load_routes()
     
     def load_routes(self):
@@ -53,9 +60,8 @@ class RouteManager:
         try:
             print(f"\n=== LOAD ROUTES ===")
             
-            if os.path.exists(self.routes_file):
-                with open(self.routes_file, 'r') as f:
-                    data = json.load(f)
+            if self.storage is not None or self.shards.exists() or os.path.exists(self.routes_file):
+                data, legacy = self._read_routes()
                     
                 # Clear existing data
                 self.routes.clear()
@@ -102,6 +108,8 @@ class RouteManager:
                             print(f"  ⚠️ Mismatch: {route.route_name} has wrong ID")
                             self.route_names[route.route_name] = route_id
                 
+                # Routes read from the legacy single file are all written out as shards on the next save
+                self._saved = {} if legacy else {rid: self._fingerprint(r) for rid, r in self.routes.items()}
                 print("=== END LOAD ===\n")
                 
             else:
@@ -129,6 +137,7 @@ class RouteManager:
             route.route_name = route_data.get('route_name', 'Unnamed Route')
             route.headway_minutes = route_data.get('headway_minutes', DEFAULT_SERVICE_CALENDAR["weekday"]["headway_minutes"])
             route.service_calendar = _merge_service_calendar(route_data.get('service_calendar'))
+            route.created_at = route_data.get('created_at') or datetime.now().isoformat()
             route.size = 0  # Initialize size
             
             # Add all stops to linked list
@@ -146,46 +155,76 @@ class RouteManager:
         
         return route
     
+    def _read_routes(self):
+        """Raw routes document from storage, the route shards or the legacy JSON file
+
+        Returns (document, legacy) where legacy marks the single-file layout.
+        """
+        if self.storage is not None:
+            return {'routes': self.storage.load_all('routes')}, False
+        if self.shards.exists():
+            return self.shards.load(), False
+        # Legacy single file: routes are built one record at a time as they are parsed
+        return {'routes': iter_json_records(self.routes_file, 'routes')}, True
+    
+    @staticmethod
+    def _fingerprint(route):
+        """Cheap change marker: stop edits bump the linked list version, the rest is compared"""
+        return (id(route), getattr(route, 'version', None), getattr(route, 'route_name', None),
+                getattr(route, 'headway_minutes', None),
+                json.dumps(getattr(route, 'service_calendar', None), sort_keys=True))
+    
+    def _route_record(self, route_id, route):
+        # Ensure route has required attributes
+        if not hasattr(route, 'route_id'):
+            route.route_id = route_id
+        if not hasattr(route, 'route_name'):
+            route.route_name = f"Route_{route_id[:8]}"
+        if not getattr(route, 'created_at', None):
+            route.created_at = datetime.now().isoformat()
+        
+        return {
+            'route_id': route.route_id,
+            'route_name': route.route_name,
+            'headway_minutes': getattr(route, 'headway_minutes', DEFAULT_SERVICE_CALENDAR["weekday"]["headway_minutes"]),
+            'service_calendar': getattr(route, 'service_calendar', _merge_service_calendar({})),
+            'created_at': route.created_at,
+            'total_stops': len(route),
+            'stops': route.to_list() if hasattr(route, 'to_list') else []
+        }
+    
+    def mark_dirty(self, route_id):
+        """Force a route to be rewritten on the next save (after editing stop dicts in place)"""
+        self._saved.pop(route_id, None)
+    
     def save_routes(self):
-        """Save routes to JSON file - FIXED VERSION"""
+        """Save routes, encoding and writing only the routes changed since the last save"""
         try:
-            print(f"\n=== SAVE ROUTES ===")
-            print(f"Saving {len(self.routes)} routes...")
-            
-            routes_data = []
-            
-            for route_id, route in self.routes.items():
-                # Ensure route has required attributes
-                if not hasattr(route, 'route_id'):
-                    route.route_id = route_id
-                if not hasattr(route, 'route_name'):
-                    route.route_name = f"Route_{route_id[:8]}"
+            with self._save_lock:
+                print(f"\n=== SAVE ROUTES ===")
                 
-                route_data = {
-                    'route_id': route.route_id,
-                    'route_name': route.route_name,
-                    'headway_minutes': getattr(route, 'headway_minutes', DEFAULT_SERVICE_CALENDAR["weekday"]["headway_minutes"]),
-                    'service_calendar': getattr(route, 'service_calendar', _merge_service_calendar({})),
-                    'created_at': datetime.now().isoformat(),
-                    'total_stops': len(route),
-                    'stops': route.to_list() if hasattr(route, 'to_list') else []
-                }
-                routes_data.append(route_data)
+                fingerprints = {route_id: self._fingerprint(route) for route_id, route in self.routes.items()}
+                dirty = {}
+                for route_id, route in self.routes.items():
+                    if self._saved.get(route_id) != fingerprints[route_id]:
+                        dirty[route_id] = self._route_record(route_id, route)
+                        print(f"  - Saving: {route.route_name} (ID: {route.route_id})")
+                removed = [route_id for route_id in self._saved if route_id not in self.routes]
                 
-                print(f"  - Saving: {route.route_name} (ID: {route.route_id})")
-            
-            data = {
-                'routes': routes_data,
-                'total_routes': len(self.routes),
-                'last_updated': datetime.now().isoformat()
-            }
-            
-            with open(self.routes_file, 'w') as f:
-                json.dump(data, f, indent=2)
-            
-            print(f"✓ Saved to {self.routes_file}")
-            print("=== END SAVE ===\n")
-            return True
+                if self.storage is not None:
+                    with self.storage.transaction():
+                        self.storage.upsert_many('routes', dirty.values())
+                        for route_id in removed:
+                            self.storage.delete('routes', route_id)
+                    target = self.storage.path
+                else:
+                    self.shards.save(list(self.routes), dirty, removed)
+                    target = self.shards.directory
+                
+                self._saved = fingerprints
+                print(f"✓ Saved {len(dirty)} changed, {len(removed)} removed of {len(self.routes)} routes to {target}")
+                print("=== END SAVE ===\n")
+                return True
             
         except Exception as e:
             print(f"✗ Error saving routes: {e}")
@@ -229,6 +268,7 @@ class RouteManager:
         route.route_name = route_name_clean
         route.headway_minutes = DEFAULT_SERVICE_CALENDAR["weekday"]["headway_minutes"]
         route.service_calendar = _merge_service_calendar({})
+        route.created_at = datetime.now().isoformat()
         
         print(f"Created route with ID: {route.route_id}")
         
@@ -0,0 +1,356 @@
+"""
+SQLite Storage Backend
+Row-per-record tables (stdlib sqlite3, WAL mode) behind the managers that
+otherwise rewrite one JSON file per dataset. The in-memory DSA structures
+stay the read path; storage only sees row-level writes, each batch inside
+one transaction.
+
+Enable with DSA_STORAGE=sqlite (database path: DSA_SQLITE_PATH, default
+data/dsa.sqlite3).
+
+Tools:
+    python -m dsa_structures.storage migrate <data_dir> [db_path]
+    python -m dsa_structures.storage bench [--sizes 1000,5000,20000]
+"""
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from .route_store import load_routes_document
+
+# table -> primary key field and indexed fields (all copied out of the JSON row)
+TABLES = {
+    'users': {'key': 'user_id', 'indexed': ('username', 'email')},
+    'routes': {'key': 'route_id', 'indexed': ('route_name',)},
+    'buses': {'key': 'bus_number', 'indexed': ('route_name',)},
+    'tickets': {'key': 'ticket_id', 'indexed': ('passenger_id', 'bus_number', 'travel_date')},
+}
+
+
+class SQLiteStorage:
+    """Document rows in SQLite with indexed lookup columns"""
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode; transactions are opened explicitly in transaction()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._persisted = {}  # table -> {key: row json} as last written by sync()
+        self._bumped = {}     # table -> generation written by the open transaction
+        self.listeners = []   # callback(table, generation) after each committed write
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        with self._lock:
+            for table, spec in TABLES.items():
+                columns = ", ".join(f"{col} TEXT" for col in spec['indexed'])
+                self.conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} "
+                    f"({spec['key']} TEXT PRIMARY KEY, {columns}, data TEXT NOT NULL)"
+                )
+                for col in spec['indexed']:
+                    self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{col} ON {table}({col})")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    @contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT (rolled back on error); nested calls join the outer one"""
+        with self._lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield self
+                finally:
+                    self._depth -= 1
+                return
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._depth = 1
+            try:
+                yield self
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                self._bumped.clear()
+                raise
+            finally:
+                self._depth = 0
+            bumped, self._bumped = self._bumped, {}
+        for table, generation in bumped.items():
+            for listener in list(self.listeners):
+                listener(table, generation)
+
+    def _bump(self, table: str) -> None:
+        """Advance the table's generation inside the open transaction"""
+        key = f"generation.{table}"
+        found = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        generation = (json.loads(found[0]) if found else 0) + 1
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+            (key, json.dumps(generation)))
+        self._bumped[table] = generation
+
+    def generation(self, table: str) -> int:
+        """Counter bumped by every committed write to table (from any process)"""
+        return self.get_meta(f"generation.{table}", 0)
+
+    def _upsert_sql(self, table: str) -> str:
+        spec = TABLES[table]
+        columns = (spec['key'], *spec['indexed'], 'data')
+        updates = ", ".join(f"{col}=excluded.{col}" for col in columns[1:])
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT({spec['key']}) DO UPDATE SET {updates}")
+
+    def _params(self, table: str, row: Dict, text: str = None) -> tuple:
+        spec = TABLES[table]
+        indexed = tuple(None if row.get(col) is None else str(row.get(col)) for col in spec['indexed'])
+        return (str(row[spec['key']]), *indexed, text if text is not None else json.dumps(row))
+
+    def upsert(self, table: str, row: Dict) -> None:
+        """Insert or replace one row"""
+        self.upsert_many(table, [row])
+
+    def upsert_many(self, table: str, rows: Iterable[Dict]) -> None:
+        """Insert or replace rows in one transaction"""
+        params = [self._params(table, row) for row in rows]
+        if not params:
+            return
+        with self.transaction():
+            self.conn.executemany(self._upsert_sql(table), params)
+            self._bump(table)
+            persisted = self._persisted.get(table)
+            if persisted is not None:
+                for p in params:
+                    persisted[p[0]] = p[-1]
+
+    def update_fields(self, table: str, updates: Dict[str, Dict]) -> int:
+        """Set fields inside existing rows ({key: {field: value}}); missing rows are skipped, never inserted
+
+        Returns the number of rows updated.
+        """
+        key_field = TABLES[table]['key']
+        with self.transaction():
+            params = []
+            for key, fields in updates.items():
+                found = self.conn.execute(f"SELECT data FROM {table} WHERE {key_field} = ?", (str(key),)).fetchone()
+                if found is None:
+                    continue
+                row = json.loads(found[0])
+                row.update(fields)
+                params.append(self._params(table, row))
+            if not params:
+                return 0
+            # Every key exists inside this transaction, so the upsert only ever updates
+            self.conn.executemany(self._upsert_sql(table), params)
+            self._bump(table)
+            persisted = self._persisted.get(table)
+            if persisted is not None:
+                for p in params:
+                    persisted[p[0]] = p[-1]
+        return len(params)
+
+    def delete(self, table: str, key: str) -> None:
+        with self.transaction():
+            self.conn.execute(f"DELETE FROM {table} WHERE {TABLES[table]['key']} = ?", (str(key),))
+            self._bump(table)
+            self._persisted.get(table, {}).pop(str(key), None)
+
+    def load_all(self, table: str) -> List[Dict]:
+        """Every row in insertion order"""
+        with self._lock:
+            texts = self.conn.execute(f"SELECT {TABLES[table]['key']}, data FROM {table} ORDER BY rowid").fetchall()
+        self._persisted[table] = dict(texts)
+        return [json.loads(data) for _, data in texts]
+
+    def get(self, table: str, key: str) -> Optional[Dict]:
+        with self._lock:
+            found = self.conn.execute(
+                f"SELECT data FROM {table} WHERE {TABLES[table]['key']} = ?", (str(key),)).fetchone()
+        return json.loads(found[0]) if found else None
+
+    def find(self, table: str, column: str, value) -> List[Dict]:
+        """Rows whose indexed column equals value"""
+        if column not in TABLES[table]['indexed']:
+            raise ValueError(f"{table}.{column} is not an indexed column")
+        with self._lock:
+            found = self.conn.execute(f"SELECT data FROM {table} WHERE {column} = ? ORDER BY rowid", (str(value),))
+            return [json.loads(data) for (data,) in found.fetchall()]
+
+    def count(self, table: str) -> int:
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def sync(self, table: str, rows: Iterable[Dict], volatile: Iterable[str] = ()) -> int:
+        """Make the table match rows, writing only rows that changed since the last sync
+
+        Fields in volatile (e.g. timestamps restamped on every save) do not
+        count as a change on their own. Returns the number of rows written.
+        """
+        with self._lock:
+            return self._sync(table, rows, volatile)
+
+    def _sync(self, table: str, rows: Iterable[Dict], volatile: Iterable[str]) -> int:
+        if table not in self._persisted:
+            self.load_all(table)
+        persisted = self._persisted[table]
+        key_field = TABLES[table]['key']
+        volatile = set(volatile)
+
+        changed, seen = [], set()
+        for row in rows:
+            key = str(row[key_field])
+            seen.add(key)
+            text = json.dumps(row)
+            old = persisted.get(key)
+            if old == text:
+                continue
+            if old is not None and volatile:
+                stable = {k: v for k, v in row.items() if k not in volatile}
+                if stable == {k: v for k, v in json.loads(old).items() if k not in volatile}:
+                    continue
+            changed.append((row, text))
+        removed = [key for key in persisted if key not in seen]
+        if not changed and not removed:
+            return 0
+
+        with self.transaction():
+            self.conn.executemany(self._upsert_sql(table), [self._params(table, row, text) for row, text in changed])
+            self.conn.executemany(f"DELETE FROM {table} WHERE {key_field} = ?", [(key,) for key in removed])
+            self._bump(table)
+            for row, text in changed:
+                persisted[str(row[key_field])] = text
+            for key in removed:
+                del persisted[key]
+        return len(changed) + len(removed)
+
+    def get_meta(self, key: str, default=None):
+        with self._lock:
+            found = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(found[0]) if found else default
+
+    def set_meta(self, key: str, value) -> None:
+        with self.transaction():
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                (key, json.dumps(value)))
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+
+def open_storage(data_dir: str) -> Optional[SQLiteStorage]:
+    """SQLite storage when DSA_STORAGE=sqlite, otherwise None (JSON files)"""
+    if os.environ.get('DSA_STORAGE', 'json').lower() != 'sqlite':
+        return None
+    return SQLiteStorage(os.environ.get('DSA_SQLITE_PATH') or os.path.join(data_dir, 'dsa.sqlite3'))
+
+
+def _read_json(path: str):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def migrate_json(data_dir: str, storage: SQLiteStorage) -> Dict[str, int]:
+    """One-shot import of users/routes/buses/tickets JSON files into storage"""
+    counts = {}
+    sources = {
+        'users': ('users.json', 'users'),
+        'routes': ('routes.json', 'routes'),
+        'buses': ('buses.json', 'buses'),
+        'tickets': ('tickets.json', 'tickets'),
+    }
+    for table, (filename, list_key) in sources.items():
+        if table == 'routes':
+            data = load_routes_document(os.path.join(data_dir, filename))
+        else:
+            data = _read_json(os.path.join(data_dir, filename))
+        rows = data.get(list_key, []) if isinstance(data, dict) else (data or [])
+        key_field = TABLES[table]['key']
+        rows = [row for row in rows if isinstance(row, dict) and row.get(key_field) is not None]
+        storage.upsert_many(table, rows)
+        counts[table] = len(rows)
+
+    tickets = _read_json(os.path.join(data_dir, 'tickets.json'))
+    if isinstance(tickets, dict) and 'next_id' in tickets:
+        storage.set_meta('tickets.next_id', tickets['next_id'])
+    return counts
+
+
+def _benchmark(sizes: List[int], samples: int = 50) -> List[Dict]:
+    """Latency of one ticket write, JSON full-file rewrite vs SQLite row upsert, as data grows"""
+    import tempfile
+    import time
+
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            tickets = [{'ticket_id': f"TKT{n:06d}", 'passenger_id': f"P{n % 500}", 'bus_number': str(n % 20),
+                        'travel_date': '2030-01-07', 'status': 'confirmed', 'fare': 70.0, 'seat_number': n % 40 + 1}
+                       for n in range(size)]
+            json_path = os.path.join(tmp, 'tickets.json')
+            storage = SQLiteStorage(os.path.join(tmp, 'bench.sqlite3'))
+            storage.upsert_many('tickets', tickets)
+
+            json_times, sqlite_times = [], []
+            for n in range(samples):
+                ticket = {**tickets[0], 'ticket_id': f"NEW{size}_{n}"}
+                tickets.append(ticket)
+
+                start = time.perf_counter()
+                with open(json_path, 'w') as f:
+                    json.dump({'tickets': tickets, 'next_id': size + n}, f, indent=2)
+                json_times.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                storage.upsert('tickets', ticket)
+                sqlite_times.append(time.perf_counter() - start)
+            storage.close()
+
+        json_times.sort()
+        sqlite_times.sort()
+        results.append({
+            'rows': size,
+            'json_p50_ms': round(json_times[len(json_times) // 2] * 1000, 3),
+            'json_p95_ms': round(json_times[int(len(json_times) * 0.95)] * 1000, 3),
+            'sqlite_p50_ms': round(sqlite_times[len(sqlite_times) // 2] * 1000, 3),
+            'sqlite_p95_ms': round(sqlite_times[int(len(sqlite_times) * 0.95)] * 1000, 3),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="SQLite storage tools")
+    commands = parser.add_subparsers(dest='command', required=True)
+    migrate = commands.add_parser('migrate', help="import the JSON data files into SQLite")
+    migrate.add_argument('data_dir')
+    migrate.add_argument('db_path', nargs='?')
+    bench = commands.add_parser('bench', help="compare per-write latency of JSON and SQLite")
+    bench.add_argument('--sizes', default='1000,5000,20000')
+    bench.add_argument('--samples', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        db_path = args.db_path or os.path.join(args.data_dir, 'dsa.sqlite3')
+        storage = SQLiteStorage(db_path)
+        counts = migrate_json(args.data_dir, storage)
+        storage.close()
+        print(f"Migrated into {db_path}: {counts}")
+    else:
+        sizes = [int(size) for size in args.sizes.split(',')]
+        print(f"{'rows':>8} {'json p50':>10} {'json p95':>10} {'sqlite p50':>11} {'sqlite p95':>11}  (ms)")
+        for row in _benchmark(sizes, args.samples):
+            print(f"{row['rows']:>8} {row['json_p50_ms']:>10} {row['json_p95_ms']:>10} "
+                  f"{row['sqlite_p50_ms']:>11} {row['sqlite_p95_ms']:>11}")
@@ -0,0 +1,193 @@
+"""
+Streaming JSON Loaders
+Records of a large data file are decoded one at a time from a bounded read
+buffer and handed straight to the caller, so a loader never holds the file
+text and the parsed records at once:
+- {"tickets": [...], "next_id": 1042}: records of one top-level array member,
+  the other members collected into extras
+- [...]: records of a top-level array
+- *.jsonl: one record per line
+Peak memory is the structures the caller builds plus one buffer chunk.
+"""
+import json
+import re
+from typing import Any, Dict, Iterator, Optional
+
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_VALUE_END = ' \t\n\r,:]}'  # characters that may follow a complete value
+
+
+class _StreamBuffer:
+    """Bounded window over a text file with incremental JSON value decoding"""
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        # json.load shares repeated key strings within one parse; records decoded
+        # one at a time need the memo carried across calls to match its footprint
+        self.keys = {}
+        self.decoder = json.JSONDecoder(object_pairs_hook=self._object)
+
+    def _object(self, pairs) -> Dict:
+        keys = self.keys
+        return {keys.setdefault(k, k): v for k, v in pairs}
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos > self.chunk_size:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at end of file)"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def take(self, expected: str) -> str:
+        char = self.peek()
+        if char not in expected:
+            raise json.JSONDecodeError(f"Expected one of {expected!r}", self.buf, self.pos)
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        """Decode the next complete value, reading more input until it fits"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number cut at the buffer edge decodes "successfully" ("1.5" read as "1"
+            # when the chunk ends after "1."); it is complete only once a delimiter follows
+            if (end == len(self.buf) or self.buf[end] not in _VALUE_END) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def array_items(self) -> Iterator[Any]:
+        self.take('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.take(',]') == ']':
+                return
+
+
+def iter_json_records(path: str, key: Optional[str] = None, extras: Optional[Dict] = None,
+                      chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """Yield the records of a data file one at a time
+
+    key names the array member of a top-level object ({"users": [...]});
+    a top-level array is streamed whatever key says. Other top-level members
+    are stored in extras once iteration has passed them.
+    """
+    with open(path, 'r') as f:
+        stream = _StreamBuffer(f, chunk_size)
+        if path.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield stream.decoder.decode(line)
+            return
+
+        first = stream.peek()
+        if first == '[':
+            yield from stream.array_items()
+            return
+        stream.take('{')
+        if stream.peek() == '}':
+            return
+        while True:
+            name = stream.value()
+            stream.take(':')
+            if name == key and stream.peek() == '[':
+                yield from stream.array_items()
+            else:
+                value = stream.value()
+                if extras is not None:
+                    extras[name] = value
+            if stream.take(',}') == '}':
+                return
+
+
+def load_json_streaming(path: str, key: str) -> Any:
+    """Same result as json.load, but the key array is built record by record"""
+    extras = {}
+    with open(path, 'r') as f:
+        top_level_array = _StreamBuffer(f, 64).peek() == '['
+    records = list(iter_json_records(path, key, extras))
+    if top_level_array:
+        return records
+    return {key: records, **extras}
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import time
+    import tracemalloc
+
+    print("=" * 60)
+    print("Streaming loader check")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'tickets.json')
+        tickets = [{'ticket_id': f"T{i}", 'passenger_id': f"P{i % 977}", 'fare': i * 0.5,
+                    'note': "x\"y,]}" if i % 5 == 0 else "", 'seats': [1, 2, i]} for i in range(100000)]
+        with open(path, 'w') as f:
+            json.dump({'tickets': tickets, 'next_id': 100000, 'meta': {'v': [1, 2]}}, f, indent=2)
+        expected = {'tickets': tickets, 'next_id': 100000, 'meta': {'v': [1, 2]}}
+        del tickets
+
+        for label, load in (("json.load", lambda: json.load(open(path))),
+                            ("streaming", lambda: load_json_streaming(path, 'tickets'))):
+            tracemalloc.start()
+            started = time.perf_counter()
+            data = load()
+            elapsed = time.perf_counter() - started
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            assert data == expected, label
+            print(f"{label:10s} {elapsed * 1000:7.1f} ms  final {current / 1e6:6.1f} MB  peak {peak / 1e6:6.1f} MB")
+            del data
+
+        small = {'tickets': expected['tickets'][:200], 'next_id': 200, 'meta': {'v': [1, 2]}}
+        with open(path, 'w') as f:
+            json.dump(small, f)
+        for chunk_size in (1, 7, 4096):
+            extras = {}
+            assert list(iter_json_records(path, 'tickets', extras, chunk_size)) == small['tickets']
+            assert extras == {'next_id': 200, 'meta': {'v': [1, 2]}}
+        with open(path, 'w') as f:
+            f.write('[1, 22, 333, {"a": [4444]}, "5"]')
+        for chunk_size in (1, 2, 3):
+            assert list(iter_json_records(path, chunk_size=chunk_size)) == [1, 22, 333, {"a": [4444]}, "5"]
+        # Decimals and exponents split after '.', 'e' or the exponent sign
+        with open(path, 'w') as f:
+            f.write('[1.5, 22.25, -3e7, 4.5E-3, {"fare": 12.75}]')
+        for chunk_size in range(1, 9):
+            assert list(iter_json_records(path, chunk_size=chunk_size)) == [1.5, 22.25, -3e7, 4.5e-3, {"fare": 12.75}]
+        with open(path, 'w') as f:
+            f.write('{"users": []}')
+        assert list(iter_json_records(path, 'users')) == []
+    print("✓ Streaming loader matches json.load")
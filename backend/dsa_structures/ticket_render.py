@@ -0,0 +1,98 @@
+"""
+Ticket Rendering
+Template compiled once into literal/field segments, streamed chunk by chunk,
+with rendered tickets cached in an LRU keyed on (ticket_id, last_modified)
+"""
+import hashlib
+from string import Formatter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .utils import LRUCache
+
+TICKET_TEMPLATE = """
+========================================
+        BUS TICKET
+========================================
+Ticket ID: {ticket_id}
+Booking Date: {booking_time}
+Status: {status}
+----------------------------------------
+PASSENGER INFORMATION
+Name: {passenger_name}
+Contact: {passenger_contact}
+----------------------------------------
+JOURNEY DETAILS
+From: {from_stop}
+To: {to_stop}
+Date: {travel_date}
+----------------------------------------
+BUS DETAILS
+Bus Number: {bus_number}
+Route: {route_name}
+Seat Number: {seat_number}
+----------------------------------------
+TIMINGS
+Departure: {departure_time}
+Arrival: {arrival_time}
+----------------------------------------
+FARE: Rs. {fare}
+Payment Status: {payment_status}
+----------------------------------------
+QR Code: {qr_code}
+========================================
+Important:
+1. Please arrive at the stop 10 minutes before departure
+2. Keep this ticket for verification
+3. Contact 0800-12345 for assistance
+========================================
+"""
+
+
+class CompiledTemplate:
+    """Template parsed once into (literal, field) segments"""
+    def __init__(self, template: str):
+        self.segments: List[Tuple[str, Optional[str]]] = [
+            (literal, field) for literal, field, _, _ in Formatter().parse(template)
+        ]
+
+    def stream(self, record: Dict) -> Iterator[str]:
+        """Yield the rendered output chunk by chunk"""
+        for literal, field in self.segments:
+            if literal:
+                yield literal
+            if field is not None:
+                yield str(record.get(field))
+
+    def render(self, record: Dict) -> str:
+        """Render the whole template into one string"""
+        return "".join(self.stream(record))
+
+
+def ticket_version(ticket: Dict) -> str:
+    """Last-modified marker of a ticket (falls back for tickets saved before it existed)"""
+    return ticket.get('last_modified') or ticket.get('cancellation_time') or ticket.get('booking_time') or ''
+
+
+class TicketRenderer:
+    """Renders tickets through a compiled template with an LRU of finished output"""
+    def __init__(self, template: str = TICKET_TEMPLATE, cache_size: int = 512):
+        self.template = CompiledTemplate(template)
+        self.cache = LRUCache(cache_size)
+
+    def etag(self, ticket: Dict) -> str:
+        """Strong validator derived from ticket id and last-modified marker"""
+        raw = f"{ticket.get('ticket_id')}:{ticket_version(ticket)}"
+        return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+    def stream(self, ticket: Dict) -> Iterator[str]:
+        """Stream a ticket without touching the cache (used for file writes)"""
+        return self.template.stream(ticket)
+
+    def render(self, ticket: Dict) -> str:
+        """Render a ticket, reusing the cached text while the ticket is unchanged"""
+        key = (ticket.get('ticket_id'), ticket_version(ticket))
+        text = self.cache.get(key)
+        if text is None:
+            text = self.template.render(ticket)
+            self.cache.put(key, text)
+        return text
@@ -0,0 +1,303 @@
+"""
+Precompiled Route Timetables and Daily Trip Tables
+1. Each route is compiled once into minute-offset arrays:
+   - cumulative travel-minutes prefix sums per stop
+   - weekday/weekend start, end and headway in minutes since midnight
+2. For a service day every route is expanded into a columnar trip table
+   (trip, route, stop, arrival, departure) cached per date with LRU eviction;
+   next-departure queries are a bisect over one contiguous slice
+"""
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .routes import DEFAULT_SERVICE_CALENDAR
+from .utils import LRUCache
+
+MINUTES_PER_STOP = 10  # running time between consecutive stops, before dwell
+
+
+def parse_minutes(value) -> Optional[int]:
+    """'HH:MM' -> minutes since midnight, None when missing or invalid"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.strptime(str(value).strip(), "%H:%M")
+    except ValueError:
+        return None
+    return parsed.hour * 60 + parsed.minute
+
+
+def format_minutes(minutes: int) -> str:
+    """Minutes since midnight -> 'HH:MM' (wraps past midnight)"""
+    minutes %= 24 * 60
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+@lru_cache(maxsize=1024)
+def day_key_for(travel_date: str) -> str:
+    """'weekday' or 'weekend' for a YYYY-MM-DD date (today if unparseable)"""
+    try:
+        travel_day = datetime.strptime(travel_date, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        travel_day = datetime.now().date()
+    return "weekend" if travel_day.weekday() >= 5 else "weekday"
+
+
+def _to_int(value, default: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class RouteTimetable:
+    """Minute-offset arrays compiled from one route dict"""
+    def __init__(self, route: Dict):
+        stops = [s for s in route.get('stops', []) if isinstance(s, dict)]
+        self.route_id = route.get('route_id', '')
+        self.stop_names: List[str] = [s.get('stop_name') for s in stops]
+        self.stop_index: Dict[str, int] = {}
+        for idx, name in enumerate(self.stop_names):
+            self.stop_index.setdefault(name, idx)
+
+        waits = [_to_int(s.get('wait_time', 0) or 0, 0) for s in stops]
+        self.dwell = [0] + waits[1:]  # minutes a bus waits at each stop before departing
+
+        # travel_prefix[k]: minutes from stop 0 to stop k (running time + dwell at each arrival stop)
+        # offset_prefix[k]: scheduled departure offset of stop k from the route start time
+        self.travel_prefix = [0]
+        self.offset_prefix = [0]
+        for idx in range(len(stops) - 1):
+            self.travel_prefix.append(self.travel_prefix[-1] + MINUTES_PER_STOP + waits[idx + 1])
+            self.offset_prefix.append(self.offset_prefix[-1] + MINUTES_PER_STOP + waits[idx])
+
+        # Explicit per-stop timetable entries override the computed offset
+        self.fixed_departure = [
+            parse_minutes(s.get('departure_time')) if s.get('departure_time') else parse_minutes(s.get('arrival_time'))
+            for s in stops
+        ]
+        self.stop_headway = [s.get('headway_minutes') for s in stops]
+
+        calendar = route.get('service_calendar') or {}
+        self.service = {}
+        for day_key, defaults in DEFAULT_SERVICE_CALENDAR.items():
+            schedule = {**defaults, **(calendar.get(day_key) or {})}
+            start = parse_minutes(schedule.get('start_time'))
+            end = parse_minutes(schedule.get('end_time'))
+            headway = schedule.get('headway_minutes', route.get('headway_minutes', defaults['headway_minutes']))
+            self.service[day_key] = {
+                'day_key': day_key,
+                'start_time': schedule.get('start_time'),
+                'end_time': schedule.get('end_time'),
+                'start': start if start is not None else parse_minutes(defaults['start_time']),
+                'end': end if end is not None else parse_minutes(defaults['end_time']),
+                'headway_minutes': _to_int(headway, defaults['headway_minutes']),
+            }
+
+        self._departures = {}  # (stop_idx, day_key) -> sorted departure minutes
+
+    def service_window(self, travel_date: str) -> Dict:
+        """Service window (start/end/headway) for a travel date"""
+        return self.service[day_key_for(travel_date)]
+
+    def travel_minutes(self, from_idx: int, to_idx: int) -> int:
+        """Minutes between two stop indexes (O(1))"""
+        if to_idx <= from_idx:
+            return 0
+        return self.travel_prefix[to_idx] - self.travel_prefix[from_idx]
+
+    def base_departure(self, stop_idx: int, day_key: str) -> int:
+        """First departure from a stop, in minutes since the start of the service day"""
+        fixed = self.fixed_departure[stop_idx]
+        if fixed is not None:
+            return fixed
+        return self.service[day_key]['start'] + self.offset_prefix[stop_idx]
+
+    def headway(self, stop_idx: int, day_key: str) -> int:
+        service_headway = self.service[day_key]['headway_minutes']
+        stop_headway = self.stop_headway[stop_idx]
+        if stop_headway is None:
+            return service_headway
+        return _to_int(stop_headway, service_headway)
+
+    def departures(self, stop_idx: int, day_key: str) -> List[int]:
+        """All departures from a stop within the service window (built once, then cached)"""
+        key = (stop_idx, day_key)
+        if key not in self._departures:
+            base = self.base_departure(stop_idx, day_key) % (24 * 60)
+            headway = self.headway(stop_idx, day_key)
+            end = self.service[day_key]['end']
+            times = [base]
+            if headway > 0:
+                times = list(range(base, end + 1, headway)) or [base]
+            self._departures[key] = times
+        return self._departures[key]
+
+
+class TimetableCache:
+    """Compiled timetables by route, recompiled when the route object is replaced or invalidated"""
+    def __init__(self):
+        self._compiled = {}  # route_id -> (route, RouteTimetable)
+
+    def get(self, route: Dict) -> RouteTimetable:
+        route_id = route.get('route_id', '')
+        entry = self._compiled.get(route_id)
+        # The entry keeps its route alive, so identity can't be matched by a recycled dict
+        if entry is None or entry[0] is not route:
+            entry = (route, RouteTimetable(route))
+            self._compiled[route_id] = entry
+        return entry[1]
+
+    def invalidate(self, route_id: str = None) -> None:
+        """Drop one compiled route, or all of them"""
+        if route_id is None:
+            self._compiled.clear()
+        else:
+            self._compiled.pop(route_id, None)
+
+
+class TripTable:
+    """Columnar table of every trip on one service day
+
+    Rows are grouped by (route, stop) and sorted by departure inside each
+    group, so a next-departure query is a bisect over one contiguous slice.
+    """
+    def __init__(self, travel_date: str, routes: Iterable[Dict], timetables: TimetableCache):
+        self.travel_date = travel_date
+        self.day_key = day_key_for(travel_date)
+        self.route_ids: List[str] = []
+        self.trip_id = array('i')    # trip ordinal within its route
+        self.route = array('i')      # index into route_ids
+        self.stop = array('i')       # stop index within the route
+        self.arrival = array('i')    # minutes since midnight
+        self.departure = array('i')  # minutes since midnight
+        self.slices = {}             # (route_id, stop_idx) -> (lo, hi, headway, end)
+
+        for route in routes:
+            if isinstance(route, dict):
+                self._expand(route, timetables.get(route))
+
+    def _expand(self, route: Dict, timetable: RouteTimetable) -> None:
+        route_id = route.get('route_id', '')
+        if (route_id, 0) in self.slices:
+            return
+        route_idx = len(self.route_ids)
+        self.route_ids.append(route_id)
+        end = timetable.service[self.day_key]['end']
+
+        for stop_idx in range(len(timetable.stop_names)):
+            times = timetable.departures(stop_idx, self.day_key)
+            lo = len(self.departure)
+            dwell = timetable.dwell[stop_idx]
+            for trip, departure in enumerate(times):
+                self.trip_id.append(trip)
+                self.route.append(route_idx)
+                self.stop.append(stop_idx)
+                self.arrival.append(departure - dwell)
+                self.departure.append(departure)
+            self.slices[(route_id, stop_idx)] = (lo, len(self.departure), timetable.headway(stop_idx, self.day_key), end)
+
+    def __len__(self) -> int:
+        return len(self.departure)
+
+    def has_stop(self, route_id: str, stop_idx: int) -> bool:
+        return (route_id, stop_idx) in self.slices
+
+    def first_departure(self, route_id: str, stop_idx: int) -> Optional[int]:
+        """First departure of the day from a stop"""
+        entry = self.slices.get((route_id, stop_idx))
+        return self.departure[entry[0]] if entry else None
+
+    def next_departure(self, route_id: str, stop_idx: int, reference_minutes: Optional[float] = None) -> Optional[int]:
+        """Next departure from a stop at or after reference_minutes (first departure if None)
+
+        reference_minutes may carry a fractional part for seconds: a reference
+        even a second past the first departure counts as after it, while later
+        departures are matched at whole-minute resolution.
+        """
+        entry = self.slices.get((route_id, stop_idx))
+        if entry is None:
+            return None
+        lo, hi, headway, end = entry
+        first = self.departure[lo]
+        if reference_minutes is None or reference_minutes <= first:
+            return first
+        if headway <= 0:
+            return None
+        pos = bisect_left(self.departure, int(reference_minutes), lo, hi)
+        if pos == hi or self.departure[pos] > end:
+            return None
+        return self.departure[pos]
+
+    def trips_at(self, route_id: str, stop_idx: int) -> List[Dict]:
+        """All trips calling at a stop, in departure order"""
+        entry = self.slices.get((route_id, stop_idx))
+        if entry is None:
+            return []
+        lo, hi = entry[0], entry[1]
+        return [
+            {
+                'trip_id': f"{route_id}#{self.trip_id[i]}",
+                'stop_index': stop_idx,
+                'arrival': format_minutes(self.arrival[i]),
+                'departure': format_minutes(self.departure[i]),
+            }
+            for i in range(lo, hi)
+        ]
+
+
+class TripTableStore:
+    """Materialized trip tables per service day, LRU-evicted
+
+    routes_provider returns the current route dicts; call invalidate() after
+    routes change so the next query re-materializes.
+    """
+    def __init__(self, routes_provider: Callable[[], Iterable[Dict]], capacity: int = 8):
+        self.routes_provider = routes_provider
+        self.timetables = TimetableCache()
+        self.tables = LRUCache(capacity)
+        self.generation = 0
+
+    def table_for(self, travel_date: str) -> TripTable:
+        """Trip table for a date, materialized on first use"""
+        key = (self.generation, travel_date)
+        table = self.tables.get(key)
+        if table is None:
+            table = TripTable(travel_date, self.routes_provider(), self.timetables)
+            self.tables.put(key, table)
+        return table
+
+    def _table_with(self, route: Dict, travel_date: str) -> TripTable:
+        table = self.table_for(travel_date)
+        route_id = route.get('route_id', '')
+        if not table.has_stop(route_id, 0):
+            # Route unknown to the provider (e.g. created elsewhere since the last refresh)
+            key = (self.generation, travel_date, route_id)
+            entry = self.tables.get(key)
+            if entry is None or entry[0] is not route:
+                entry = (route, TripTable(travel_date, [route], self.timetables))
+                self.tables.put(key, entry)
+            table = entry[1]
+        return table
+
+    def timetable(self, route: Dict) -> RouteTimetable:
+        return self.timetables.get(route)
+
+    def next_departure(self, route: Dict, stop_idx: int, travel_date: str,
+                       reference_minutes: Optional[float] = None) -> Optional[int]:
+        """Next departure (minutes since midnight) of a route from a stop on a date"""
+        table = self._table_with(route, travel_date)
+        return table.next_departure(route.get('route_id', ''), stop_idx, reference_minutes)
+
+    def trips_at(self, route: Dict, stop_idx: int, travel_date: str) -> List[Dict]:
+        table = self._table_with(route, travel_date)
+        return table.trips_at(route.get('route_id', ''), stop_idx)
+
+    def invalidate(self) -> None:
+        """Drop every materialized day and compiled route"""
+        self.generation += 1
+        self.tables.clear()
+        self.timetables.invalidate()
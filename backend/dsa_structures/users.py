@@ -1,9 +1,11 @@
-import json
 import uuid
 from datetime import datetime
 import hashlib
 import os
 
+from .persistence import durable_write_json
+from .streaming import iter_json_records
+
 class User:
     """User class representing a passenger"""
     def __init__(self, user_id, username, email, phone, full_name, password_hash, role="passenger", created_at=None):
@@ -270,8 +272,9 @@ class HashTable:
 
 class UserManager:
     """Manages users using pure from-scratch DSA concepts"""
-    def __init__(self, users_file):
+    def __init__(self, users_file, storage=None):
         self.users_file = users_file
+        self.storage = storage  # optional SQLiteStorage; users.json when None
         
         # Using our custom HashTable instead of Python dict
         self.username_index = HashTable()  # Custom hash table for username lookup
@@ -287,21 +290,26 @@ class UserManager:
         """Hash password using SHA-256 (for security, not for indexing)"""
         return hashlib.sha256(password.encode()).hexdigest()
     
+    def _read_users(self):
+        """Raw users document from storage or the JSON file (users streamed record by record)"""
+        if self.storage is not None:
+            return {'users': self.storage.load_all('users')}
+        return {'users': iter_json_records(self.users_file, 'users')}
+    
     def load_users(self):
-        """Load users from JSON file"""
+        """Load users from storage (JSON file or SQLite)"""
         try:
-            if os.path.exists(self.users_file):
-                with open(self.users_file, 'r') as f:
-                    data = json.load(f)
-                    for user_data in data.get('users', []):
-                        user = User.from_dict(user_data)
-                        self.users.append(user)
-                        
-                        # Insert into custom hash tables
-                        self.username_index.insert(user.username, user)
-                        self.email_index.insert(user.email, user)
-                        self.user_id_index.insert(user.user_id, user)
-                        
+            if self.storage is not None or os.path.exists(self.users_file):
+                data = self._read_users()
+                for user_data in data.get('users', []):
+                    user = User.from_dict(user_data)
+                    self.users.append(user)
+                    
+                    # Insert into custom hash tables
+                    self.username_index.insert(user.username, user)
+                    self.email_index.insert(user.email, user)
+                    self.user_id_index.insert(user.user_id, user)
+                    
                 print(f"Loaded {len(self.users)} users")
                 print(f"Username index stats: {self.username_index.statistics()}")
             else:
@@ -316,9 +324,27 @@ class UserManager:
             self.email_index.clear()
             self.user_id_index.clear()
     
+    def reload_users(self):
+        """Re-read users saved by another worker, swapping in freshly built indexes"""
+        data = self._read_users()
+        users = []
+        username_index, email_index, user_id_index = HashTable(), HashTable(), HashTable()
+        for user_data in data.get('users', []):
+            user = User.from_dict(user_data)
+            users.append(user)
+            username_index.insert(user.username, user)
+            email_index.insert(user.email, user)
+            user_id_index.insert(user.user_id, user)
+        self.username_index, self.email_index, self.user_id_index = username_index, email_index, user_id_index
+        self.users = users
+    
     def save_users(self):
-        """Save users to JSON file"""
+        """Save users to JSON file (SQLite: write only the changed rows)"""
         try:
+            if self.storage is not None:
+                self.storage.sync('users', [user.to_dict() for user in self.users])
+                return True
+            
             data = {
                 'users': [user.to_dict() for user in self.users],
                 'last_updated': datetime.now().isoformat(),
@@ -329,8 +355,7 @@ class UserManager:
                     'user_id_index': self.user_id_index.statistics()
                 }
             }
-            with open(self.users_file, 'w') as f:
-                json.dump(data, f, indent=2)
+            durable_write_json(self.users_file, data, indent=2)
             return True
         except Exception as e:
             print(f"Error saving users: {e}")
@@ -1,28 +1,65 @@
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 
+from .persistence import FSYNC_DEFAULT, JsonLinesAppender, durable_write_json, iter_json_lines
+from .streaming import iter_json_records
+
 class DataHandler:
-    """Handles data storage and retrieval for various entities"""
+    """Handles data storage and retrieval for various entities
+    
+    *.jsonl files are append-only logs: append_data queues one line and
+    writes in batches (flush_records / flush_interval / fsync), rotating the
+    file once it reaches rotate_bytes. Other files are whole JSON documents.
+    """
     
-    def __init__(self, data_dir):
+    def __init__(self, data_dir, flush_records=100, flush_interval=1.0, fsync=FSYNC_DEFAULT,
+                 rotate_bytes=None, keep_segments=None):
         self.data_dir = data_dir
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.rotate_bytes = rotate_bytes
+        self.keep_segments = keep_segments
+        self.appenders = {}  # filename -> JsonLinesAppender
+        self._lock = threading.Lock()
         os.makedirs(data_dir, exist_ok=True)
     
+    def _appender(self, filename):
+        with self._lock:
+            appender = self.appenders.get(filename)
+            if appender is None:
+                appender = JsonLinesAppender(os.path.join(self.data_dir, filename),
+                                             flush_records=self.flush_records,
+                                             flush_interval=self.flush_interval,
+                                             fsync=self.fsync,
+                                             rotate_bytes=self.rotate_bytes,
+                                             keep=self.keep_segments)
+                self.appenders[filename] = appender
+            return appender
+    
     def save_data(self, filename, data):
         """Save data to JSON file"""
         filepath = os.path.join(self.data_dir, filename)
         try:
-            with open(filepath, 'w') as f:
-                json.dump(data, f, indent=2)
+            durable_write_json(filepath, data, indent=2)
             return True
         except Exception as e:
             print(f"Error saving data to {filename}: {e}")
             return False
     
     def load_data(self, filename, default=None):
-        """Load data from JSON file"""
+        """Load data from JSON file (a .jsonl log loads as a list of its records)"""
         filepath = os.path.join(self.data_dir, filename)
+        if filename.endswith('.jsonl'):
+            try:
+                return list(self.iter_data(filename))
+            except Exception as e:
+                print(f"Error loading data from {filename}: {e}")
+                return default if default is not None else []
         try:
             if os.path.exists(filepath):
                 with open(filepath, 'r') as f:
@@ -33,12 +70,44 @@ class DataHandler:
         return default if default is not None else {}
     
     def append_data(self, filename, new_data):
-        """Append data to existing JSON file"""
+        """Append data to existing JSON file
+        
+        O(1) for .jsonl logs; a JSON array file is rewritten whole on every call.
+        """
+        if filename.endswith('.jsonl'):
+            try:
+                self._appender(filename).append(new_data)
+                return True
+            except Exception as e:
+                print(f"Error appending data to {filename}: {e}")
+                return False
         existing_data = self.load_data(filename, [])
         if isinstance(existing_data, list):
             existing_data.append(new_data)
             return self.save_data(filename, existing_data)
         return False
+    
+    def iter_data(self, filename):
+        """Yield records one at a time: every line of a .jsonl log (rotated
+        segments first) or the items of a JSON array file"""
+        filepath = os.path.join(self.data_dir, filename)
+        if filename.endswith('.jsonl'):
+            appender = self.appenders.get(filename)
+            if appender is not None:
+                appender.flush()
+            yield from iter_json_lines(filepath)
+        elif os.path.exists(filepath):
+            yield from iter_json_records(filepath)
+    
+    def flush(self):
+        """Write out every buffered .jsonl append"""
+        for appender in list(self.appenders.values()):
+            appender.flush()
+    
+    def close(self):
+        for appender in list(self.appenders.values()):
+            appender.close()
+        self.appenders.clear()
 
 class Stack:
     """Stack implementation for action history"""
@@ -104,4 +173,138 @@ class Queue:
     
     def clear(self):
         """Clear queue"""
-        self.queue = []
\ No newline at end of file
+        self.queue = []
+
+class LRUCache:
+    """Size-bounded Least Recently Used cache (hash map + ordered list, O(1) get/put)"""
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        """Get value and mark it most recently used"""
+        with self._lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return self.cache[key]
+            self.misses += 1
+            return default
+    
+    def put(self, key, value):
+        """Insert value, evicting the least recently used entry when full"""
+        with self._lock:
+            self.cache[key] = value
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+    
+    def pop(self, key, default=None):
+        """Remove key from cache"""
+        with self._lock:
+            return self.cache.pop(key, default)
+    
+    def clear(self):
+        """Clear cache"""
+        with self._lock:
+            self.cache.clear()
+    
+    def __contains__(self, key):
+        with self._lock:
+            return key in self.cache
+    
+    def __len__(self):
+        return len(self.cache)
+    
+    def statistics(self):
+        """Get cache statistics"""
+        total = self.hits + self.misses
+        return {
+            'capacity': self.capacity,
+            'size': len(self.cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0
+        }
+
+class TTLCache:
+    """Size-bounded cache whose entries expire ttl seconds after insertion
+    
+    Entries are kept in insertion order, which is also expiry order, so
+    expired entries are always at the front and are purged in O(1) each.
+    """
+    def __init__(self, capacity=10000, ttl=3600.0, clock=time.monotonic):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.clock = clock
+        self.cache = OrderedDict()  # key -> (expires_at, value)
+        self.expired = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+    
+    def _purge(self, now):
+        while self.cache:
+            key, (expires_at, _) = next(iter(self.cache.items()))
+            if expires_at > now:
+                break
+            self.cache.popitem(last=False)
+            self.expired += 1
+    
+    def get(self, key, default=None):
+        """Get a live value O(1)"""
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= self.clock():
+                self._purge(self.clock())
+                return default
+            return entry[1]
+    
+    def put(self, key, value):
+        """Insert value with a fresh TTL, evicting expired then oldest entries"""
+        with self._lock:
+            now = self.clock()
+            self.cache.pop(key, None)
+            self.cache[key] = (now + self.ttl, value)
+            self._purge(now)
+            while len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+                self.evicted += 1
+    
+    def setdefault(self, key, value):
+        """Return the live value for key, inserting value first if there is none"""
+        with self._lock:
+            now = self.clock()
+            entry = self.cache.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+            self.cache.pop(key, None)
+            self.cache[key] = (now + self.ttl, value)
+            self._purge(now)
+            while len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+                self.evicted += 1
+            return value
+    
+    def pop(self, key, default=None):
+        """Remove key from cache"""
+        with self._lock:
+            entry = self.cache.pop(key, None)
+            return entry[1] if entry else default
+    
+    def __len__(self):
+        return len(self.cache)
+    
+    def statistics(self):
+        """Get cache statistics"""
+        return {
+            'capacity': self.capacity,
+            'ttl_seconds': self.ttl,
+            'size': len(self.cache),
+            'expired': self.expired,
+            'evicted': self.evicted
+        }
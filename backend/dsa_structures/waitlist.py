@@ -0,0 +1,203 @@
+"""
+Trip Waitlist
+One min-heap per (bus_number, travel_date) ordered by (rank, join sequence):
+emergency waiters first, then first come first served
+- join / promote are O(log n)
+- leaving is a lazy tombstone skipped on promotion
+- entries and promotion outcomes of past trips are pruned by date
+- changes are written behind (batched on interval, threshold and shutdown) so
+  the waitlist survives restarts without a full rewrite per change
+"""
+import heapq
+import itertools
+import json
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .persistence import WriteBehindFlusher
+
+EMERGENCY_RANK = 0
+STANDARD_RANK = 1
+
+
+class TripWaitlist:
+    """Per-trip waitlist heaps with an index by waitlist_id"""
+    def __init__(self, path: Optional[str] = None, max_per_trip: int = 50):
+        self.path = path
+        self.max_per_trip = max_per_trip
+        self.heaps = {}     # (bus_number, travel_date) -> [(rank, seq, waitlist_id)]
+        self.entries = {}   # waitlist_id -> entry dict (waiting only)
+        self.promoted = {}  # waitlist_id -> {'ticket_id', 'travel_date'}
+        self._seq = itertools.count(1)
+        self._lock = threading.RLock()  # re-entered by the flusher's mark_dirty
+        self._load()
+        self.flusher = WriteBehindFlusher(path, self._snapshot, lock=self._lock) if path else None
+
+    @staticmethod
+    def _trip_key(bus_number: str, travel_date: str) -> tuple:
+        return (str(bus_number), str(travel_date))
+
+    def _load(self) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+
+        self.promoted = {
+            waitlist_id: outcome if isinstance(outcome, dict) else {'ticket_id': outcome, 'travel_date': None}
+            for waitlist_id, outcome in data.get('promoted', {}).items()
+        }
+        last_seq = 0
+        for entry in data.get('entries', []):
+            key = self._trip_key(entry['bus_number'], entry['travel_date'])
+            self.entries[entry['waitlist_id']] = entry
+            self.heaps.setdefault(key, []).append((entry['rank'], entry['seq'], entry['waitlist_id']))
+            last_seq = max(last_seq, entry['seq'])
+        for heap in self.heaps.values():
+            heapq.heapify(heap)
+        self._seq = itertools.count(last_seq + 1)
+
+    def _snapshot(self) -> Dict:
+        """Waiting entries and promotions as written to disk; caller holds the lock"""
+        return {
+            'entries': sorted(self.entries.values(), key=lambda e: e['seq']),
+            'promoted': self.promoted,
+        }
+
+    def _save(self) -> None:
+        """Mark the waitlist changed; the flusher writes it; caller holds the lock"""
+        if self.flusher is not None:
+            self.flusher.mark_dirty()
+
+    def _discard_stale_top(self, heap: List) -> None:
+        while heap and heap[0][2] not in self.entries:
+            heapq.heappop(heap)
+
+    def join(self, request: Dict, emergency: bool = False) -> Dict:
+        """Queue a passenger for a full trip"""
+        key = self._trip_key(request.get('bus_number'), request.get('travel_date'))
+        passenger_id = request.get('passenger_id', '')
+        with self._lock:
+            heap = self.heaps.setdefault(key, [])
+            waiting = [self.entries[w] for _, _, w in heap if w in self.entries]
+            for entry in waiting:
+                if passenger_id and entry['passenger_id'] == passenger_id:
+                    return {'success': True, 'already_waiting': True, **self._public(entry)}
+            if len(waiting) >= self.max_per_trip:
+                return {'success': False, 'message': 'Waitlist is full for this bus and date'}
+
+            seq = next(self._seq)
+            entry = {
+                'waitlist_id': f"WL{seq:06d}",
+                'seq': seq,
+                'rank': EMERGENCY_RANK if emergency else STANDARD_RANK,
+                'emergency': bool(emergency),
+                'passenger_id': passenger_id,
+                'passenger_name': request.get('passenger_name', ''),
+                'passenger_contact': request.get('passenger_contact', ''),
+                'bus_number': key[0],
+                'travel_date': key[1],
+                'from_stop': request.get('from_stop'),
+                'to_stop': request.get('to_stop'),
+                'joined_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            self.entries[entry['waitlist_id']] = entry
+            heapq.heappush(heap, (entry['rank'], seq, entry['waitlist_id']))
+            self._save()
+            return {'success': True, **self._public(entry)}
+
+    def leave(self, waitlist_id: str) -> bool:
+        """Drop a waiting entry (its heap slot is skipped lazily)"""
+        with self._lock:
+            if self.entries.pop(waitlist_id, None) is None:
+                return False
+            self._save()
+            return True
+
+    def pop(self, bus_number: str, travel_date: str) -> Optional[Dict]:
+        """Take the next waiter for a trip"""
+        key = self._trip_key(bus_number, travel_date)
+        with self._lock:
+            heap = self.heaps.get(key)
+            if not heap:
+                return None
+            self._discard_stale_top(heap)
+            if not heap:
+                del self.heaps[key]
+                return None
+            _, _, waitlist_id = heapq.heappop(heap)
+            entry = self.entries.pop(waitlist_id)
+            self._save()
+            return entry
+
+    def restore(self, entry: Dict) -> None:
+        """Put a popped entry back at its original place in line"""
+        key = self._trip_key(entry['bus_number'], entry['travel_date'])
+        with self._lock:
+            self.entries[entry['waitlist_id']] = entry
+            heapq.heappush(self.heaps.setdefault(key, []), (entry['rank'], entry['seq'], entry['waitlist_id']))
+            self._save()
+
+    def mark_promoted(self, waitlist_id: str, ticket_id: Optional[str], travel_date: Optional[str] = None) -> None:
+        """Record the outcome of a promotion (None when the trip could not be booked)"""
+        with self._lock:
+            self.promoted[waitlist_id] = {'ticket_id': ticket_id, 'travel_date': travel_date}
+            self._save()
+
+    def prune_before(self, travel_date: str) -> int:
+        """Forget waiters and promotion outcomes of trips before travel_date; returns how many"""
+        with self._lock:
+            past_trips = [key for key in self.heaps if key[1] < travel_date]
+            for key in past_trips:
+                for _, _, waitlist_id in self.heaps.pop(key):
+                    self.entries.pop(waitlist_id, None)
+            past_outcomes = [w for w, outcome in self.promoted.items()
+                             if outcome['travel_date'] and outcome['travel_date'] < travel_date]
+            for waitlist_id in past_outcomes:
+                del self.promoted[waitlist_id]
+            if past_trips or past_outcomes:
+                self._save()
+            return len(past_trips) + len(past_outcomes)
+
+    def _position(self, entry: Dict) -> int:
+        key = self._trip_key(entry['bus_number'], entry['travel_date'])
+        mine = (entry['rank'], entry['seq'])
+        return 1 + sum(1 for rank, seq, w in self.heaps.get(key, []) if w in self.entries and (rank, seq) < mine)
+
+    def _public(self, entry: Dict) -> Dict:
+        return {
+            'waitlist_id': entry['waitlist_id'],
+            'status': 'waiting',
+            'position': self._position(entry),
+            'bus_number': entry['bus_number'],
+            'travel_date': entry['travel_date'],
+            'emergency': entry['emergency'],
+        }
+
+    def status(self, waitlist_id: str) -> Optional[Dict]:
+        """Waiting position, or the promotion outcome"""
+        with self._lock:
+            entry = self.entries.get(waitlist_id)
+            if entry:
+                return self._public(entry)
+            if waitlist_id in self.promoted:
+                ticket_id = self.promoted[waitlist_id]['ticket_id']
+                return {
+                    'waitlist_id': waitlist_id,
+                    'status': 'promoted' if ticket_id else 'expired',
+                    'ticket_id': ticket_id,
+                }
+            return None
+
+    def length(self, bus_number: str, travel_date: str) -> int:
+        key = self._trip_key(bus_number, travel_date)
+        with self._lock:
+            return sum(1 for _, _, w in self.heaps.get(key, []) if w in self.entries)
+
+    def size(self) -> int:
+        """Number of waiting entries across all trips"""
+        return len(self.entries)